@@ -1,13 +1,22 @@
 from langchain.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_google_genai.chat_models import ChatGoogleGenerativeAI
 import os 
+import time
+import asyncio
 from dotenv import load_dotenv
 from langchain.agents import create_tool_calling_agent, AgentExecutor
-from langchain.memory import ConversationBufferMemory
 from pydantic import BaseModel
-from tools import collect_flight_info,collect_passenger_info, search_flights,get_airport_code
+from tools import collect_flight_info,collect_passenger_info, search_flights,get_airport_code, search_flights_multi_airport, search_multi_city_flights, search_round_trip_flights, confirm_prices, book_mock_order, lookup_order, watch_flight_price, cancel_price_watch, price_trend
 from datetime import date
 from system_prompt import system_message
+from timing import TurnTimer, TurnStats
+from quota import INTERACTIVE, QuotaScheduler, current_priority, current_session
+from sessions import SessionManager, store_from_env
+from response_cache import UNCACHEABLE_TOOLS, ResponseCache
+from deadline import Deadline, DeadlineExceeded, current_deadline, deadline_stats
+from serializer import loads
+from routing import FAST, STANDARD, REASONING, ModelRouter, UsageCounter
+from sessions import SEARCH_TOOLS
 
 today = date.today()
 
@@ -30,12 +39,42 @@ if not api_key:
     raise ValueError("GEMINI_API_KEY is missing in the .env file")
 
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    google_api_key=os.getenv("GEMINI_API_KEY")
-)
+# Model of each routing tier (see routing.py), and its price in USD per million input / output tokens
+MODELS = {
+    FAST: os.getenv("MODEL_FAST", "gemini-1.5-flash-8b"),
+    STANDARD: os.getenv("MODEL_STANDARD", "gemini-1.5-flash"),
+}
+# A reasoning turn costs about 16x a standard one, more than the fast tier saves on
+# everything else (see benchmarks/bench_routing.py); without MODEL_REASONING those
+# turns stay on the standard model
+if os.getenv("MODEL_REASONING"):
+    MODELS[REASONING] = os.getenv("MODEL_REASONING")
+MODEL_PRICES = {
+    FAST: os.getenv("MODEL_FAST_PRICE", "0.0375,0.15"),
+    STANDARD: os.getenv("MODEL_STANDARD_PRICE", "0.075,0.30"),
+    REASONING: os.getenv("MODEL_REASONING_PRICE", "1.25,5.00"),
+}
+
+def build_llm(model):
+    return ChatGoogleGenerativeAI(
+        model=model,
+        google_api_key=os.getenv("GEMINI_API_KEY"),
+        # a stuck model call must not hold the request past its deadline
+        timeout=float(os.getenv("GEMINI_TIMEOUT", "20")),
+    )
+
+llms = {tier: build_llm(model) for tier, model in MODELS.items()}
+llm = llms[STANDARD]
 #end of loading llm
 
+# Gemini calls of all sessions share the key's rate limit (one call per agent step)
+gemini_quota = QuotaScheduler(
+    "gemini",
+    rate=float(os.getenv("GEMINI_RATE", "5")), capacity=10,
+    session_rate=float(os.getenv("GEMINI_SESSION_RATE", "1")), session_capacity=5,
+    max_waiting=int(os.getenv("GEMINI_MAX_WAITING", "100")),
+)
+
 
 prompt = ChatPromptTemplate.from_messages(
     [
@@ -52,31 +91,139 @@ prompt = ChatPromptTemplate.from_messages(
     ]
 )
 
-tools = [collect_flight_info,collect_passenger_info,search_flights,get_airport_code]
+tools = [collect_flight_info,collect_passenger_info,search_flights,get_airport_code,search_flights_multi_airport,search_multi_city_flights,search_round_trip_flights,confirm_prices,book_mock_order,lookup_order,watch_flight_price,cancel_price_watch,price_trend]
 
-memory = ConversationBufferMemory(
-    memory_key="chat_history", return_messages=True
+# Conversation state per session_id, checkpointed after every turn (SESSION_DB / SESSION_DIR)
+sessions = SessionManager(
+    store_from_env(),
+    idle_seconds=float(os.getenv("SESSION_IDLE_SECONDS", "600")),
+    max_sessions=int(os.getenv("SESSION_MAX_IN_MEMORY", "1000")),
 )
 
-agent = create_tool_calling_agent(
-    llm=llm,
-    prompt=prompt,
-    tools=tools,
-)
+def build_agent_executor(llm, memory=None, verbose=True, quota=None):
+    """
+    Tool-calling agent around `llm` (benchmarks pass a scripted fake model here).
+    With a `quota`, every agent step waits for a token before calling the model.
+    Without a `memory`, the caller passes `chat_history` with each query (see run_agent)."""
+    agent = create_tool_calling_agent(
+        llm=llm,
+        prompt=prompt,
+        tools=tools,
+    )
+    if quota is not None:
+        agent = quota.gate() | agent
 
-agent_executor = AgentExecutor(
-    agent=agent,
-    tools=tools,
-    memory=memory,
-    verbose=True,
-    # output_key="output"
+    return AgentExecutor(
+        agent=agent,
+        tools=tools,
+        memory=memory,
+        verbose=verbose,
+        # the tool calls of a turn are recorded in its session
+        return_intermediate_steps=True,
+        # a looping agent stops after this many steps (the deadline in run_agent bounds the time)
+        max_iterations=int(os.getenv("AGENT_MAX_ITERATIONS", "8")),
+        # output_key="output"
+    )
+
+# Each turn runs on the model tier its message needs; MODEL_ROUTING=0 sends every turn to the standard model
+router = ModelRouter(
+    {tier: build_agent_executor(model, quota=gemini_quota) for tier, model in llms.items()},
+    prices={tier: tuple(float(p) for p in price.split(",")) for tier, price in MODEL_PRICES.items()},
+    enabled=os.getenv("MODEL_ROUTING", "1") != "0",
 )
+agent_executor = router.executors[STANDARD]
+
+turn_stats = TurnStats()
 
-async def run_agent(query):
+# First-turn answers reused for near-identical opening messages (see response_cache.py)
+response_cache = ResponseCache(ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "300")))
+
+# Time budget of one turn, from the request until the answer (see deadline.py)
+AGENT_DEADLINE_SECONDS = float(os.getenv("AGENT_DEADLINE_SECONDS", "25"))
+
+def partial_answer(steps, reason):
+    """What to say when the turn ran out of time: the best offers found so far, if any"""
+    offers = []
+    for action, observation in steps:
+        if action.tool in SEARCH_TOOLS and isinstance(observation, str) and observation.startswith("["):
+            try:
+                offers += [offer for offer in loads(observation) if isinstance(offer, dict)]
+            except ValueError:
+                continue
+    if not offers:
+        return (f"Sorry, I couldn't finish this request in time ({reason}). "
+                "Please try again, or narrow it down (fewer airports or dates).")
+    lines = [f"I ran out of time before finishing ({reason}), but here is what I found so far:"]
+    for offer in offers[:3]:
+        first = offer.get("outbound", offer)  # a trip of two one-way tickets starts with its outbound one
+        lines.append(f"- {first.get('airline', '')} {first.get('flight_number', '')} "
+                     f"{first.get('from', '')} -> {first.get('to', '')}, departs {first.get('departure_time', '')}, "
+                     f"{offer.get('total_price', '')} (offer_ref {offer.get('offer_ref') or ', '.join(offer.get('offer_refs', ())) or '-'})")
+    lines.append("Ask me again to finish the search, or pick one of these to continue.")
+    return "\n".join(lines)
+
+async def run_agent(query, session_id="default", deadline_seconds=None):
     print(f"Type of query: {type(query)}")  # Should be <class 'str'>
-    response = agent_executor.invoke({"query": query,})
+    # Upstream calls made for this turn are charged to the session, at interactive priority
+    current_session.set(session_id)
+    current_priority.set(INTERACTIVE)
+    # ainvoke runs the tool calls of each step concurrently (see the tool coroutines in tools.py)
+    session = sessions.get(session_id)
+    first_turn = not session.messages
+    if first_turn:
+        cached = response_cache.get(query)
+        if cached is not None:
+            print(f"Answered from the response cache (saved {cached.seconds:.2f}s)")
+            session.record_turn(query, cached.answer)
+            session.slots.update(cached.slots)
+            session.offer_refs = list(cached.offer_refs)
+            sessions.checkpoint(session)
+            return cached.answer
+
+    # Quota waits and Amadeus calls of this turn, in any thread, stop once the deadline expires
+    # a client may ask for less time, never for more
+    deadline = Deadline(min(deadline_seconds, AGENT_DEADLINE_SECONDS) if deadline_seconds else AGENT_DEADLINE_SECONDS)
+    current_deadline.set(deadline)
+    deadline_stats.add("runs")
+    tier = router.route(query, follow_up=not first_turn)
+    executor = router.executor(tier)
+    timer, usage = TurnTimer(), UsageCounter()
+    started = time.perf_counter()
+    steps, response = [], {}
+
+    async def consume():
+        # astream hands over the tool calls step by step, so a timeout still has the finished ones
+        async for chunk in executor.astream({"query": query, "chat_history": session.history()}, config={"callbacks": [timer, usage]}):
+            steps.extend((step.action, step.observation) for step in chunk.get("steps", ()))
+            if "output" in chunk:
+                response.update(chunk)
+
+    partial = False
+    try:
+        await asyncio.wait_for(consume(), deadline.remaining())
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        deadline.cancel("timed out")
+        deadline_stats.add("timed_out")
+        deadline_stats.add("partial_responses")
+        response["output"] = partial_answer(steps, "timed out")
+        partial = True
+    except asyncio.CancelledError:
+        # the client went away (see app.py): nobody reads the answer, so stop spending quota on it
+        deadline.cancel("client disconnected")
+        deadline_stats.add("cancelled")
+        raise
+    else:
+        deadline_stats.add("completed")
+    timing = timer.summary()
+    turn_stats.add(timing)
+    router.record(tier, timing["total_seconds"], timing["llm_seconds"], usage)
     print(response)
+    print(f"Turn timing ({tier} model): {timing}")
     if "output" in response:
+        session.record_turn(query, response["output"], steps)
+        sessions.checkpoint(session)
+        if first_turn and not partial and response["output"] and not any(action.tool in UNCACHEABLE_TOOLS for action, _ in steps):
+            response_cache.put(query, response["output"], session.slots, session.offer_refs, time.perf_counter() - started)
         return response["output"]
     else:
-        raise ValueError("Agent response does not contain 'output'")    
\ No newline at end of file
+        raise ValueError("Agent response does not contain 'output'")
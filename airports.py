@@ -0,0 +1,120 @@
+"""
+Local metro-area table used to expand a city into all of its commercial airports,
+so a search for "New York" also looks at EWR and LGA instead of only JFK.
+
+Only city names and metro codes are expanded. An airport code stays that one
+airport, even where the metro has the same code (BOS, HOU): the user asked for
+that airport. Other city names are looked up with `resolve` (the Amadeus
+locations endpoint in tools.py).
+"""
+import re
+from typing import Callable, Optional
+
+# Metro code -> airports served. Keep the busiest airport first.
+METRO_AIRPORTS = {
+    "NYC": ("JFK", "EWR", "LGA"),
+    "QSF": ("SFO", "OAK", "SJC"),  # San Francisco Bay Area
+    "QLA": ("LAX", "BUR", "LGB", "SNA", "ONT"),  # Los Angeles area
+    "CHI": ("ORD", "MDW"),
+    "WAS": ("IAD", "DCA", "BWI"),
+    "QDF": ("DFW", "DAL"),  # Dallas / Fort Worth
+    "HOU": ("IAH", "HOU"),
+    "QMI": ("MIA", "FLL", "PBI"),  # South Florida
+    "BOS": ("BOS",),
+    "DTT": ("DTW",),
+    "SEA": ("SEA", "PAE"),
+    "ORL": ("MCO", "SFB"),
+    "TPA": ("TPA", "PIE"),
+    "PHX": ("PHX", "AZA"),
+    "DEN": ("DEN",),
+    "ATL": ("ATL",),
+    "LAS": ("LAS",),
+}
+
+# City names and common nicknames -> metro code, or the airport of a city that has its own
+METRO_ALIASES = {
+    "NEW YORK": "NYC",
+    "NEW YORK CITY": "NYC",
+    "NY": "NYC",
+    "SAN FRANCISCO": "QSF",
+    "BAY AREA": "QSF",
+    "SF BAY AREA": "QSF",
+    "SAN JOSE": "SJC",
+    "OAKLAND": "OAK",
+    "LOS ANGELES": "QLA",
+    "LA": "QLA",
+    "CHICAGO": "CHI",
+    "WASHINGTON": "WAS",
+    "WASHINGTON DC": "WAS",
+    "DC": "WAS",
+    "DALLAS": "QDF",
+    "FORT WORTH": "QDF",
+    "HOUSTON": "HOU",
+    "MIAMI": "QMI",
+    "FORT LAUDERDALE": "FLL",
+    "SOUTH FLORIDA": "QMI",
+    "BOSTON": "BOS",
+    "DETROIT": "DTT",
+    "SEATTLE": "SEA",
+    "ORLANDO": "ORL",
+    "TAMPA": "TPA",
+    "PHOENIX": "PHX",
+    "DENVER": "DEN",
+    "ATLANTA": "ATL",
+    "LAS VEGAS": "LAS",
+}
+
+
+# Every airport of the table; such a code is never widened to its metro
+AIRPORT_CODES = frozenset(code for airports in METRO_AIRPORTS.values() for code in airports)
+
+_IATA_RE = re.compile(r"^[A-Z]{3}$")
+
+
+def expand_airports(place: str, resolve: Optional[Callable[[str], tuple]] = None) -> tuple:
+    """
+    Resolve a city name, metro code or airport code to the airports it covers.
+
+    Args:
+        place: What the user typed
+        resolve: Looks up a city name the table doesn't know, returning its IATA codes
+
+    Raises:
+        ValueError when `place` is neither a known name nor an IATA code and `resolve` finds nothing
+    """
+    key = " ".join(place.replace(".", "").upper().split())
+    if key in METRO_ALIASES:
+        return METRO_AIRPORTS.get(METRO_ALIASES[key], (METRO_ALIASES[key],))
+    if key in METRO_AIRPORTS and key not in AIRPORT_CODES:
+        return METRO_AIRPORTS[key]
+    if _IATA_RE.match(key):
+        return (key,)
+    codes = resolve(place.strip()) if resolve else ()
+    if not codes:
+        raise ValueError(f"Unknown city or airport: {place.strip()}")
+    return tuple(codes)
+
+
+def airport_pairs(origins: str, destinations: str, limit: int = 9,
+                  resolve: Optional[Callable[[str], tuple]] = None) -> list:
+    """
+    Build the origin x destination airport pairs for a search.
+
+    Both arguments are comma-separated lists of cities, metro codes or airport
+    codes (see `expand_airports` for `resolve`). Pairs where both ends are the
+    same airport are dropped, and at most `limit` pairs are returned (busiest
+    airports first).
+    """
+    origin_airports = []
+    for place in origins.split(","):
+        if place.strip():
+            origin_airports.extend(a for a in expand_airports(place, resolve) if a not in origin_airports)
+    destination_airports = []
+    for place in destinations.split(","):
+        if place.strip():
+            destination_airports.extend(a for a in expand_airports(place, resolve) if a not in destination_airports)
+
+    pairs = [(o, d) for o in origin_airports for d in destination_airports if o != d]
+    # Interleave by rank so the cap keeps the main airport of each side
+    pairs.sort(key=lambda p: origin_airports.index(p[0]) + destination_airports.index(p[1]))
+    return pairs[:limit]
@@ -3,9 +3,19 @@ import sys
 import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Any, Optional, Tuple
+import time
 import requests
 from amadeus import Client, ResponseError
 from dotenv import load_dotenv
+from util import offer_details
+from reference_data import reference
+from pricing import PriceQuoteCache, price_offers
+from orders import IdempotencyConflict, MockOrderEngine
+from quota import TokenBucket
+from deadline import http_with_timeout
+from search_cache import SearchCache, normalize_params
+from single_flight import SingleFlight
+from multi_city import Leg, multi_city_body
 
 """ Eseential : 
 search_flights(...)
@@ -13,13 +23,49 @@ get_flight_offer_details(...)
 create_mock_booking(...)
 """
 class AmadeusFlightAPI:
-    def __init__(self, api_key: str, api_secret: str):
-        """Initialize the Amadeus API client with credentials."""
+    def __init__(self, api_key: str, api_secret: str, rate: float = 10, timeout: float = 30, cache_entries: int = 256):
+        """Initialize the Amadeus API client with credentials (at most `rate` searches per second, `timeout` seconds per call, `cache_entries` cached searches)."""
         self.amadeus = Client(
             client_id=api_key,
-            client_secret=api_secret
+            client_secret=api_secret,
+            http=http_with_timeout(timeout)
         )
         self.session_data = {}
+        self.price_quotes = PriceQuoteCache()
+        self.orders = MockOrderEngine()
+        # Used by search_offers (bulk quoting)
+        self.rate_limit = TokenBucket(rate, max(1, int(rate)))
+        # Entries are whole responses (up to 250 offers each), so a long bulk run must not keep thousands
+        self.search_cache = SearchCache(ttl_seconds=600, max_entries=cache_entries)
+        self.single_flight = SingleFlight()
+        
+    def search_offers(self, search_params: Dict) -> List[Dict]:
+        """
+        Raw flight offers for Amadeus search parameters, rate limited and cached.
+        Identical searches running at the same time share one call, and narrower
+        searches of a cached trip are answered from it.
+        
+        Args:
+            search_params: Flight Offers Search query parameters
+            
+        Returns:
+            List of raw flight offers (ResponseError is raised to the caller)
+        """
+        offers = self.search_cache.get(search_params)
+        if offers is None:
+            # Narrower variants of a trip searched before (nonstop, max price) are filtered locally
+            offers = self.search_cache.refine(search_params)
+        if offers is None:
+            offers = self.single_flight.do(normalize_params(search_params), lambda: self._fetch_offers(search_params))
+            self.search_cache.put(search_params, offers)
+        return offers
+    
+    def _fetch_offers(self, search_params: Dict) -> List[Dict]:
+        while not self.rate_limit.try_acquire():
+            time.sleep(1 / self.rate_limit.rate)
+        response = self.amadeus.shopping.flight_offers_search.get(**search_params)
+        reference.update(response.result.get("dictionaries"))
+        return response.data
         
     def search_flights(self, origin: str, destination: str, 
                       departure_date: str, return_date: Optional[str] = None, 
@@ -63,6 +109,32 @@ class AmadeusFlightAPI:
                     max=25
                 )
             
+            # Carrier / aircraft names for get_detailed_flight_info
+            reference.update(response.result.get("dictionaries"))
+            return response.data
+            
+        except ResponseError as error:
+            print(f"Error searching flights: {error}")
+            return []
+    
+    def search_multi_city(self, legs: List[Leg], adults: int = 1, currency: str = "USD") -> List[Dict]:
+        """
+        Search a multi-city or open-jaw trip in one request.
+        
+        Args:
+            legs: (origin, destination, departure date YYYY-MM-DD) per flight, in order
+            adults: Number of adult passengers
+            currency: Currency code for prices
+            
+        Returns:
+            List of flight offers, with one itinerary per leg
+        """
+        try:
+            print("Searching multi-city trip " + ", ".join(f"{o}-{d} {day}" for o, d, day in legs) + "...")
+            response = self.amadeus.shopping.flight_offers_search.post(
+                multi_city_body(legs, adults, max=25, currency=currency)
+            )
+            reference.update(response.result.get("dictionaries"))
             return response.data
             
         except ResponseError as error:
@@ -80,75 +152,8 @@ class AmadeusFlightAPI:
         Returns:
             Dictionary with user-friendly flight details
         """
-        details = {
-            "price": {},
-            "segments": [],
-            "baggage": {},
-            "flight_type": "DIRECT",
-            "total_duration": "",
-        }
-        
-        # Extract price information
-        if "price" in flight_offer:
-            details["price"] = {
-                "total": flight_offer["price"]["total"],
-                "currency": flight_offer["price"]["currency"],
-                "base": flight_offer["price"]["base"],
-                "fees": flight_offer["price"].get("fees", []),
-                "grand_total": flight_offer["price"]["grandTotal"] if "grandTotal" in flight_offer["price"] else flight_offer["price"]["total"]
-            }
-        
-        # Process each itinerary (outbound, return)
-        for itinerary in flight_offer["itineraries"]:
-            segments_count = len(itinerary["segments"])
-            if segments_count > 1:
-                details["flight_type"] = "CONNECTING"
-            
-            total_duration = itinerary.get("duration", "")
-            if total_duration:
-                details["total_duration"] = total_duration
-            
-            # Process each segment in the itinerary
-            for segment in itinerary["segments"]:
-                segment_info = {
-                    "departure": {
-                        "airport": segment["departure"]["iataCode"],
-                        "terminal": segment["departure"].get("terminal", ""),
-                        "time": segment["departure"]["at"]
-                    },
-                    "arrival": {
-                        "airport": segment["arrival"]["iataCode"],
-                        "terminal": segment["arrival"].get("terminal", ""),
-                        "time": segment["arrival"]["at"]
-                    },
-                    "duration": segment.get("duration", ""),
-                    "flight_number": f"{segment['carrierCode']} {segment['number']}",
-                    "operating_carrier": segment.get("operating", {}).get("carrierCode", segment["carrierCode"])
-                }
-                details["segments"].append(segment_info)
-        
-        # Extract baggage allowance information
-        if "travelerPricings" in flight_offer:
-            for traveler in flight_offer["travelerPricings"]:
-                baggage_info = {}
-                
-                # Check for included checked bags
-                if "includedCheckedBags" in traveler:
-                    checked_bags = traveler["includedCheckedBags"]
-                    baggage_info["checked"] = {
-                        "quantity": checked_bags.get("quantity", 0),
-                        "weight": checked_bags.get("weight", 0),
-                        "weightUnit": checked_bags.get("weightUnit", "")
-                    }
-                else:
-                    baggage_info["checked"] = {"quantity": 0, "included": False}
-                
-                # Carry-on information (not always explicitly provided)
-                baggage_info["cabin"] = {"included": True}  # Default assumption
-                
-                details["baggage"][f"traveler_{traveler['travelerId']}"] = baggage_info
-        
-        return details
+        # Decoded once into the shared offer model, see models.py / util.offer_details
+        return offer_details(flight_offer)
     
     def format_flight_for_display(self, flight_details: Dict) -> str:
         """
@@ -169,12 +174,16 @@ class AmadeusFlightAPI:
         # Segment information
         display.append("\nFLIGHT SEGMENTS:")
         for idx, segment in enumerate(flight_details['segments']):
-            if idx > 0:
+            if idx > 0 and segment.get('leg') != flight_details['segments'][idx - 1].get('leg'):
+                display.append(f"\n  LEG {segment['leg']}")
+            elif idx > 0:
                 display.append("  ↓  LAYOVER  ↓  ")
                 
             display.append(f"  {segment['departure']['airport']} ({segment['departure']['time']}) → "
                          f"{segment['arrival']['airport']} ({segment['arrival']['time']})")
-            display.append(f"  Flight: {segment['flight_number']} | Duration: {segment['duration']}")
+            carrier = f" ({segment['carrier_name']})" if segment.get('carrier_name') else ""
+            aircraft = f" | Aircraft: {segment['aircraft']}" if segment.get('aircraft') else ""
+            display.append(f"  Flight: {segment['flight_number']}{carrier} | Duration: {segment['duration']}{aircraft}")
         
         # Baggage information
         display.append("\nBAGGAGE INFORMATION:")
@@ -204,13 +213,27 @@ class AmadeusFlightAPI:
             print(f"Error getting price quote: {error}")
             return {}
     
-    def create_flight_order(self, flight_offer: Dict, travelers: List[Dict]) -> Dict:
+    def flight_price_quotes(self, flight_offers: List[Dict]) -> List[Optional[Dict]]:
+        """
+        Get confirmed price quotes for several flight offers at once.
+        
+        Args:
+            flight_offers: Flight offers from search results
+            
+        Returns:
+            The priced offer for each input offer, in the same order (None if it could not be priced)
+        """
+        # Fares confirmed in the last few minutes are not priced again
+        return price_offers(self.amadeus, flight_offers, cache=self.price_quotes)
+    
+    def create_flight_order(self, flight_offer: Dict, travelers: List[Dict], idempotency_key: Optional[str] = None) -> Dict:
         """
         Create a flight order (booking) but don't confirm payment.
         
         Args:
             flight_offer: Flight offer to book
             travelers: List of traveler information dictionaries
+            idempotency_key: Retrying with the same key returns the first order instead of booking again
             
         Returns:
             Order creation response
@@ -266,16 +289,12 @@ class AmadeusFlightAPI:
             # response = self.amadeus.booking.flight_orders.post(booking_data)
             # return response.data
             
-            # For testing purposes, we'll return a mock response:
-            return {
-                "id": "mock-order-id-123456",
-                "status": "UNCONFIRMED",
-                "flightOffers": [flight_offer],
-                "travelers": travelers,
-                "message": "This is a mock order creation response for testing"
-            }
+            # For testing purposes, the order is created in the local mock order engine:
+            order = self.orders.create(flight_offer, travelers, idempotency_key)
+            order["message"] = "This is a mock order creation response for testing"
+            return order
             
-        except ResponseError as error:
+        except (ResponseError, IdempotencyConflict) as error:
             print(f"Error creating order: {error}")
             return {}
 
@@ -468,7 +487,8 @@ class AmadeusFlightAPI:
             booking_result = self.create_flight_order(selected_flight, travelers)
             
             print("\n=== BOOKING CONFIRMATION ===")
-            print(f"Booking Reference: {booking_result.get('id', 'N/A')}")
+            records = booking_result.get('associatedRecords') or [{}]
+            print(f"Booking Reference: {records[0].get('reference', 'N/A')} (order {booking_result.get('id', 'N/A')})")
             print(f"Status: {booking_result.get('status', 'N/A')}")
             print("\nNOTE: This is a test booking only, no actual reservation has been made.")
             print("In a real implementation, you would proceed to payment here.")
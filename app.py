@@ -1,14 +1,28 @@
-from fastapi import FastAPI, HTTPException, Body, HTTPException, Form
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from fastapi import FastAPI, HTTPException, Body, HTTPException, Form, Request
+from pydantic import BaseModel, Field
+from typing import Dict, Any, List, Optional
 import uvicorn
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from serializer import dumps_bytes
+import os
 import time
-from agent import run_agent
+import uuid
+import asyncio
+from agent import run_agent, turn_stats, gemini_quota, sessions, response_cache, router
+from tools import search_cache, prefetcher, amadeus_quota, single_flight, price_quotes, orders, price_history, price_watcher
+from quota import QuotaExceeded
+from deadline import deadline_stats
+from reference_data import reference
 # Existing agent logic
 
-app = FastAPI(title="Agent API", description="API for an intelligent agent", version="1.0.0")
+class FastJSONResponse(JSONResponse):
+    """JSONResponse encoded with the fast serializer (orjson/msgspec when available)"""
+    def render(self, content) -> bytes:
+        return dumps_bytes(content)
+
+app = FastAPI(title="Agent API", description="API for an intelligent agent", version="1.0.0",
+              default_response_class=FastJSONResponse)
 
 # CORS Middleware
 app.add_middleware(
@@ -21,42 +35,115 @@ app.add_middleware(
 
 class AgentRequest(BaseModel):
     query: str
+    session_id: Optional[str] = None  # conversation and quota are per session (a new one when missing)
+    # time budget of the turn, at most AGENT_DEADLINE_SECONDS (the default)
+    deadline_seconds: Optional[float] = Field(default=None, gt=0)
     # context: Optional[Dict[str, Any]] = None
 
 class AgentResponse(BaseModel):
     result: str
     status: str
     execution_time: Optional[float] = None
+    session_id: Optional[str] = None  # send it back to continue the conversation
+    alerts: List[dict] = []  # price watch alerts of this session since its last reply
+
+# Price history upkeep: chunks written and compacted every few minutes, and on shutdown
+PRICE_HISTORY_MAINTAIN_SECONDS = float(os.getenv("PRICE_HISTORY_MAINTAIN_SECONDS", "300"))
+
+async def maintain_price_history():
+    while True:
+        await asyncio.sleep(PRICE_HISTORY_MAINTAIN_SECONDS)
+        try:
+            await asyncio.to_thread(price_history.maintain)
+        except Exception as e:
+            print(f"Price history maintenance failed: {e}")
+
+@app.on_event("startup")
+async def start_background_tasks():
+    app.state.price_history_task = asyncio.create_task(maintain_price_history())
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    app.state.price_history_task.cancel()
+    price_history.flush()
 
 # @app.post("/agent", response_model = AgentResponse)
 @app.get("/")
 def read_root():
     return {"message": "Travel Assistant Backend Working!"}
 
+# How often a running turn checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 0.5
+
+async def run_while_connected(coro, http_request: Request):
+    """Await `coro`, cancelling it when the client disconnects (run_agent then stops its upstream calls)"""
+    task = asyncio.create_task(coro)
+    while True:
+        done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+        if done:
+            return task.result()
+        if await http_request.is_disconnected():
+            task.cancel()
+            # 499: client closed request (nobody reads the response)
+            raise HTTPException(status_code=499, detail="Client disconnected")
+
 @app.post("/agent")
 
-async def Agent(request: AgentRequest):
+async def Agent(request: AgentRequest, http_request: Request):
     print(f"Type of query: {type(request.query)}")
     try:
         start_time = time.time()
+        # never derived from the client address: clients behind one NAT or proxy would share a conversation
+        session_id = request.session_id or uuid.uuid4().hex
+        gemini_quota.check_admission()
         
         # result = f"Processed: {request.query}"
-        result = await run_agent(request.query)
+        result = await run_while_connected(run_agent(request.query, session_id, request.deadline_seconds), http_request)
         execution_time = time.time() - start_time
         
         return AgentResponse(
             result=result,
             status="success",
-            execution_time=execution_time)
+            execution_time=execution_time,
+            session_id=session_id,
+            alerts=price_watcher.notifier.pop(session_id))
 
         
+    except HTTPException:
+        raise
+    except QuotaExceeded as e:
+        print(e)
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(max(1, round(e.retry_after)))})
     except Exception as e:
         print(e)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/alerts/{session_id}")
+async def alerts(session_id: str):
+    """Price watch alerts of a session not delivered yet (they are also returned with the next /agent reply)"""
+    return {"alerts": price_watcher.notifier.pop(session_id)}
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics():
+    return {
+        "search_cache": search_cache.stats,
+        "prefetch": prefetcher.report(),
+        "single_flight": single_flight.stats,
+        "price_watch": {**price_watcher.stats, "watches": len(price_watcher.watches)},
+        "pricing": price_quotes.report(),
+        "orders": orders.report(),
+        "agent_turns": turn_stats.report(),
+        "model_routing": router.report(),
+        "sessions": sessions.report(),
+        "response_cache": response_cache.report(),
+        "deadlines": deadline_stats.report(),
+        "reference_data": reference.stats(),
+        "quota": {"amadeus": amadeus_quota.report(), "gemini": gemini_quota.report()},
+    }
+
 if __name__ == "__main__":
     uvicorn.run("app:app", host="127.0.0.1", port=8000 , reload = True)
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""
+End-to-end latency / throughput benchmark for POST /agent.
+
+The FastAPI app runs in-process (httpx ASGI transport, no sockets). Gemini is
+replaced by a scripted fake model and the Amadeus client by a fake with
+injected latency, so the numbers describe our own code: FastAPI, the agent
+executor, the tools, parsing, caching and serialization.
+
+    python -m benchmarks.bench_agent_e2e
+    python -m benchmarks.bench_agent_e2e --llm-latency 0 --amadeus-latency 0   # pure overhead
+    python -m benchmarks.bench_agent_e2e --concurrency 1,4,16,64 --conversations 50 --output e2e.json
+
+Reports p50/p95/p99 per concurrency level and the highest QPS whose p95 stays
+under --slo seconds.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import statistics
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+# The fake Amadeus has no rate limit; keep the shared quota out of the way unless asked for
+os.environ.setdefault("AMADEUS_RATE", "10000")
+os.environ.setdefault("AMADEUS_SESSION_RATE", "10000")
+# Every conversation opens with the same message; measure the agent, not the response cache
+os.environ.setdefault("RESPONSE_CACHE_TTL", "0")
+
+import httpx
+
+import agent
+import tools
+from app import app
+from benchmarks.fakes import CONVERSATION, SCRIPTS, FakeAmadeus, ScriptedChatModel, scripted_query
+
+
+def percentile(values: list, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, conversations: int, dates: int) -> dict:
+    """Run `conversations` multi-turn conversations with `concurrency` in flight at once"""
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for n in range(conversations):
+        queue.put_nowait(n)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            n = queue.get_nowait()
+            # Spread conversations over a few dates so the search cache sees both hits and misses
+            day = (date.today() + timedelta(days=30 + n % dates)).isoformat()
+            for script in CONVERSATION:
+                started = time.perf_counter()
+                response = await client.post("/agent", json={"query": scripted_query(script, "benchmark turn", day),
+                                                             "session_id": f"conversation-{n}"})
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "qps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,2,4,8,16,32")
+    parser.add_argument("--conversations", type=int, default=32, help="conversations per concurrency level")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per fake model call")
+    parser.add_argument("--amadeus-latency", type=float, default=0.4, help="seconds per fake Amadeus call")
+    parser.add_argument("--offers", type=int, default=50, help="offers per fake search response")
+    parser.add_argument("--dates", type=int, default=10, help="distinct departure dates used")
+    parser.add_argument("--slo", type=float, default=5.0, help="p95 target in seconds for max sustainable QPS")
+    parser.add_argument("--output", help="also write the report as JSON")
+    args = parser.parse_args()
+
+    tools.amadeus = FakeAmadeus(latency=args.amadeus_latency, offers=args.offers)
+    model = ScriptedChatModel(latency=args.llm_latency)
+    agent.agent_executor = agent.build_agent_executor(model, verbose=False)
+    # One fake model behind every routing tier
+    agent.router.executors = {tier: agent.agent_executor for tier in agent.router.executors}
+
+    levels = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for concurrency in (int(c) for c in args.concurrency.split(",")):
+            # The app prints a lot per request; keep it (it is part of our overhead) but not on screen
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                level = await run_level(client, concurrency, args.conversations, args.dates)
+            levels.append(level)
+            print(f"c={level['concurrency']:>3}  qps={level['qps']:>7}  p50={level['p50_ms']:>8}ms  "
+                  f"p95={level['p95_ms']:>8}ms  p99={level['p99_ms']:>8}ms  errors={level['errors']}")
+
+    sustainable = [l["qps"] for l in levels if l["p95_ms"] <= args.slo * 1000 and not l["errors"]]
+    llm_calls_per_turn = sum(len(SCRIPTS[s]) for s in CONVERSATION) / len(CONVERSATION)
+    report = {
+        "settings": vars(args),
+        "levels": levels,
+        "max_sustainable_qps": max(sustainable, default=0),
+        "llm_calls_per_turn": llm_calls_per_turn,
+        "amadeus_calls": tools.amadeus.counts,
+        "llm_calls": model.calls,
+    }
+    print(f"Max sustainable QPS (p95 <= {args.slo}s): {report['max_sustainable_qps']}")
+    print(f"Fake model calls: {model.calls}, fake Amadeus calls: {tools.amadeus.counts}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
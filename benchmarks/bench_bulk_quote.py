@@ -0,0 +1,80 @@
+"""
+Bulk quoting throughput against the fake Amadeus: rows per second by number
+of workers, and resuming a run that was interrupted halfway.
+
+Trips repeat (a travel desk books the same routes and dates for many
+travelers), so the search cache and single-flight coalescing matter as much
+as concurrency.
+
+    python -m benchmarks.bench_bulk_quote --rows 500 --latency 0.2
+"""
+import argparse
+import contextlib
+import csv
+import os
+import tempfile
+
+from api import AmadeusFlightAPI
+from benchmarks.fakes import FakeAmadeus
+from bulk_quote import quote_file
+
+ROUTES = [("JFK", "LAX"), ("SFO", "ORD"), ("BOS", "MIA"), ("SEA", "DEN"), ("ATL", "DFW"), ("LAX", "JFK")]
+
+
+def write_trips(path: str, rows: int, dates: int):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["trip_id", "origin", "destination", "departure_date", "adults", "direct_only"])
+        writer.writeheader()
+        for n in range(rows):
+            origin, destination = ROUTES[n % len(ROUTES)]
+            writer.writerow({
+                "trip_id": f"T{n:05d}", "origin": origin, "destination": destination,
+                "departure_date": f"2026-12-{1 + n // len(ROUTES) % dates:02d}", "adults": 1,
+                # Some travelers want nonstop only: answered from the cached search of the same trip
+                "direct_only": "yes" if n % 7 == 0 else "",
+            })
+
+
+def run(trips: str, output: str, latency: float, workers: int, rate: float) -> tuple:
+    api = AmadeusFlightAPI("benchmark", "benchmark", rate=rate)
+    api.amadeus = FakeAmadeus(latency=latency, offers=50)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        stats = quote_file(trips, output, api.search_offers, workers=workers)
+    return stats, api.amadeus.counts.get("flight_offers_search", 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--dates", type=int, default=20, help="distinct departure dates")
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per fake Amadeus search")
+    parser.add_argument("--rate", type=float, default=10, help="Amadeus searches per second")
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="bench-bulk-")
+    trips = os.path.join(directory, "trips.csv")
+    write_trips(trips, args.rows, args.dates)
+
+    print(f"{args.rows} rows, {len(ROUTES) * args.dates} distinct trips, {args.latency}s per search, {args.rate}/s rate limit")
+    for workers in (1, 4, 16):
+        output = os.path.join(directory, f"quotes-{workers}.csv")
+        stats, searches = run(trips, output, args.latency, workers, args.rate)
+        print(f"workers={workers:>3}  {stats['rows_per_second']:>8,.1f} rows/s  {stats['seconds']:>6.1f}s"
+              f"  searches={searches}  ok={stats['ok']}")
+
+    # Interrupted run: the first half of the trips quoted, the last row cut off mid-line, then the full file resumed
+    half = os.path.join(directory, "half.csv")
+    with open(trips) as f:
+        lines = f.readlines()
+    with open(half, "w") as f:
+        f.writelines(lines[: 1 + args.rows // 2])
+    output = os.path.join(directory, "resumed.jsonl")
+    run(half, output, args.latency, 16, args.rate)
+    with open(output, "rb+") as f:
+        f.truncate(f.seek(0, os.SEEK_END) - 40)
+    stats, searches = run(trips, output, args.latency, 16, args.rate)
+    print(f"resume:      skipped={stats['skipped']}  quoted={stats['quoted']}  searches={searches}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+Memory per 1,000 offers and decode time: models.Offer against the dict shapes
+(raw Amadeus offers, parse_flight_offer summaries, offer_details views).
+
+    python -m benchmarks.bench_offer_model
+"""
+import gc
+import tracemalloc
+
+from benchmarks.harness import measure
+from benchmarks.payloads import VARIANTS, search_response
+from models import decode_offer
+from serializer import dumps_bytes, loads
+from util import offer_details, parse_flight_offer
+
+COUNT = 1000
+
+
+def retained_kib(build) -> float:
+    """KiB still allocated once `build()` has returned (i.e. the size of what it built)"""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return round(size / 1024, 1)
+
+
+def main():
+    print(f"{'variant':<10} {'representation':<28} {'KiB / 1000 offers':>18} {'us / offer':>11}")
+    for variant, shape in VARIANTS.items():
+        encoded = dumps_bytes(search_response(COUNT, **shape)["data"])
+        raw = loads(encoded)
+        rows = {
+            # Fresh copies are decoded from bytes so no strings are shared with `raw`
+            "raw Amadeus dicts": (lambda: loads(encoded), None),
+            "parse_flight_offer dicts": (lambda: [parse_flight_offer(o) for o in loads(encoded)],
+                                         lambda: [parse_flight_offer(o) for o in raw]),
+            "offer_details dicts": (lambda: [offer_details(o) for o in loads(encoded)],
+                                    lambda: [offer_details(o) for o in raw]),
+            "models.Offer": (lambda: [decode_offer(o) for o in loads(encoded)],
+                             lambda: [decode_offer(o) for o in raw]),
+        }
+        for name, (build, parse) in rows.items():
+            # The raw dicts are dropped after `build`, only what the result keeps alive counts
+            kib = retained_kib(build)
+            us = f"{measure(parse, repeat=3)['us_per_op'] / COUNT:>11.2f}" if parse else f"{'-':>11}"
+            print(f"{variant:<10} {name:<28} {kib:>18,.1f} {us}")
+
+
+if __name__ == "__main__":
+    main()
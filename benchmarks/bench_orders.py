@@ -0,0 +1,78 @@
+"""
+Mock order engine throughput: concurrent bookings per second (with and without
+the order log), idempotent retries and lookups. Checks that no two orders got
+the same booking reference.
+
+    python -m benchmarks.bench_orders
+"""
+import os
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.payloads import flight_offer
+from orders import MockOrderEngine
+
+ORDERS = 20000
+THREADS = 8
+
+
+def travelers(n: int) -> list:
+    return [{"id": "1", "name": {"firstName": "ALEX", "lastName": f"TRAVELER{n % 500}"}}]
+
+
+def book_all(engine: MockOrderEngine, offers: list, keys: bool) -> float:
+    """Seconds to book ORDERS orders from THREADS threads"""
+    def book(n):
+        return engine.create(offers[n % len(offers)], travelers(n), f"session-{n}" if keys else None)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        orders = list(pool.map(book, range(ORDERS)))
+    elapsed = time.perf_counter() - started
+    references = {order["associatedRecords"][0]["reference"] for order in orders}
+    assert len(references) == ORDERS, "duplicate booking references"
+    return elapsed
+
+
+def rate(count: int, seconds: float) -> str:
+    return f"{count / seconds:>12,.0f}/s"
+
+
+def main():
+    offers = [flight_offer(i) for i in range(50)]
+    directory = tempfile.mkdtemp(prefix="bench-orders-")
+
+    print(f"{ORDERS} orders from {THREADS} threads")
+    engine = MockOrderEngine()
+    print(f"create, memory only          {rate(ORDERS, book_all(engine, offers, keys=False))}")
+    engine = MockOrderEngine()
+    print(f"create, idempotency keys     {rate(ORDERS, book_all(engine, offers, keys=True))}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        retried = list(pool.map(lambda n: engine.create(offers[n % len(offers)], travelers(n), f"session-{n}"), range(ORDERS)))
+    assert all(order.get("replayed") for order in retried)
+    print(f"retry, same key              {rate(ORDERS, time.perf_counter() - started)}")
+
+    references = [order["associatedRecords"][0]["reference"] for order in retried]
+    started = time.perf_counter()
+    for reference in references:
+        engine.get(reference)
+    print(f"lookup by reference          {rate(ORDERS, time.perf_counter() - started)}")
+
+    path = os.path.join(directory, "orders.log")
+    logged = MockOrderEngine(path)
+    print(f"create, with order log       {rate(ORDERS, book_all(logged, offers, keys=True))}")
+    logged.close()
+
+    started = time.perf_counter()
+    reloaded = MockOrderEngine(path)
+    print(f"replay log on start          {rate(ORDERS, time.perf_counter() - started)}"
+          f"  ({os.path.getsize(path) / 1024 / 1024:.1f} MiB)")
+    assert reloaded.report()["orders"] == ORDERS
+    reloaded.close()
+
+
+if __name__ == "__main__":
+    main()
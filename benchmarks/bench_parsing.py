@@ -0,0 +1,97 @@
+"""
+Benchmarks for the parsing and formatting hot paths, on fixed payloads of
+1, 10 and 250 offers (one-way, round trip and multi-segment round trip).
+
+Run from the repository root:
+
+    python -m benchmarks.bench_parsing            # compare against benchmarks/baselines/parsing.json
+    python -m benchmarks.bench_parsing --save     # record a new baseline
+    python -m benchmarks.bench_parsing --check    # exit 1 on a >30% ops/sec regression
+"""
+import json
+from datetime import datetime, timedelta
+
+import serializer
+from api import AmadeusFlightAPI
+from benchmarks.harness import main
+from benchmarks.payloads import SIZES, VARIANTS, pricing_response, search_response
+from models import decode_offer, top_offers
+from offer_times import duration_minutes, offer_times
+from util import parse_flight_offer, parse_pricing_offer
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MINUTE = timedelta(minutes=1)
+
+
+def times_per_item(offers: list) -> list:
+    """
+    The one-at-a-time alternative to offer_times: datetime.fromisoformat per timestamp,
+    for the same columns (duration, departure, arrival, layover, longest layover, overnight)
+    """
+    rows = []
+    for offer in offers:
+        total = layover = longest = 0
+        overnight = False
+        for itinerary in offer["itineraries"]:
+            total += duration_minutes(itinerary["duration"])
+            previous = None
+            for segment in itinerary["segments"]:
+                leaves = datetime.fromisoformat(segment["departure"]["at"])
+                lands = datetime.fromisoformat(segment["arrival"]["at"])
+                overnight = overnight or leaves.date() != lands.date()
+                if previous is not None:
+                    overnight = overnight or previous.date() != leaves.date()
+                    gap = (leaves - previous) // _MINUTE
+                    layover += gap
+                    longest = max(longest, gap)
+                previous = lands
+        first = offer["itineraries"][0]["segments"]
+        rows.append((total, (datetime.fromisoformat(first[0]["departure"]["at"]) - _EPOCH) // _MINUTE,
+                     (datetime.fromisoformat(first[-1]["arrival"]["at"]) - _EPOCH) // _MINUTE,
+                     layover, longest, overnight))
+    return rows
+
+
+def same_times(offers: list) -> bool:
+    """offer_times and times_per_item agree, so the two cases time the same work"""
+    times = offer_times(offers)
+    columns = zip(times.duration, times.departure, times.arrival, times.layover, times.longest_layover, times.overnight)
+    return [(*row[:5], bool(row[5])) for row in columns] == times_per_item(offers)
+
+
+def build_cases() -> dict:
+    # Only the pure helpers are used, so skip creating an Amadeus client
+    flight_api = AmadeusFlightAPI.__new__(AmadeusFlightAPI)
+    cases = {}
+    for variant, shape in VARIANTS.items():
+        pricing = pricing_response(**shape)
+        cases[f"parse_pricing_offer/{variant}"] = lambda pricing=pricing: parse_pricing_offer(pricing)
+
+        for size in SIZES:
+            offers = search_response(size, **shape)["data"]
+            decoded = [decode_offer(offer) for offer in offers]
+            parsed = [parse_flight_offer(offer) for offer in offers]
+            detailed = [flight_api.get_detailed_flight_info(offer) for offer in offers]
+            name = f"{variant}/{size}"
+
+            cases[f"parse_flight_offer/{name}"] = lambda offers=offers: [parse_flight_offer(o) for o in offers]
+            # The tools decode once per search and build the summaries from the decoded offers
+            cases[f"decode_offer/{name}"] = lambda offers=offers: [decode_offer(o) for o in offers]
+            cases[f"parse_flight_offer_decoded/{name}"] = lambda decoded=decoded: [parse_flight_offer(o) for o in decoded]
+            # What search_flights does with a response: rank, decode the 10 shown offers, summarise
+            cases[f"search_result_top10/{name}"] = lambda offers=offers: [parse_flight_offer(o) for o in top_offers(offers, 10)]
+            cases[f"search_result_eager/{name}"] = lambda offers=offers: [parse_flight_offer(o) for o in offers][:10]
+            assert same_times(offers), f"offer_times and times_per_item disagree on {name}"
+            cases[f"offer_times/{name}"] = lambda offers=offers: offer_times(offers)
+            cases[f"offer_times_fromisoformat/{name}"] = lambda offers=offers: times_per_item(offers)
+            cases[f"get_detailed_flight_info/{name}"] = lambda offers=offers: [flight_api.get_detailed_flight_info(o) for o in offers]
+            cases[f"format_flight_for_display/{name}"] = lambda detailed=detailed: [flight_api.format_flight_for_display(d) for d in detailed]
+            # What the tools hand to the model, and LangChain's own fallback for non-string results
+            cases[f"tool_result_serialization/{name}"] = lambda parsed=parsed: serializer.dumps(parsed)
+            cases[f"tool_result_serialization_stdlib/{name}"] = lambda parsed=parsed: json.dumps(parsed, ensure_ascii=False)
+    return cases
+
+
+if __name__ == "__main__":
+    main("parsing", build_cases(), __doc__)
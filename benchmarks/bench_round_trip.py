@@ -0,0 +1,73 @@
+"""
+Round-trip pairing at 250 x 250 one-way offers (the Amadeus maximum per search):
+best-first pairing with pruning (round_trip.pair_rows) against the full
+cross-join of every outbound with every return, for the same top K. Both
+start from the same parsed rows; parsing the two searches is timed apart.
+
+Prices are shuffled so the cheapest outbound is not always the earliest,
+and the return is on the same day with a minimum stay (a day trip), where
+the constraint rules out the most pairs.
+
+    python -m benchmarks.bench_round_trip
+    python -m benchmarks.bench_round_trip --offers 250 --k 1,10,50 --repeat 20
+"""
+import argparse
+import heapq
+import random
+import time
+
+from benchmarks.payloads import flight_offer
+from round_trip import TimeWindow, _side, pair_rows
+
+
+def one_ways(origin: str, destination: str, day: str, count: int, rng: random.Random) -> list:
+    offers = [flight_offer(i, origin=origin, destination=destination, departure_date=day, segments=1 + i % 2)
+              for i in range(count)]
+    for offer in offers:
+        offer["price"]["total"] = f"{rng.uniform(80, 600):.2f}"
+    return offers
+
+
+def cross_join(out, back, k, min_stay) -> list:
+    """Every feasible pair, then the best k (the straightforward way)"""
+    return heapq.nsmallest(k, (o[0] + b[0] for o in out for b in back if b[3] - o[4] >= min_stay))
+
+
+def timed(fn, repeat: int) -> tuple:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--offers", type=int, default=250, help="offers per one-way search")
+    parser.add_argument("--k", default="1,10,50", help="pairs to return")
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    outbound = one_ways("JFK", "LAX", "2026-12-01", args.offers, rng)
+    inbound = one_ways("LAX", "JFK", "2026-12-01", args.offers, rng)
+    cases = [
+        ("price, no constraint", "price", 0, None, None),
+        ("price, 6h stay", "price", 360, None, None),
+        ("price, 6h stay + windows", "price", 360, TimeWindow(arrive_before="14:00"), TimeWindow(depart_after="15:00")),
+        ("duration, 6h stay", "duration", 360, None, None),
+    ]
+    print(f"{args.offers} x {args.offers} = {args.offers * args.offers:,} candidate pairs")
+    for label, sort_by, stay, out_window, back_window in cases:
+        parse_seconds, (out, back) = timed(
+            lambda: (_side(outbound, out_window, sort_by), _side(inbound, back_window, sort_by)), args.repeat)
+        print(f"{label}: parsing both searches {parse_seconds * 1000:.2f}ms, {len(out)} x {len(back)} rows")
+        for k in (int(v) for v in args.k.split(",")):
+            pruned_seconds, (pairs, examined) = timed(lambda: pair_rows(out, back, k, stay, None, sort_by), args.repeat)
+            full_seconds, expected = timed(lambda: cross_join(out, back, k, stay), args.repeat)
+            same = [round(cost, 6) for cost, _, _ in pairs] == [round(c, 6) for c in expected]
+            print(f"  k={k:<3} pruned {pruned_seconds * 1000:>8.3f}ms ({examined:>5} pairs examined)  "
+                  f"cross-join {full_seconds * 1000:>8.3f}ms  speedup {full_seconds / pruned_seconds:>6.1f}x  same top-k: {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Model routing: cost of classifying a turn, and a replay of scripted
+conversations with routing off (every turn on the standard model) and on.
+Most turns of the corpus are slot-filling, as in production traffic.
+
+Each tier is a scripted fake model with its own latency, and token prices
+are those of agent.MODEL_PRICES, so the replay shows what routing saves in
+time and money. As in agent.py, the reasoning tier only has its own model
+with MODEL_REASONING set (or --reasoning-model); otherwise escalated turns
+run on the standard model. The per-tier breakdown shows what each tier costs.
+Classification accuracy is measured against hand labels.
+
+Conversations run `--concurrency` at a time. The agent loop around the fake
+models costs real CPU (about 10ms a turn); with too many conversations at
+once the event loop saturates, every turn waits on it, and latencies measure
+the host instead of the models. Each replay prints its CPU use; keep it well
+under 100% when comparing latencies.
+
+    python -m benchmarks.bench_routing --conversations 40
+    python -m benchmarks.bench_routing --fast-latency 0.1 --standard-latency 0.4
+    python -m benchmarks.bench_routing --reasoning-model --reasoning-latency 1.5
+"""
+import argparse
+import asyncio
+import contextlib
+import os
+import statistics
+import time
+
+os.environ.setdefault("GEMINI_API_KEY", "benchmark-fake-key")
+os.environ.setdefault("AMADEUS_RATE", "10000")
+os.environ.setdefault("AMADEUS_SESSION_RATE", "10000")
+os.environ.setdefault("GEMINI_RATE", "10000")
+os.environ.setdefault("GEMINI_SESSION_RATE", "10000")
+os.environ.setdefault("RESPONSE_CACHE_TTL", "0")
+
+import agent
+import tools
+from benchmarks.fakes import FakeAmadeus, ScriptedChatModel, scripted_query
+from routing import FAST, REASONING, STANDARD, TIERS, ModelRouter, classify_turn
+
+# Conversations as (script, user message, tier it should go to)
+CONVERSATIONS = [
+    [
+        ("slots", "hi", FAST),
+        ("slots", "I need a flight from New York to Los Angeles", STANDARD),
+        ("resolve", "JFK to LAX please", FAST),
+        ("search", "December 1st, just me", FAST),
+        ("trend", "is that a good price or should I wait?", STANDARD),
+    ],
+    [
+        ("search", "cheap nonstop flights from NYC to LA on december 1 for one adult", STANDARD),
+        ("trend", "what about the day after?", FAST),
+        ("slots", "thanks", FAST),
+    ],
+    [
+        ("multi", "compare all New York airports to the Bay Area, which one is cheaper?", REASONING),
+        ("search", "ok, the first one", FAST),
+        ("slots", "economy, 2 adults", FAST),
+    ],
+    [
+        ("slots", "looking for a flight to Miami", STANDARD),
+        ("resolve", "from Boston", FAST),
+        ("search", "next Friday, one way", FAST),
+        ("slots", "nonstop only", FAST),
+        ("slots", "great, thanks", FAST),
+    ],
+    [
+        ("search", "flights from Chicago to Denver tomorrow morning", STANDARD),
+        ("trend", "any cheaper in the afternoon", FAST),
+        ("slots", "ok book the 2pm one", FAST),
+    ],
+    [
+        ("search", "Fly JFK to LAX on the 3rd, then LAX to SFO on the 6th and back to JFK on the 9th", REASONING),
+        ("slots", "yes", FAST),
+    ],
+]
+
+
+def bench_classify(rounds: int) -> tuple:
+    turns = [(n > 0, text, tier) for conversation in CONVERSATIONS for n, (_, text, tier) in enumerate(conversation)]
+    correct = sum(classify_turn(text, follow_up)[0] == tier for follow_up, text, tier in turns)
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for follow_up, text, _ in turns:
+            classify_turn(text, follow_up)
+    per_call = (time.perf_counter() - started) / (rounds * len(turns))
+    return per_call, correct, len(turns)
+
+
+async def replay(router: ModelRouter, conversations: int, label: str, concurrency: int) -> list:
+    agent.router = router
+    latencies = []
+    slots = asyncio.Semaphore(concurrency)
+
+    async def conversation(n):
+        async with slots:
+            for script, text, _ in CONVERSATIONS[n % len(CONVERSATIONS)]:
+                started = time.perf_counter()
+                await agent.run_agent(scripted_query(script, text), f"{label}-{n}")
+                latencies.append(time.perf_counter() - started)
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        await asyncio.gather(*(conversation(n) for n in range(conversations)))
+    return latencies
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--conversations", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8, help="conversations running at once")
+    parser.add_argument("--fast-latency", type=float, default=0.1, help="seconds per fake fast-model call")
+    parser.add_argument("--standard-latency", type=float, default=0.4, help="seconds per fake standard-model call")
+    parser.add_argument("--reasoning-latency", type=float, default=1.5, help="seconds per fake reasoning-model call")
+    parser.add_argument("--reasoning-model", action="store_true", help="give the reasoning tier its own model")
+    parser.add_argument("--rounds", type=int, default=20000, help="classification rounds over the corpus")
+    args = parser.parse_args()
+
+    per_call, correct, total = bench_classify(args.rounds)
+    print(f"classify_turn: {per_call * 1e6:.2f} us per turn, {correct}/{total} turns on the labelled tier")
+
+    tools.amadeus = FakeAmadeus(latency=0.0, offers=20)
+    latency = {FAST: args.fast_latency, STANDARD: args.standard_latency, REASONING: args.reasoning_latency}
+    tiers = TIERS if args.reasoning_model else tuple(agent.router.executors)
+    executors = {tier: agent.build_agent_executor(ScriptedChatModel(latency=latency[tier]), verbose=False) for tier in tiers}
+    prices = agent.router.prices
+    for enabled in (False, True):
+        router = ModelRouter(executors, prices=prices, enabled=enabled)
+        label = "routed" if enabled else "standard-only"
+        cpu_started, wall_started = time.process_time(), time.perf_counter()
+        latencies = await replay(router, args.conversations, label, args.concurrency)
+        cpu = (time.process_time() - cpu_started) / (time.perf_counter() - wall_started)
+        report = router.report()
+        cost = sum(t["cost_usd"] for t in report["tiers"].values())
+        llm_seconds = sum(t["llm_seconds"] for t in report["tiers"].values())
+        tiers = "  ".join(f"{tier}={t['turns']} (${t['cost_usd']:.5f}, p95={t['p95_seconds'] * 1000:.0f}ms)"
+                          for tier, t in report["tiers"].items() if t["turns"])
+        overhead = report["avg_classify_us"] / 1e6 / statistics.mean(latencies)
+        print(f"{label:>14}: {len(latencies)} turns  mean={statistics.mean(latencies) * 1000:>7.1f}ms  "
+              f"p95={sorted(latencies)[int(0.95 * (len(latencies) - 1))] * 1000:>7.1f}ms  "
+              f"model={llm_seconds:>6.1f}s  cost=${cost:.5f}  routing overhead={report['avg_classify_us']:.1f}us "
+              f"({overhead:.5%} of a turn)  cpu={cpu:.0%}\n{'':>16}turns by tier: {tiers}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,57 @@
+"""
+Session checkpoints: size, and restore time for large sessions, per store.
+Restore is what a fresh instance pays on a session's first request: read the
+checkpoint, decode it and build the chat history for the prompt.
+
+    python -m benchmarks.bench_sessions
+"""
+import os
+import tempfile
+
+from benchmarks.harness import measure
+from serializer import dumps_bytes
+from sessions import (FileSessionStore, MemorySessionStore, Session, SQLiteSessionStore, decode_session,
+                      encode_session)
+
+TURNS = (10, 100, 1000)
+
+QUESTION = "Find me a flight from New York to Los Angeles on 2025-03-14 for 2 adults, nonstop, under $400"
+ANSWER = (
+    "Here are the cheapest nonstop options:\n"
+    "1. American Airlines AA 1 departing JFK 08:00, arriving LAX 11:25, 6h25m, $312.40 (offer_ref OF3A9C1D2E4F)\n"
+    "2. Delta Air Lines DL 412 departing JFK 10:15, arriving LAX 13:50, 6h35m, $329.10 (offer_ref OF7B2E9A0C11)\n"
+    "3. JetBlue Airways B6 23 departing JFK 17:30, arriving LAX 20:52, 6h22m, $341.00 (offer_ref OF0D4C7F2B93)\n"
+    "Would you like me to confirm any of these prices?"
+)
+
+
+def large_session(turns: int) -> Session:
+    session = Session("benchmark")
+    for turn in range(turns):
+        session.messages.append(["h", f"{QUESTION} (turn {turn})"])
+        session.messages.append(["a", ANSWER])
+    session.slots = {"origin": "JFK", "destination": "LAX", "departure_date": "2025-03-14", "adults": 2}
+    session.offer_refs = [f"OF{n:010X}" for n in range(50)]
+    return session
+
+
+def main():
+    directory = tempfile.mkdtemp(prefix="bench-sessions-")
+    stores = {
+        "memory": MemorySessionStore(),
+        "file": FileSessionStore(directory),
+        "sqlite": SQLiteSessionStore(os.path.join(directory, "sessions.db")),
+    }
+    print(f"{'turns':>6} {'store':<8} {'raw KiB':>8} {'checkpoint KiB':>15} {'save us':>10} {'restore us':>11}")
+    for turns in TURNS:
+        session = large_session(turns)
+        raw_kib = len(dumps_bytes({"m": session.messages, "s": session.slots, "o": session.offer_refs})) / 1024
+        for name, store in stores.items():
+            save = measure(lambda: store.save("benchmark", encode_session(session)), repeat=3)
+            restore = measure(lambda: decode_session("benchmark", store.load("benchmark")).history(), repeat=3)
+            print(f"{turns:>6} {name:<8} {raw_kib:>8.1f} {len(encode_session(session)) / 1024:>15.1f}"
+                  f" {save['us_per_op']:>10,.1f} {restore['us_per_op']:>11,.1f}")
+
+
+if __name__ == "__main__":
+    main()
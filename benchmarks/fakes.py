@@ -0,0 +1,184 @@
+"""
+Stand-ins for the third-party services so benchmarks measure our own code.
+
+ScriptedChatModel replaces ChatGoogleGenerativeAI: every user message starts
+with a script tag such as "[search]" and the model replays that script's
+tool-call sequence. It is stateless (the step is derived from the messages), so
+one instance can serve any number of concurrent conversations.
+
+FakeAmadeus replaces the `amadeus` client in tools.py with fixed payloads and
+an injected latency per call.
+"""
+import asyncio
+import json
+import re
+import threading
+import time
+from typing import Any, List
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from benchmarks.payloads import pricing_response, search_response
+
+SEARCH_ARGS = {"originLocationCode": "JFK", "destinationLocationCode": "LAX", "adults": 1}
+
+# Script tag -> model responses for one user turn. A list of tool calls is one
+# agent step (calls in the same step may run concurrently); a string is the final answer.
+SCRIPTS = {
+    "slots": [
+        "Sure! What date would you like to leave, and is this one-way or round trip?",
+    ],
+    "resolve": [
+        [("get_airport_code", {"city": "New York"}), ("get_airport_code", {"city": "Los Angeles"})],
+        "New York is served by JFK and Los Angeles by LAX. Shall I search for flights?",
+    ],
+    "search": [
+        [("collect_flight_info", {**SEARCH_ARGS, "departureDate": "{date}"}),
+         ("search_flights", {**SEARCH_ARGS, "departureDate": "{date}"})],
+        "Here are the cheapest flights I found:\n1. DL 915 07:00 → 10:10, nonstop, $189.40\n2. AA 107 07:35 → 10:45, nonstop, $193.20",
+    ],
+    "multi": [
+        [("search_flights_multi_airport", {"origins": "New York", "destinations": "Bay Area", "departureDate": "{date}"})],
+        "Across all New York and Bay Area airports the cheapest option is EWR → OAK at $176.10.",
+    ],
+    "trend": [
+        [("price_trend", {"originLocationCode": "JFK", "destinationLocationCode": "LAX", "departureDate": "{date}", "price": 190})],
+        "That's a good price: cheaper than most fares seen for this date.",
+    ],
+}
+
+# A typical conversation, one script per turn
+CONVERSATION = ["slots", "resolve", "search", "trend"]
+
+_TAG = re.compile(r"^\[(\w+)(?::([\d-]+))?\]")
+
+
+def scripted_query(script: str, text: str, date: str = "2026-12-01") -> str:
+    return f"[{script}:{date}] {text}"
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Fake chat model replaying SCRIPTS, optionally sleeping `latency` seconds
+    per call to imitate the real model.
+    """
+
+    latency: float = 0.0
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-fake"
+
+    def bind_tools(self, tools: Any, **kwargs: Any):
+        return self
+
+    def _next_message(self, messages: List[BaseMessage]) -> AIMessage:
+        # Step = number of model replies since the latest user message
+        for i in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[i], HumanMessage):
+                break
+        step = sum(isinstance(m, AIMessage) for m in messages[i + 1:])
+        match = _TAG.match(messages[i].content)
+        script, date = (match.group(1), match.group(2) or "2026-12-01") if match else ("slots", "2026-12-01")
+        reply = SCRIPTS[script][min(step, len(SCRIPTS[script]) - 1)]
+        self.calls += 1
+        # Token counts as Gemini reports them, roughly 4 characters per token
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        if isinstance(reply, str):
+            usage = {"input_tokens": input_tokens, "output_tokens": len(reply) // 4}
+            return AIMessage(content=reply, usage_metadata={**usage, "total_tokens": sum(usage.values())})
+        tool_calls = [
+            {"name": name, "args": json.loads(json.dumps(args).replace("{date}", date)), "id": f"call_{step}_{n}"}
+            for n, (name, args) in enumerate(reply)
+        ]
+        usage = {"input_tokens": input_tokens, "output_tokens": len(json.dumps(tool_calls)) // 4}
+        return AIMessage(content="", tool_calls=tool_calls, usage_metadata={**usage, "total_tokens": sum(usage.values())})
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._next_message(messages))])
+
+
+class FakeResponse:
+    def __init__(self, result: Any):
+        self.result = result
+        self.data = result["data"] if isinstance(result, dict) and "data" in result else result
+        self.body = json.dumps(result)
+        self.status_code = 200
+
+
+class _Endpoint:
+    def __init__(self, owner, name, handler):
+        self.owner, self.name, self.handler = owner, name, handler
+
+    def _call(self, *args, **kwargs):
+        self.owner._wait(self.name)
+        return self.handler(*args, **kwargs)
+
+    get = post = _call
+
+
+class _Namespace:
+    pass
+
+
+class FakeAmadeus:
+    """
+    Mimics the parts of amadeus.Client used by the app. Every call sleeps
+    `latency` seconds (on the calling thread, like the real blocking SDK).
+    """
+
+    def __init__(self, latency: float = 0.0, offers: int = 50):
+        self.latency = latency
+        self.offers = offers
+        self.counts = {}
+        self.responses = {}
+        self.lock = threading.Lock()
+
+        self.shopping = _Namespace()
+        self.shopping.flight_offers_search = _Endpoint(self, "flight_offers_search", self._search)
+        self.shopping.flight_offers = _Namespace()
+        self.shopping.flight_offers.pricing = _Endpoint(self, "pricing", self._price)
+        self.reference_data = _Namespace()
+        self.reference_data.locations = _Endpoint(self, "locations", self._locations)
+
+    def _wait(self, name: str):
+        with self.lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _search(self, body=None, **params):
+        if body is not None:
+            # POST search: one itinerary per originDestination
+            legs = tuple((o["originLocationCode"], o["destinationLocationCode"], o["departureDateTimeRange"]["date"])
+                         for o in body["originDestinations"])
+            if legs not in self.responses:
+                self.responses[legs] = FakeResponse(search_response(self.offers, legs=legs))
+            return self.responses[legs]
+        key = (params.get("originLocationCode", "JFK"), params.get("destinationLocationCode", "LAX"),
+               params.get("departureDate", "2026-12-01"), params.get("returnDate"))
+        # Build each payload once, so generating it isn't billed as our own time
+        if key not in self.responses:
+            self.responses[key] = FakeResponse(search_response(
+                self.offers, round_trip=bool(key[3]), origin=key[0], destination=key[1],
+                departure_date=key[2], return_date=key[3] or "2026-12-08",
+            ))
+        return self.responses[key]
+
+    def _price(self, body, **params):
+        """Confirms the posted offers (one or a list, like the SDK) at their search price"""
+        offers = body if isinstance(body, list) else [body]
+        return FakeResponse({"data": {**pricing_response(), "flightOffers": offers}})
+
+    def _locations(self, keyword: str = "", **params):
+        return FakeResponse({"data": [{"type": "location", "subType": "AIRPORT", "name": keyword.upper(), "iataCode": keyword[:3].upper()}]})
@@ -0,0 +1,96 @@
+"""
+Tiny benchmark harness: ops/sec via timeit, allocations via tracemalloc,
+and a JSON baseline file per suite so regressions show up in review.
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import timeit
+import tracemalloc
+
+BASELINE_DIR = os.path.join(os.path.dirname(__file__), "baselines")
+
+
+def measure(fn, repeat: int = 5) -> dict:
+    """Best-of-`repeat` ops/sec plus peak bytes and live blocks allocated by one call"""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    start_size, _ = tracemalloc.get_traced_memory()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    del result
+
+    return {"ops_per_sec": round(1 / best, 1), "us_per_op": round(best * 1e6, 2),
+            "peak_kib": round((peak - start_size) / 1024, 1), "allocated_blocks": blocks}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Cases whose ops/sec dropped more than `tolerance` (fraction) below the baseline"""
+    regressions = []
+    for name, result in results.items():
+        if name in baseline:
+            ratio = result["ops_per_sec"] / baseline[name]["ops_per_sec"]
+            result["vs_baseline"] = round(ratio, 2)
+            if ratio < 1 - tolerance:
+                regressions.append(name)
+    return regressions
+
+
+def report(results: dict):
+    width = max(len(name) for name in results)
+    print(f"{'case':<{width}}  {'ops/sec':>12}  {'us/op':>10}  {'peak KiB':>9}  {'blocks':>7}  {'vs base':>7}")
+    for name, r in results.items():
+        print(f"{name:<{width}}  {r['ops_per_sec']:>12,.1f}  {r['us_per_op']:>10,.2f}  {r['peak_kib']:>9,.1f}"
+              f"  {r['allocated_blocks']:>7}  {r.get('vs_baseline', ''):>7}")
+
+
+def main(suite: str, cases: dict, description: str = ""):
+    """
+    Command line entry point shared by the suites.
+
+    --filter SUBSTR  only run matching cases
+    --save           write the results as the new baseline
+    --check          exit 1 if a case regressed beyond --tolerance
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--filter", default="")
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--check", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.3)
+    args = parser.parse_args()
+
+    baseline_path = os.path.join(BASELINE_DIR, f"{suite}.json")
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+
+    results = {}
+    for name, fn in cases.items():
+        if args.filter in name:
+            results[name] = measure(fn)
+    regressions = compare(results, baseline, args.tolerance)
+    report(results)
+
+    if args.save:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        with open(baseline_path, "w") as f:
+            json.dump({**baseline, **{k: {kk: vv for kk, vv in v.items() if kk != "vs_baseline"} for k, v in results.items()}},
+                      f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline saved to {baseline_path}")
+    if regressions:
+        print(f"Regressed more than {args.tolerance:.0%}: {', '.join(regressions)}")
+        if args.check:
+            sys.exit(1)
@@ -0,0 +1,157 @@
+"""
+Fixed Amadeus payloads for benchmarks.
+
+The offer shape is copied from recorded Flight Offers Search / Flight Offers
+Price responses (test environment, JFK-LAX). Larger responses are built by
+varying carriers, times and prices deterministically, so every run sees exactly
+the same bytes.
+"""
+import copy
+from datetime import datetime, timedelta
+
+CARRIERS = ("DL", "AA", "UA", "B6", "AS", "NK", "F9", "WN")
+HUBS = ("ORD", "DEN", "ATL", "DFW", "PHX", "SLC", "MSP", "CLT")
+AIRCRAFT = ("321", "738", "7M8", "32Q", "220", "739")
+
+AMENITIES = [
+    {"description": "CHECKED BAG FIRST", "isChargeable": True, "amenityType": "BAGGAGE",
+     "amenityProvider": {"name": "BrandedFaresAmadeus"}},
+    {"description": "PRE RESERVED SEAT ASSIGNMENT", "isChargeable": True, "amenityType": "PRE_RESERVED_SEAT",
+     "amenityProvider": {"name": "BrandedFaresAmadeus"}},
+    {"description": "COMPLIMENTARY SNACK", "isChargeable": False, "amenityType": "MEAL",
+     "amenityProvider": {"name": "BrandedFaresAmadeus"}},
+]
+
+
+def _iso_duration(minutes: int) -> str:
+    hours, minutes = divmod(minutes, 60)
+    return f"PT{hours}H{minutes}M" if minutes else f"PT{hours}H"
+
+
+def _itinerary(origin: str, destination: str, day: str, index: int, segments: int, segment_ids) -> dict:
+    depart = datetime.fromisoformat(f"{day}T06:00:00") + timedelta(minutes=35 * (index % 24))
+    carrier = CARRIERS[index % len(CARRIERS)]
+    stops = [origin] + [HUBS[(index + i) % len(HUBS)] for i in range(segments - 1)] + [destination]
+    result, at = [], depart
+    for i in range(segments):
+        flight_minutes = 150 + 17 * ((index + i) % 7)
+        arrive = at + timedelta(minutes=flight_minutes)
+        segment_id = str(next(segment_ids))
+        result.append({
+            "departure": {"iataCode": stops[i], "terminal": str(1 + (index + i) % 4), "at": at.isoformat()},
+            "arrival": {"iataCode": stops[i + 1], "terminal": str(1 + (index + i + 1) % 4), "at": arrive.isoformat()},
+            "carrierCode": carrier,
+            "number": str(100 + (index * 7 + i * 13) % 1900),
+            "aircraft": {"code": AIRCRAFT[(index + i) % len(AIRCRAFT)]},
+            "operating": {"carrierCode": carrier},
+            "duration": _iso_duration(flight_minutes),
+            "id": segment_id,
+            "numberOfStops": 0,
+            "co2Emissions": [{"weight": 180 + (index % 50), "weightUnit": "KG", "cabin": "ECONOMY"}],
+            "blacklistedInEU": False,
+        })
+        at = arrive + timedelta(minutes=55 + 10 * (index % 5))  # layover
+    total = (datetime.fromisoformat(result[-1]["arrival"]["at"]) - depart).seconds // 60
+    return {"duration": _iso_duration(total), "segments": result}
+
+
+def flight_offer(index: int, round_trip: bool = False, segments: int = 1,
+                 origin: str = "JFK", destination: str = "LAX",
+                 departure_date: str = "2026-12-01", return_date: str = "2026-12-08", legs: list = ()) -> dict:
+    """One flight offer in the Flight Offers Search v2 shape (one itinerary per (origin, destination, date) of `legs` when given)"""
+    segment_ids = iter(range(1, 100))
+    if legs:
+        itineraries = [_itinerary(o, d, day, index + 3 * n, segments, segment_ids) for n, (o, d, day) in enumerate(legs)]
+    else:
+        itineraries = [_itinerary(origin, destination, departure_date, index, segments, segment_ids)]
+    if round_trip:
+        itineraries.append(_itinerary(destination, origin, return_date, index + 3, segments, segment_ids))
+
+    base = 140 + 3.17 * index + (90 if round_trip else 0) + 90 * max(len(legs) - 1, 0) + 25 * (segments - 1)
+    total = round(base * 1.1977, 2)
+    carrier = itineraries[0]["segments"][0]["carrierCode"]
+    fare_details = [
+        {
+            "segmentId": segment["id"],
+            "cabin": "ECONOMY",
+            "fareBasis": f"{'VLQ'[index % 3]}A{index % 10}SA0BQ",
+            "brandedFare": "MAIN",
+            "brandedFareLabel": "MAIN CABIN",
+            "class": "VLQ"[index % 3],
+            "includedCheckedBags": {"quantity": index % 2} if index % 3 else {"weight": 23, "weightUnit": "KG"},
+            "includedCabinBags": {"quantity": 1},
+            "amenities": copy.deepcopy(AMENITIES),
+        }
+        for itinerary in itineraries for segment in itinerary["segments"]
+    ]
+    return {
+        "type": "flight-offer",
+        "id": str(index + 1),
+        "source": "GDS",
+        "instantTicketingRequired": False,
+        "nonHomogeneous": False,
+        "oneWay": False,
+        "isUpsellOffer": False,
+        "lastTicketingDate": "2026-11-20",
+        "lastTicketingDateTime": "2026-11-20",
+        "numberOfBookableSeats": 1 + index % 9,
+        "itineraries": itineraries,
+        "price": {
+            "currency": "USD",
+            "total": f"{total:.2f}",
+            "base": f"{base:.2f}",
+            "fees": [{"amount": "0.00", "type": "SUPPLIER"}, {"amount": "0.00", "type": "TICKETING"}],
+            "grandTotal": f"{total:.2f}",
+            "additionalServices": [{"amount": "35.00", "type": "CHECKED_BAGS"}],
+        },
+        "pricingOptions": {"fareType": ["PUBLISHED"], "includedCheckedBagsOnly": False},
+        "validatingAirlineCodes": [carrier],
+        "travelerPricings": [{
+            "travelerId": "1",
+            "fareOption": "STANDARD",
+            "travelerType": "ADULT",
+            "price": {"currency": "USD", "total": f"{total:.2f}", "base": f"{base:.2f}"},
+            "fareDetailsBySegment": fare_details,
+        }],
+    }
+
+
+def dictionaries(offers: list) -> dict:
+    """The `dictionaries` block Amadeus sends next to `data`"""
+    locations, aircraft, carriers = {}, {}, {}
+    for offer in offers:
+        for itinerary in offer["itineraries"]:
+            for segment in itinerary["segments"]:
+                for end in ("departure", "arrival"):
+                    locations[segment[end]["iataCode"]] = {"cityCode": segment[end]["iataCode"], "countryCode": "US"}
+                aircraft[segment["aircraft"]["code"]] = f"AIRCRAFT {segment['aircraft']['code']}"
+                carriers[segment["carrierCode"]] = f"CARRIER {segment['carrierCode']}"
+    return {"locations": locations, "aircraft": aircraft, "currencies": {"USD": "US DOLLAR"}, "carriers": carriers}
+
+
+def search_response(count: int, round_trip: bool = False, segments: int = 1, **kwargs) -> dict:
+    """Full Flight Offers Search response body (`meta`, `data`, `dictionaries`), cheapest first"""
+    offers = [flight_offer(i, round_trip, segments, **kwargs) for i in range(count)]
+    return {"meta": {"count": count}, "data": offers, "dictionaries": dictionaries(offers)}
+
+
+def pricing_response(round_trip: bool = False, segments: int = 1) -> dict:
+    """Flight Offers Price response `data` for a single offer"""
+    offer = flight_offer(0, round_trip, segments)
+    offer["travelerPricings"][0]["price"]["taxes"] = [
+        {"amount": "13.20", "code": "US"}, {"amount": "5.60", "code": "AY"}, {"amount": "4.50", "code": "XF"},
+    ]
+    return {
+        "type": "flight-offers-pricing",
+        "flightOffers": [offer],
+        "bookingRequirements": {"emailAddressRequired": True, "mobilePhoneNumberRequired": True},
+    }
+
+
+# Named payload variants used across the benchmark suite
+VARIANTS = {
+    "oneway": {"round_trip": False, "segments": 1},
+    "roundtrip": {"round_trip": True, "segments": 1},
+    "multiseg": {"round_trip": True, "segments": 3},
+}
+SIZES = (1, 10, 250)
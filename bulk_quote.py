@@ -0,0 +1,234 @@
+"""
+Headless bulk quoting: the cheapest and the fastest offer for every trip of a
+CSV or JSONL file.
+
+    python bulk_quote.py trips.csv quotes.csv --workers 8 --rate 10
+
+Input columns (CSV header or JSON keys): origin, destination, departure_date,
+and optionally return_date, adults, cabin_class, direct_only, max_price and
+trip_id. Searches run concurrently through AmadeusFlightAPI.search_offers, so
+they share its rate limit and cache (repeated trips are searched once).
+
+Output is CSV or JSONL, by extension. One flat row per trip is written and
+flushed as soon as the trip is quoted, so rows come out in completion order
+with their input `row` number. Re-running with the same output file resumes:
+a last line cut off by the interruption is dropped, rows already quoted are
+skipped, and rows that failed are retried and appended again (the last line
+of a row wins).
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from models import decode_offer, rank_offers
+from serializer import dumps
+from util import text_bool
+
+OPTION_FIELDS = ("price", "currency", "carrier", "flights", "departure", "arrival", "duration_minutes", "stops")
+OUTPUT_FIELDS = (
+    ("row", "trip_id", "status", "offers")
+    + tuple(f"cheapest_{f}" for f in OPTION_FIELDS)
+    + tuple(f"fastest_{f}" for f in OPTION_FIELDS)
+    + ("error",)
+)
+# Rows whose quote is final; anything else is retried on resume
+DONE_STATUSES = ("ok", "no_offers", "invalid")
+
+
+def read_trips(path: str) -> Iterator[Tuple[int, dict]]:
+    """(row number starting at 1, trip) for every row of a CSV or JSONL file"""
+    with open(path, newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for number, trip in enumerate(rows, 1):
+            yield number, trip
+
+
+def trip_params(trip: dict) -> dict:
+    """Amadeus search parameters for one input row (ValueError when a required column is missing)"""
+    missing = [k for k in ("origin", "destination", "departure_date") if not trip.get(k)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    params = {
+        "originLocationCode": str(trip["origin"]).strip().upper(),
+        "destinationLocationCode": str(trip["destination"]).strip().upper(),
+        "departureDate": str(trip["departure_date"]).strip(),
+        "adults": int(trip.get("adults") or 1),
+        "nonStop": text_bool(str(trip.get("direct_only", "")).strip().lower() in ("1", "true", "yes", "y")),
+        "currencyCode": "USD",
+    }
+    if trip.get("return_date"):
+        params["returnDate"] = str(trip["return_date"]).strip()
+    if trip.get("cabin_class"):
+        params["travelClass"] = str(trip["cabin_class"]).strip().upper()
+    if trip.get("max_price"):
+        params["maxPrice"] = int(float(trip["max_price"]))
+    return params
+
+
+def _option(prefix: str, raw: dict) -> dict:
+    offer = decode_offer(raw)
+    segments = [s for itinerary in offer.itineraries for s in itinerary.segments]
+    return {
+        f"{prefix}_price": offer.total,
+        f"{prefix}_currency": offer.currency,
+        f"{prefix}_carrier": offer.first_segment.carrier,
+        f"{prefix}_flights": " ".join(s.flight_number.replace(" ", "") for s in segments),
+        f"{prefix}_departure": offer.first_segment.departure_at,
+        f"{prefix}_arrival": offer.itineraries[0].segments[-1].arrival_at,
+        f"{prefix}_duration_minutes": offer.duration,
+        f"{prefix}_stops": sum(len(i.segments) - 1 for i in offer.itineraries),
+    }
+
+
+def quote_trip(search: Callable[[dict], list], number: int, trip: dict) -> dict:
+    """Output row for one trip: its cheapest and fastest offers, or the reason there are none"""
+    row = {"row": number, "trip_id": trip.get("trip_id", "")}
+    try:
+        params = trip_params(trip)
+    except ValueError as e:
+        return {**row, "status": "invalid", "error": str(e)}
+    try:
+        offers = search(params)
+    except Exception as e:
+        # One line per row, so a resumed file can be cut back to its last newline
+        return {**row, "status": "error", "error": " ".join(str(e).split())}
+    if not offers:
+        return {**row, "status": "no_offers", "offers": 0}
+    return {
+        **row, "status": "ok", "offers": len(offers),
+        **_option("cheapest", rank_offers(offers, 1, "price")[0]),
+        **_option("fastest", rank_offers(offers, 1, "duration")[0]),
+    }
+
+
+def drop_partial_line(path: str):
+    """Truncate `path` after its last newline (a row cut off by an interruption)"""
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - 65536)
+            f.seek(start)
+            block = f.read(position - start)
+            newline = block.rfind(b"\n")
+            if newline >= 0:
+                position = start + newline + 1
+                break
+            position = start
+        if position < end:
+            f.truncate(position)
+
+
+class QuoteWriter:
+    """Appends output rows to a CSV or JSONL file, flushing each one"""
+
+    def __init__(self, path: str):
+        self.jsonl = path.endswith((".jsonl", ".ndjson"))
+        if os.path.exists(path):
+            drop_partial_line(path)
+        new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a", newline="")
+        if not self.jsonl:
+            self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+            if new:
+                self.writer.writeheader()
+
+    def write(self, row: dict):
+        if self.jsonl:
+            self.file.write(dumps({k: row[k] for k in OUTPUT_FIELDS if k in row}) + "\n")
+        else:
+            self.writer.writerow(row)
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def quoted_rows(path: str) -> set:
+    """Row numbers with a final quote in an existing output file (for resuming)"""
+    if not os.path.exists(path):
+        return set()
+    status = {}
+    for _, row in read_trips(path):
+        status[int(row["row"])] = row.get("status")
+    return {number for number, s in status.items() if s in DONE_STATUSES}
+
+
+def quote_file(input_path: str, output_path: str, search: Callable[[dict], list],
+               workers: int = 8, progress_every: int = 100) -> Dict[str, float]:
+    """
+    Quote every trip of `input_path` into `output_path`, `workers` searches at a time.
+
+    Returns:
+        Counts per status, rows skipped as already quoted, elapsed seconds and rows per second
+    """
+    # Opening the writer first drops a cut-off last line, so it is never taken for a quote
+    writer = QuoteWriter(output_path)
+    done = quoted_rows(output_path)
+    stats = {"quoted": 0, "skipped": 0, "ok": 0, "no_offers": 0, "invalid": 0, "error": 0}
+    started = time.perf_counter()
+
+    def report():
+        elapsed = time.perf_counter() - started
+        print(f"{stats['quoted']} rows quoted ({stats['skipped']} skipped) in {elapsed:.1f}s, "
+              f"{stats['quoted'] / elapsed if elapsed else 0:.1f} rows/s")
+
+    def finish(future):
+        row = future.result()
+        writer.write(row)
+        stats["quoted"] += 1
+        stats[row["status"]] += 1
+        if progress_every and stats["quoted"] % progress_every == 0:
+            report()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for number, trip in read_trips(input_path):
+                if number in done:
+                    stats["skipped"] += 1
+                    continue
+                # Keep a bounded number of trips in flight, the input can be large
+                if len(pending) >= workers * 2:
+                    finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        finish(future)
+                pending.add(pool.submit(quote_trip, search, number, trip))
+            for future in as_completed(pending):
+                finish(future)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    report()
+    return {**stats, "seconds": round(elapsed, 3), "rows_per_second": round(stats["quoted"] / elapsed, 1) if elapsed else 0.0}
+
+
+def main(argv: Optional[List[str]] = None):
+    from dotenv import load_dotenv
+
+    from api import AmadeusFlightAPI
+
+    parser = argparse.ArgumentParser(description="Quote the cheapest and fastest flight for every trip of a CSV/JSONL file")
+    parser.add_argument("input", help="trips (.csv or .jsonl)")
+    parser.add_argument("output", help="quotes (.csv or .jsonl); an existing file is resumed")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent searches")
+    parser.add_argument("--rate", type=float, default=float(os.getenv("AMADEUS_RATE", "10")), help="Amadeus searches per second")
+    parser.add_argument("--cache-entries", type=int, default=256, help="searches kept for repeated trips (whole responses)")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    api = AmadeusFlightAPI(os.getenv("AMADEUS_API_KEY"), os.getenv("AMADEUS_API_SECRET"), rate=args.rate, cache_entries=args.cache_entries)
+    stats = quote_file(args.input, args.output, api.search_offers, workers=args.workers)
+    print(dumps({**stats, "search_cache": api.search_cache.stats, "single_flight": api.single_flight.stats}))
+
+
+if __name__ == "__main__":
+    main()
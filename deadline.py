@@ -0,0 +1,96 @@
+"""
+Per-request deadlines, passed down to every upstream call of an agent run.
+
+`run_agent` puts a Deadline in the `current_deadline` context variable. Tool
+threads started with a copy of the context (asyncio.to_thread, copy_context)
+see the same object. The quota schedulers stop waiting for a token once it
+has expired, and Amadeus HTTP calls get the remaining time as their socket
+timeout (see `http_with_timeout`). When the client disconnects or time runs
+out, `cancel` expires the deadline at once, so work still running in threads
+stops at its next upstream call instead of spending quota nobody will read.
+"""
+import contextvars
+import threading
+import time
+from typing import Optional
+from urllib.error import URLError
+from urllib.request import urlopen
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting upstream work after the request's deadline"""
+
+
+class Deadline:
+    __slots__ = ("expires_at", "reason")
+
+    def __init__(self, seconds: float):
+        self.expires_at = time.monotonic() + seconds
+        self.reason = None
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def cancel(self, reason: str):
+        """Expire now (client gone, or the run was given up)"""
+        self.reason = reason
+        self.expires_at = time.monotonic()
+
+    def check(self):
+        if self.expired():
+            raise DeadlineExceeded(self.reason or "deadline expired")
+
+
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left for the current request, capped at `default`"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return default
+    return deadline.remaining() if default is None else min(default, deadline.remaining())
+
+
+class DeadlineStats:
+    """Counters for /metrics"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = {"runs": 0, "completed": 0, "timed_out": 0, "cancelled": 0, "partial_responses": 0,
+                       "upstream_timeouts": 0, "upstream_calls_skipped": 0}
+
+    def add(self, name: str, n: int = 1):
+        with self.lock:
+            self.counts[name] += n
+
+    def report(self) -> dict:
+        return dict(self.counts)
+
+
+deadline_stats = DeadlineStats()
+
+
+def http_with_timeout(timeout: float):
+    """
+    urlopen for amadeus.Client(http=...): at most `timeout` seconds per call,
+    less when the current request has less time left.
+    """
+    def http(request):
+        seconds = remaining(timeout)
+        if seconds <= 0:
+            deadline_stats.add("upstream_calls_skipped")
+            raise DeadlineExceeded("no time left for the Amadeus call")
+        try:
+            return urlopen(request, timeout=seconds)
+        except TimeoutError:
+            deadline_stats.add("upstream_timeouts")
+            raise
+        except URLError as error:
+            if isinstance(error.reason, TimeoutError):
+                deadline_stats.add("upstream_timeouts")
+            raise
+    return http
@@ -0,0 +1,257 @@
+"""
+Compact internal representation of Amadeus flight offers.
+
+Offers are decoded once from the Amadeus JSON into slotted dataclasses with
+numeric prices and durations (minutes). The parsers in util.py, the display
+formatter and ranking all work from these objects instead of building their
+own nested dicts.
+
+A search can return up to 250 offers while the agent shows about 10, so
+searches keep the raw offers (that is also what the search cache stores) and
+only decode the ones that are shown, see `top_offers`.
+
+Decoded offers keep no reference to the Amadeus dicts: fees, taxes and
+amenities are copied into small records of interned strings too, and only
+turned back into dicts for the offers that are displayed (`as_dict`).
+"""
+import heapq
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, List, Optional
+
+from offer_times import duration_minutes, offer_times
+from reference_data import intern_code
+
+def format_duration(minutes: int) -> str:
+    """Minutes back to the Amadeus style duration ("PT5H30M", "PT6H")"""
+    hours, minutes = divmod(minutes, 60)
+    return f"PT{hours}H{minutes}M" if minutes else f"PT{hours}H"
+
+
+@dataclass(slots=True)
+class Segment:
+    origin: str
+    destination: str
+    departure_at: str
+    arrival_at: str
+    carrier: str
+    number: str
+    duration_minutes: int
+    departure_terminal: str = ""
+    arrival_terminal: str = ""
+    operating_carrier: str = ""
+    aircraft: str = ""
+    stops: int = 0
+    co2_kg: Optional[float] = None
+
+    @property
+    def flight_number(self) -> str:
+        return f"{self.carrier} {self.number}"
+
+
+@dataclass(slots=True)
+class Itinerary:
+    duration_minutes: int
+    segments: List[Segment]
+
+
+@dataclass(slots=True)
+class Baggage:
+    traveler_id: str
+    checked_quantity: Optional[int] = None
+    checked_weight: Optional[int] = None
+    checked_weight_unit: str = ""
+    cabin_quantity: Optional[int] = None
+
+
+@dataclass(slots=True)
+class Charge:
+    """A fee (`kind` is its type) or a tax (`kind` is its code), amount kept as sent"""
+    amount: str
+    kind: str
+
+    def as_dict(self, key: str) -> dict:
+        return {"amount": self.amount, key: self.kind}
+
+
+@dataclass(slots=True)
+class Amenity:
+    description: str
+    chargeable: Optional[bool] = None
+    type: str = ""
+    provider: str = ""
+
+    def as_dict(self) -> dict:
+        amenity = {"description": self.description, "isChargeable": self.chargeable, "amenityType": self.type}
+        if self.provider:
+            amenity["amenityProvider"] = {"name": self.provider}
+        return amenity
+
+
+@dataclass(slots=True)
+class Offer:
+    id: str
+    currency: str
+    total: float
+    base: float
+    grand_total: float
+    itineraries: List[Itinerary]
+    baggage: List[Baggage] = field(default_factory=list)
+    checked_bag_fee: Optional[float] = None
+    fees: tuple = ()  # Charge, kind is the fee type
+    taxes: tuple = ()  # Charge, kind is the tax code
+    amenities: tuple = ()
+    last_ticketing_date: Optional[str] = None
+    bookable_seats: Optional[int] = None
+    ref: str = ""  # pricing.OfferStore reference, set for offers shown to the agent
+
+    @property
+    def first_segment(self) -> Segment:
+        return self.itineraries[0].segments[0]
+
+    @property
+    def duration(self) -> int:
+        """Total flying + layover minutes over all itineraries"""
+        return sum(itinerary.duration_minutes for itinerary in self.itineraries)
+
+    @property
+    def dedupe_key(self) -> tuple:
+        """Same flights on the same departures, on every itinerary (a round trip's return included)"""
+        return tuple((s.carrier, s.number, s.departure_at, s.origin) for i in self.itineraries for s in i.segments)
+
+
+_EMPTY = {}
+
+
+def decode_segment(segment: dict) -> Segment:
+    # Positional arguments, in field order: this runs for every segment of every offer.
+    # Codes are interned so all decoded offers share them (see reference_data.py)
+    departure, arrival = segment["departure"], segment["arrival"]
+    carrier = intern_code(segment["carrierCode"])
+    co2 = segment.get("co2Emissions")
+    return Segment(
+        intern_code(departure["iataCode"]),
+        intern_code(arrival["iataCode"]),
+        departure["at"],
+        arrival["at"],
+        carrier,
+        intern_code(segment["number"]),
+        duration_minutes(segment.get("duration") or ""),
+        departure.get("terminal", ""),
+        arrival.get("terminal", ""),
+        intern_code(segment.get("operating", _EMPTY).get("carrierCode", carrier)),
+        intern_code(segment.get("aircraft", _EMPTY).get("code", "")),
+        segment.get("numberOfStops", 0),
+        float(co2[0]["weight"]) if co2 else None,
+    )
+
+
+def decode_charges(charges: list, key: str) -> tuple:
+    return tuple(Charge(intern_code(c.get("amount", "")), intern_code(c.get(key, ""))) for c in charges)
+
+
+def decode_amenity(amenity: dict) -> Amenity:
+    return Amenity(
+        intern_code(amenity.get("description", "")),
+        amenity.get("isChargeable"),
+        intern_code(amenity.get("amenityType", "")),
+        intern_code(amenity.get("amenityProvider", _EMPTY).get("name", "")),
+    )
+
+
+def decode_offer(offer: dict) -> Offer:
+    """Decode one flight offer from the Amadeus search or pricing response"""
+    price = offer["price"]
+    itineraries = [
+        Itinerary(duration_minutes(itinerary.get("duration") or ""), [decode_segment(s) for s in itinerary["segments"]])
+        for itinerary in offer["itineraries"]
+    ]
+
+    baggage, amenities, taxes = [], (), ()
+    for traveler in offer.get("travelerPricings", ()):
+        fare_details = (traveler.get("fareDetailsBySegment") or (_EMPTY,))[0]
+        checked = fare_details.get("includedCheckedBags", _EMPTY)
+        baggage.append(Baggage(
+            traveler.get("travelerId", ""),
+            checked.get("quantity"),
+            checked.get("weight"),
+            checked.get("weightUnit", ""),
+            fare_details.get("includedCabinBags", _EMPTY).get("quantity"),
+        ))
+        if not amenities:
+            amenities = tuple(decode_amenity(a) for a in fare_details.get("amenities", ()))
+            taxes = decode_charges(traveler.get("price", _EMPTY).get("taxes", ()), "code")
+
+    checked_bag_fee = None
+    for service in price.get("additionalServices", ()):
+        if service["type"] == "CHECKED_BAGS":
+            checked_bag_fee = float(service["amount"])
+
+    total = float(price["total"])
+    return Offer(
+        offer.get("id", ""),
+        price["currency"],
+        total,
+        float(price.get("base", total)),
+        float(price.get("grandTotal", total)),
+        itineraries,
+        baggage,
+        checked_bag_fee,
+        decode_charges(price.get("fees", ()), "type"),
+        taxes,
+        amenities,
+        offer.get("lastTicketingDate"),
+        offer.get("numberOfBookableSeats"),
+    )
+
+
+# Cheap accessors on the raw Amadeus JSON, used to rank and summarise offers
+# without decoding them
+
+def raw_total(offer: dict) -> float:
+    return float(offer["price"]["total"])
+
+
+def raw_duration(offer: dict) -> int:
+    return sum(duration_minutes(itinerary.get("duration") or "") for itinerary in offer["itineraries"])
+
+
+def raw_carrier(offer: dict) -> str:
+    return offer["itineraries"][0]["segments"][0]["carrierCode"]
+
+
+# Orderings other than price rank on a column of offer_times.OfferTimes
+SORT_COLUMNS = {"duration": "duration", "departure": "departure", "arrival": "arrival"}
+SORT_KEYS = ("price",) + tuple(SORT_COLUMNS)
+
+
+def check_sort_by(sort_by: str):
+    """ValueError for a sort key rank_offers / merge_offers don't know"""
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"sort_by must be one of {', '.join(SORT_KEYS)}")
+
+
+def iter_offers(offers: Iterable[dict]) -> Iterator[Offer]:
+    """Decode offers one at a time, as they are consumed"""
+    for offer in offers:
+        yield decode_offer(offer)
+
+
+def rank_offers(offers: List[dict], k: int, sort_by: str = "price") -> List[dict]:
+    """
+    The `k` best raw offers by `sort_by`: "price" (cheapest first), "duration"
+    (shortest), "departure" (earliest) or "arrival" (earliest).
+
+    Only the sort key is read from every offer (the price, or the times parsed
+    in one pass by offer_times).
+    """
+    check_sort_by(sort_by)
+    if sort_by == "price":
+        return heapq.nsmallest(k, offers, key=lambda offer: (raw_total(offer), raw_duration(offer)))
+    column = getattr(offer_times(offers), SORT_COLUMNS[sort_by])
+    best = heapq.nsmallest(k, range(len(offers)), key=lambda i: (column[i], raw_total(offers[i])))
+    return [offers[i] for i in best]
+
+
+def top_offers(offers: List[dict], k: int, sort_by: str = "price") -> List[Offer]:
+    """`rank_offers`, decoded: the full decode only runs for the `k` offers that are returned"""
+    return list(iter_offers(rank_offers(offers, k, sort_by)))
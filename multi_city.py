@@ -0,0 +1,102 @@
+"""
+Multi-city and open-jaw searches in one Flight Offers Search POST request.
+
+The GET search only knows origin -> destination with an optional return. The
+POST form takes a list of `originDestinations`, so a trip such as
+JFK -> LAX, LAX -> SFO, SFO -> JFK is priced as a whole by one call. Each
+offer then has one itinerary per leg.
+
+Legs are written "JFK-LAX 2026-12-01, LAX-SFO 2026-12-05, SFO-JFK 2026-12-09".
+"""
+import re
+from typing import List, Optional, Tuple
+
+# Amadeus accepts up to 6 origin-destinations per request
+MAX_LEGS = 6
+
+_LEG_RE = re.compile(r"^\s*([A-Za-z]{3})\s*(?:-|>|->|→|to)\s*([A-Za-z]{3})\s+(\d{4}-\d{2}-\d{2})\s*$")
+
+Leg = Tuple[str, str, str]  # origin, destination, departure date
+
+
+def parse_legs(legs: str) -> List[Leg]:
+    """'JFK-LAX 2026-12-01, LAX-SFO 2026-12-05' -> [("JFK", "LAX", "2026-12-01"), ...] (ValueError when malformed)"""
+    parsed = []
+    for text in re.split(r"[,;\n]", legs):
+        if not text.strip():
+            continue
+        match = _LEG_RE.match(text)
+        if not match:
+            raise ValueError(f"Could not read leg {text.strip()!r}, expected e.g. 'JFK-LAX 2026-12-01'")
+        origin, destination, day = match.groups()
+        parsed.append((origin.upper(), destination.upper(), day))
+    if not 2 <= len(parsed) <= MAX_LEGS:
+        raise ValueError(f"A multi-city trip needs 2 to {MAX_LEGS} legs, got {len(parsed)}")
+    if any(later[2] < earlier[2] for earlier, later in zip(parsed, parsed[1:])):
+        raise ValueError("Legs must be in date order")
+    return parsed
+
+
+def multi_city_body(
+    legs: List[Leg],
+    adults: int = 1,
+    children: Optional[int] = None,
+    infants: Optional[int] = None,
+    cabin_class: Optional[str] = None,
+    direct_only: Optional[bool] = False,
+    included_airline_codes: Optional[str] = None,
+    excluded_airline_codes: Optional[str] = None,
+    max: Optional[int] = None,
+    currency: str = "USD",
+) -> dict:
+    """Flight Offers Search POST body for `legs`, with the same filters as the GET search"""
+    leg_ids = [str(n) for n in range(1, len(legs) + 1)]
+    travelers = [{"id": str(n), "travelerType": "ADULT"} for n in range(1, int(adults) + 1)]
+    travelers += [{"id": str(len(travelers) + n), "travelerType": "CHILD"} for n in range(1, int(children or 0) + 1)]
+    # Every infant sits on an adult's lap
+    travelers += [
+        {"id": str(len(travelers) + n), "travelerType": "HELD_INFANT", "associatedAdultId": str(n)}
+        for n in range(1, int(infants or 0) + 1)
+    ]
+
+    filters = {}
+    if cabin_class:
+        filters["cabinRestrictions"] = [{"cabin": cabin_class.upper(), "coverage": "MOST_SEGMENTS", "originDestinationIds": leg_ids}]
+    if included_airline_codes:
+        filters["carrierRestrictions"] = {"includedCarrierCodes": [c.strip().upper() for c in included_airline_codes.split(",") if c.strip()]}
+    elif excluded_airline_codes:
+        filters["carrierRestrictions"] = {"excludedCarrierCodes": [c.strip().upper() for c in excluded_airline_codes.split(",") if c.strip()]}
+    if direct_only:
+        filters["connectionRestriction"] = {"maxNumberOfConnections": 0}
+
+    criteria = {"maxFlightOffers": int(max) if max else 250}
+    if filters:
+        criteria["flightFilters"] = filters
+    return {
+        "currencyCode": currency,
+        "originDestinations": [
+            {"id": leg_id, "originLocationCode": origin, "destinationLocationCode": destination,
+             "departureDateTimeRange": {"date": day}}
+            for leg_id, (origin, destination, day) in zip(leg_ids, legs)
+        ],
+        "travelers": travelers,
+        "sources": ["GDS"],
+        "searchCriteria": criteria,
+    }
+
+
+def cache_params(body: dict) -> dict:
+    """
+    Flat key for the search cache and single-flight. It has no origin /
+    destination / date keys, so a multi-city entry is never taken for a
+    one-way search of the same route (see refine.identity).
+    """
+    return {
+        "originDestinations": ",".join(
+            f"{o['originLocationCode']}-{o['destinationLocationCode']}-{o['departureDateTimeRange']['date']}"
+            for o in body["originDestinations"]
+        ),
+        "travelers": ",".join(t["travelerType"] for t in body["travelers"]),
+        "searchCriteria": repr(body["searchCriteria"]),
+        "currencyCode": body["currencyCode"],
+    }
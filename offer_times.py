@@ -0,0 +1,102 @@
+"""
+Batch parsing of the durations and timestamps of a whole search response.
+
+Ranking by duration or departure time, and working out layovers and
+overnight trips, needs the ISO-8601 strings as numbers. `offer_times` converts
+them for every offer of a response in one pass, into flat integer columns
+(array.array) indexed like the offers. Timestamps become minutes since the
+epoch. The same flights show up in many offers of one response (different
+fares, different connections), so parsed durations and timestamps are
+memoized and most strings are only looked up.
+
+Amadeus timestamps are local airport times without an offset, so only
+differences at the same airport (layovers) are exact. Durations come from
+the offers' own `duration` fields.
+"""
+import re
+from array import array
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import List
+
+_DURATION_RE = re.compile(r"P(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?)?")
+
+
+@lru_cache(maxsize=4096)
+def duration_minutes(duration: str) -> int:
+    """Convert an ISO-8601 duration such as "PT5H30M" or "P1DT2H" to minutes"""
+    match = _DURATION_RE.match(duration or "")
+    if not match:
+        return 0
+    days, hours, minutes = (int(v) if v else 0 for v in match.groups())
+    return days * 1440 + hours * 60 + minutes
+
+
+_EPOCH = datetime(1970, 1, 1)
+_MINUTE = timedelta(minutes=1)
+
+
+@lru_cache(maxsize=8192)
+def timestamp_minutes(value: str) -> int:
+    """'YYYY-MM-DDTHH:MM:SS' -> minutes since 1970-01-01T00:00 (same wall clock)"""
+    return (datetime.fromisoformat(value) - _EPOCH) // _MINUTE
+
+
+class OfferTimes:
+    """
+    Columns, one entry per offer:
+        duration: total minutes over all itineraries
+        departure: first departure, minutes since the epoch
+        arrival: arrival at the destination of the first itinerary, minutes since the epoch
+        layover: total connection minutes over all itineraries
+        longest_layover: longest single connection in minutes
+        overnight: 1 when a flight or connection spans midnight (local time)
+    """
+
+    __slots__ = ("duration", "departure", "arrival", "layover", "longest_layover", "overnight")
+
+    def __init__(self):
+        self.duration = array("i")
+        self.departure = array("q")
+        self.arrival = array("q")
+        self.layover = array("i")
+        self.longest_layover = array("i")
+        self.overnight = array("b")
+
+    def __len__(self) -> int:
+        return len(self.duration)
+
+
+def offer_times(offers: List[dict]) -> OfferTimes:
+    """Parse the durations and timestamps of raw Amadeus offers in one pass"""
+    times = OfferTimes()
+    duration, departure, arrival = times.duration.append, times.departure.append, times.arrival.append
+    layover, longest_layover, overnight = times.layover.append, times.longest_layover.append, times.overnight.append
+
+    for offer in offers:
+        itineraries = offer["itineraries"]
+        total = waited = longest = 0
+        crosses_midnight = False
+        for itinerary in itineraries:
+            total += duration_minutes(itinerary.get("duration") or "")
+            previous_arrival = None
+            for segment in itinerary["segments"]:
+                leaves, lands = segment["departure"]["at"], segment["arrival"]["at"]
+                if leaves[:10] != lands[:10]:
+                    crosses_midnight = True
+                if previous_arrival is not None:
+                    if previous_arrival[:10] != leaves[:10]:
+                        crosses_midnight = True
+                    gap = timestamp_minutes(leaves) - timestamp_minutes(previous_arrival)
+                    waited += gap
+                    longest = max(longest, gap)
+                previous_arrival = lands
+
+        first = itineraries[0]["segments"]
+        duration(total)
+        departure(timestamp_minutes(first[0]["departure"]["at"]))
+        arrival(timestamp_minutes(first[-1]["arrival"]["at"]))
+        layover(waited)
+        longest_layover(longest)
+        overnight(crosses_midnight)
+    return times
@@ -0,0 +1,178 @@
+"""
+Mock flight orders, for testing the booking flow end to end without Amadeus.
+
+Orders are kept in memory, indexed by order id, booking reference and
+traveler last name. With a `path`, every order is also appended to a log
+file (one JSON record per line) that is replayed on start.
+
+Each create call may carry an idempotency key. Retrying with the same key
+returns the original order instead of booking twice. Reusing a key for a
+different order is an error.
+
+Booking references are six characters long. They come from a bijective
+scramble of the order sequence number, so they never collide within an
+engine. Engines in different processes need different `node` numbers.
+"""
+import hashlib
+import itertools
+import os
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from serializer import dumps_bytes, loads
+
+# Booking reference alphabet: no 0/O or 1/I, 32 symbols so 6 of them are 30 bits
+REFERENCE_ALPHABET = "ABCDEFGHJKLMNPQRSTUVWXYZ23456789"
+NODE_BITS = 6
+SEQUENCE_BITS = 30 - NODE_BITS
+# Odd multiplier, so multiply-and-add modulo 2**30 is a permutation
+_SCRAMBLE, _OFFSET = 0x2F5A1E37, 0x1B3C5D7
+
+
+class IdempotencyConflict(ValueError):
+    """An idempotency key was reused for a different order"""
+
+
+def booking_reference(sequence: int, node: int = 0) -> str:
+    """Six-character reference, unique per (sequence, node)"""
+    if sequence >= 1 << SEQUENCE_BITS:
+        raise OverflowError("Mock order sequence exhausted")
+    n = (((node << SEQUENCE_BITS) | sequence) * _SCRAMBLE + _OFFSET) & ((1 << 30) - 1)
+    return "".join(REFERENCE_ALPHABET[(n >> shift) & 31] for shift in range(25, -1, -5))
+
+
+def order_fingerprint(flight_offer: dict, travelers: List[dict]) -> str:
+    """What makes two create calls the same order: the flights booked and the travelers' names"""
+    flights = [(s["carrierCode"], s["number"], s["departure"]["at"])
+               for itinerary in flight_offer["itineraries"] for s in itinerary["segments"]]
+    names = [(t["name"]["firstName"].upper(), t["name"]["lastName"].upper()) for t in travelers]
+    return hashlib.sha1(repr((flights, names)).encode()).hexdigest()
+
+
+class MockOrderEngine:
+    """
+    Args:
+        path: Append-only order log, replayed on start (memory only when None)
+        node: Process number (0-63) mixed into references when several engines run side by side
+    """
+
+    def __init__(self, path: Optional[str] = None, node: int = 0):
+        if not 0 <= node < 1 << NODE_BITS:
+            raise ValueError(f"node must be between 0 and {(1 << NODE_BITS) - 1}")
+        self.path = path
+        self.node = node
+        self.lock = threading.Lock()
+        self.orders: Dict[str, bytes] = {}  # order id -> encoded order
+        self.by_reference: Dict[str, str] = {}
+        self.by_last_name: Dict[str, List[str]] = {}
+        self.by_idempotency_key: Dict[str, tuple] = {}  # key -> (fingerprint, order id)
+        self.stats = {"created": 0, "replayed": 0, "conflicts": 0, "lookups": 0}
+        self._log = None
+        self._last_sequence = -1
+        if path:
+            self._load()
+            self._log = open(path, "ab")
+        self._sequence = itertools.count(self._last_sequence + 1)
+
+    def _load(self):
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        record = loads(line)
+                        self._index(record["order"], record.get("key"), record.get("fingerprint"), dumps_bytes(record["order"]))
+        except FileNotFoundError:
+            pass
+
+    def _index(self, order: dict, key: Optional[str], fingerprint: Optional[str], encoded: bytes):
+        order_id = order["id"]
+        self._last_sequence = max(self._last_sequence, int(order_id[6:]))
+        self.orders[order_id] = encoded
+        self.by_reference[order["associatedRecords"][0]["reference"]] = order_id
+        for traveler in order["travelers"]:
+            self.by_last_name.setdefault(traveler["name"]["lastName"].upper(), []).append(order_id)
+        if key is not None:
+            self.by_idempotency_key[key] = (fingerprint, order_id)
+
+    def create(self, flight_offer: dict, travelers: List[dict], idempotency_key: Optional[str] = None) -> dict:
+        """
+        Book `flight_offer` for `travelers` (Amadeus traveler dicts with a name).
+
+        Returns:
+            The order, shaped like an Amadeus flight-order, with "replayed": True when
+            `idempotency_key` had already been used for this same order
+        """
+        if not travelers or any(not t.get("name", {}).get("lastName") for t in travelers):
+            raise ValueError("Every traveler needs a name with a lastName")
+        fingerprint = order_fingerprint(flight_offer, travelers)
+
+        if idempotency_key is not None:
+            with self.lock:
+                existing = self.by_idempotency_key.get(idempotency_key)
+            if existing is not None:
+                return self._replay(idempotency_key, fingerprint, existing)
+
+        # Sequence numbers are handed out atomically, so references are unique without the lock
+        sequence = next(self._sequence)
+        reference = booking_reference(sequence, self.node)
+        order = {
+            "type": "flight-order",
+            "id": f"MOCK{self.node:02d}{sequence:08d}",
+            "queuingOfficeId": "MOCK",
+            "status": "UNCONFIRMED",
+            "associatedRecords": [{
+                "reference": reference,
+                "creationDate": datetime.now().isoformat(timespec="milliseconds"),
+                "originSystemCode": "MOCK",
+                "flightOfferId": flight_offer.get("id"),
+            }],
+            "flightOffers": [flight_offer],
+            "travelers": travelers,
+        }
+        encoded = dumps_bytes(order)
+
+        with self.lock:
+            if idempotency_key is not None:
+                # A concurrent call with the same key may have won the race
+                existing = self.by_idempotency_key.get(idempotency_key)
+                if existing is not None:
+                    return self._replay(idempotency_key, fingerprint, existing)
+            self._index(order, idempotency_key, fingerprint, encoded)
+            if self._log is not None:
+                self._log.write(dumps_bytes({"order": order, "key": idempotency_key, "fingerprint": fingerprint}) + b"\n")
+                self._log.flush()
+            self.stats["created"] += 1
+        return order
+
+    def _replay(self, key: str, fingerprint: str, existing: tuple) -> dict:
+        if existing[0] != fingerprint:
+            self.stats["conflicts"] += 1
+            raise IdempotencyConflict(f"Idempotency key {key!r} was already used for a different order")
+        self.stats["replayed"] += 1
+        return {**loads(self.orders[existing[1]]), "replayed": True}
+
+    def get(self, order_id_or_reference: str) -> Optional[dict]:
+        """An order by its id or booking reference"""
+        self.stats["lookups"] += 1
+        key = order_id_or_reference.strip().upper()
+        encoded = self.orders.get(self.by_reference.get(key, key))
+        return loads(encoded) if encoded is not None else None
+
+    def find(self, last_name: str) -> List[dict]:
+        """Orders with a traveler of that last name"""
+        self.stats["lookups"] += 1
+        return [loads(self.orders[order_id]) for order_id in self.by_last_name.get(last_name.strip().upper(), ())]
+
+    def report(self) -> dict:
+        return {**self.stats, "orders": len(self.orders)}
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+def engine_from_env() -> MockOrderEngine:
+    """MOCK_ORDER_LOG=path keeps orders across restarts; MOCK_ORDER_NODE tells engines of several workers apart"""
+    return MockOrderEngine(os.getenv("MOCK_ORDER_LOG"), node=int(os.getenv("MOCK_ORDER_NODE", "0")))
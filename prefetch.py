@@ -0,0 +1,113 @@
+"""
+Speculative prefetch of the searches users usually ask for next.
+
+After JFK→LAX on a date, the follow-up is very often the same route a day
+earlier/later, or the return leg once a return date is known. When a search
+completes, those follow-ups are queued for a low-priority background worker
+that stores the results in the search cache, so the next question is answered
+from cache. Prefetching is capped by a budget of upstream calls per hour.
+"""
+import itertools
+import queue
+import threading
+from datetime import date, timedelta
+from typing import Callable
+
+from quota import TokenBucket
+from search_cache import SearchCache
+
+
+def shift_date(value: str, days: int) -> str:
+    return (date.fromisoformat(value) + timedelta(days=days)).isoformat()
+
+
+def likely_follow_ups(search_params: dict) -> list:
+    """
+    Searches the user is likely to ask for next, most likely first.
+    Returns (priority, search params) tuples; lower priority runs first.
+    """
+    follow_ups = []
+    return_date = search_params.get("returnDate")
+    if return_date:
+        # The return leg on its own
+        return_leg = {k: v for k, v in search_params.items() if k != "returnDate"}
+        return_leg["originLocationCode"] = search_params["destinationLocationCode"]
+        return_leg["destinationLocationCode"] = search_params["originLocationCode"]
+        return_leg["departureDate"] = return_date
+        follow_ups.append((0, return_leg))
+
+    for days in (1, -1):
+        shifted = dict(search_params, departureDate=shift_date(search_params["departureDate"], days))
+        if return_date:
+            shifted["returnDate"] = shift_date(return_date, days)
+        follow_ups.append((1, shifted))
+
+    today = date.today().isoformat()
+    return [(p, params) for p, params in follow_ups if params["departureDate"] >= today]
+
+
+class Prefetcher:
+    """
+    Args:
+        fetch_fn: Makes the upstream search and returns its offers (no cache lookup)
+        cache: Cache the results are stored in
+        budget_per_hour: Max upstream calls spent on prefetching per hour
+        max_queue: Pending prefetches beyond this are dropped
+    """
+
+    def __init__(self, fetch_fn: Callable[[dict], list], cache: SearchCache,
+                 budget_per_hour: int = 60, max_queue: int = 50):
+        self.fetch_fn = fetch_fn
+        self.cache = cache
+        self.budget = TokenBucket(rate=budget_per_hour / 3600, capacity=max(1, budget_per_hour // 6))
+        self.queue = queue.PriorityQueue(maxsize=max_queue)
+        self.pending = set()
+        self.counter = itertools.count()  # tie-breaker so dicts are never compared
+        self.lock = threading.Lock()
+        self.stats = {"queued": 0, "prefetched": 0, "skipped_budget": 0, "dropped": 0, "errors": 0}
+        self._thread = None
+
+    def on_search(self, search_params: dict):
+        """Queue the likely follow-ups of a search that was just answered"""
+        for priority, params in likely_follow_ups(search_params):
+            key = tuple(sorted(params.items()))
+            with self.lock:
+                if key in self.pending or params in self.cache:
+                    continue
+                try:
+                    self.queue.put_nowait((priority, next(self.counter), params))
+                except queue.Full:
+                    self.stats["dropped"] += 1
+                    continue
+                self.pending.add(key)
+                self.stats["queued"] += 1
+        self._ensure_worker()
+
+    def _ensure_worker(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._work, name="prefetch", daemon=True)
+            self._thread.start()
+
+    def _work(self):
+        while True:
+            _, _, params = self.queue.get()
+            try:
+                if params in self.cache:
+                    continue
+                if not self.budget.try_acquire():
+                    self.stats["skipped_budget"] += 1
+                    continue
+                self.cache.put(params, self.fetch_fn(params), source="prefetch")
+                self.stats["prefetched"] += 1
+            except Exception as e:
+                print(f"Prefetch failed for {params}: {e}")
+                self.stats["errors"] += 1
+            finally:
+                with self.lock:
+                    self.pending.discard(tuple(sorted(params.items())))
+                self.queue.task_done()
+
+    def report(self) -> dict:
+        hits = self.cache.stats["prefetch_hits"]
+        prefetched = self.stats["prefetched"]
+        return {**self.stats, "hits": hits, "hit_rate": round(hits / prefetched, 3) if prefetched else 0.0}
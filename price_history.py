@@ -0,0 +1,264 @@
+"""
+Append-only, columnar price history for routes and dates.
+
+Every search result is summarised into one row keyed by
+(origin, destination, departure date, cabin): cheapest price, median price,
+the carriers seen and the observation time. Rows are appended to an in-memory
+chunk of typed arrays; full chunks are sealed and, when a directory is
+configured, written as flat column files that are memory-mapped back on load.
+With a directory, the active chunk is also sealed once it is `flush_seconds`
+old, so a restart loses at most that much history. `compact` merges sealed
+chunks into one chunk sorted by key; `maintain` (run periodically by the app)
+flushes and compacts once there are more than `compact_chunks` chunks.
+
+Lookups go through a per-key row index, so answering "is this a good price?"
+is a dictionary lookup plus a few array reads.
+"""
+import bisect
+import json
+import mmap
+import os
+import statistics
+import struct
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+MAGIC = b"PHC1"
+HEADER = struct.Struct("<4sI")  # magic, row count
+# Column name -> array typecode. Ordered widest first so mmap views stay aligned.
+COLUMNS = (("observed_at", "q"), ("key_id", "i"), ("carriers_id", "i"), ("min_price", "f"), ("median_price", "f"))
+
+
+def _empty_columns() -> dict:
+    return {name: array(code) for name, code in COLUMNS}
+
+
+class PriceHistoryStore:
+    """
+    Args:
+        path: Directory for chunk files. None keeps everything in memory.
+        chunk_rows: Rows held in the active chunk before it is sealed
+        flush_seconds: Age at which the active chunk is sealed and written (with a directory)
+        compact_chunks: Chunks kept before `maintain` compacts them into one
+    """
+
+    def __init__(self, path: Optional[str] = None, chunk_rows: int = 4096, flush_seconds: float = 60,
+                 compact_chunks: int = 16):
+        self.path = path
+        self.chunk_rows = chunk_rows
+        self.flush_seconds = flush_seconds
+        self.compact_chunks = compact_chunks
+        self.active_since = None
+        self.lock = threading.Lock()
+        # Dictionary encoding for keys and carrier sets
+        self.keys: List[str] = []
+        self.key_ids: Dict[str, int] = {}
+        self.carrier_sets: List[str] = []
+        self.carrier_ids: Dict[str, int] = {}
+        # Sealed chunks (column dicts of arrays or memoryviews) and their first global row
+        self.chunks: List[dict] = []
+        self.chunk_starts: List[int] = []
+        self._files = []
+        self.active = _empty_columns()
+        # key_id -> global row numbers, in append order
+        self.index: Dict[int, array] = {}
+        self.rows = 0
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    @staticmethod
+    def make_key(origin: str, destination: str, departure_date: str, cabin: Optional[str] = None) -> str:
+        return f"{origin.upper()}|{destination.upper()}|{departure_date}|{(cabin or 'ECONOMY').upper()}"
+
+    def _intern(self, value: str, values: list, ids: dict) -> int:
+        if value not in ids:
+            ids[value] = len(values)
+            values.append(value)
+        return ids[value]
+
+    def record(self, origin: str, destination: str, departure_date: str, cabin: Optional[str],
+               prices: List[float], carriers: List[str], observed_at: Optional[float] = None):
+        """Append one observation summarising a search result. Empty results are ignored."""
+        if not prices:
+            return
+        key = self.make_key(origin, destination, departure_date, cabin)
+        with self.lock:
+            key_id = self._intern(key, self.keys, self.key_ids)
+            carriers_id = self._intern(",".join(sorted(set(carriers))), self.carrier_sets, self.carrier_ids)
+            self.active["observed_at"].append(int(observed_at or time.time()))
+            self.active["key_id"].append(key_id)
+            self.active["carriers_id"].append(carriers_id)
+            self.active["min_price"].append(min(prices))
+            self.active["median_price"].append(statistics.median(prices))
+            self.index.setdefault(key_id, array("I")).append(self.rows)
+            self.rows += 1
+            if self.active_since is None:
+                self.active_since = time.monotonic()
+            if len(self.active["key_id"]) >= self.chunk_rows or (
+                    self.path and time.monotonic() - self.active_since >= self.flush_seconds):
+                self._seal()
+
+    def _row(self, row: int) -> dict:
+        sealed_rows = self.chunk_starts[-1] + len(self.chunks[-1]["key_id"]) if self.chunks else 0
+        if row >= sealed_rows:
+            columns, offset = self.active, row - sealed_rows
+        else:
+            chunk_no = bisect.bisect_right(self.chunk_starts, row) - 1
+            columns, offset = self.chunks[chunk_no], row - self.chunk_starts[chunk_no]
+        return {
+            "observed_at": columns["observed_at"][offset],
+            "min_price": columns["min_price"][offset],
+            "median_price": columns["median_price"][offset],
+            "carriers": self.carrier_sets[columns["carriers_id"][offset]],
+        }
+
+    def query(self, origin: str, destination: str, departure_date: str, cabin: Optional[str] = None) -> List[dict]:
+        """All observations for a route and date, oldest first"""
+        key_id = self.key_ids.get(self.make_key(origin, destination, departure_date, cabin))
+        if key_id is None:
+            return []
+        with self.lock:
+            return [self._row(row) for row in self.index[key_id]]
+
+    def assess(self, origin: str, destination: str, departure_date: str, cabin: Optional[str] = None,
+               price: Optional[float] = None) -> dict:
+        """Summarise the history of a route and, if given, rank `price` against it"""
+        observations = self.query(origin, destination, departure_date, cabin)
+        if not observations:
+            return {"observations": 0}
+        lows = sorted(o["min_price"] for o in observations)
+        summary = {
+            "observations": len(observations),
+            "lowest_seen": round(lows[0], 2),
+            "typical_low": round(statistics.median(lows), 2),
+            "highest_low": round(lows[-1], 2),
+            "latest_low": round(observations[-1]["min_price"], 2),
+            "first_seen": observations[0]["observed_at"],
+            "last_seen": observations[-1]["observed_at"],
+        }
+        if price is not None:
+            # Share of past observations that were cheaper than `price`
+            summary["percentile"] = round(100 * bisect.bisect_left(lows, price) / len(lows))
+        return summary
+
+    # Chunk storage
+
+    def _seal(self):
+        if not self.active["key_id"]:
+            return
+        columns = self.active
+        self.active_since = None
+        self.chunk_starts.append(self.chunk_starts[-1] + len(self.chunks[-1]["key_id"]) if self.chunks else 0)
+        self.chunks.append(columns)
+        self.active = _empty_columns()
+        if self.path:
+            self._write_chunk(len(self.chunks) - 1, columns)
+            self._write_dictionary()
+
+    def flush(self):
+        """Seal the active chunk (and write it out when a directory is configured)"""
+        with self.lock:
+            self._seal()
+
+    def maintain(self):
+        """Write out the active chunk, and compact once chunks pile up (run periodically by the app)"""
+        self.flush()
+        if len(self.chunks) > self.compact_chunks:
+            self.compact()
+
+    def _chunk_path(self, chunk_no: int) -> str:
+        return os.path.join(self.path, f"chunk-{chunk_no:06d}.bin")
+
+    def _write_chunk(self, chunk_no: int, columns: dict):
+        tmp = self._chunk_path(chunk_no) + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(HEADER.pack(MAGIC, len(columns["key_id"])))
+            for name, _ in COLUMNS:
+                columns[name].tofile(f)
+        os.replace(tmp, self._chunk_path(chunk_no))
+
+    def _write_dictionary(self):
+        tmp = os.path.join(self.path, "dictionary.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"keys": self.keys, "carriers": self.carrier_sets}, f)
+        os.replace(tmp, os.path.join(self.path, "dictionary.json"))
+
+    def _load(self):
+        dictionary_path = os.path.join(self.path, "dictionary.json")
+        if not os.path.exists(dictionary_path):
+            return
+        with open(dictionary_path) as f:
+            dictionary = json.load(f)
+        self.keys = dictionary["keys"]
+        self.key_ids = {k: i for i, k in enumerate(self.keys)}
+        self.carrier_sets = dictionary["carriers"]
+        self.carrier_ids = {c: i for i, c in enumerate(self.carrier_sets)}
+
+        chunk_no = 0
+        while os.path.exists(self._chunk_path(chunk_no)):
+            with open(self._chunk_path(chunk_no), "rb") as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._files.append(mapped)
+            magic, count = HEADER.unpack_from(mapped)
+            if magic != MAGIC:
+                raise ValueError(f"Not a price history chunk: {self._chunk_path(chunk_no)}")
+            view, offset, columns = memoryview(mapped), HEADER.size, {}
+            for name, code in COLUMNS:
+                size = array(code).itemsize * count
+                columns[name] = view[offset:offset + size].cast(code)
+                offset += size
+            self.chunk_starts.append(self.rows)
+            self.chunks.append(columns)
+            for key_id in columns["key_id"]:
+                self.index.setdefault(key_id, array("I")).append(self.rows)
+                self.rows += 1
+            chunk_no += 1
+
+    def compact(self):
+        """
+        Merge all sealed chunks (and the active one) into a single chunk sorted by
+        key and time, so each route's rows are contiguous.
+        """
+        with self.lock:
+            self._seal()
+            if len(self.chunks) <= 1:
+                return
+            order = sorted(range(self.rows), key=lambda row: (self._key_of(row), self._time_of(row)))
+            merged = _empty_columns()
+            for row in order:
+                chunk_no = bisect.bisect_right(self.chunk_starts, row) - 1
+                offset = row - self.chunk_starts[chunk_no]
+                for name, _ in COLUMNS:
+                    merged[name].append(self.chunks[chunk_no][name][offset])
+
+            old_chunks = len(self.chunks)
+            self.chunks, self.chunk_starts, self.index = [merged], [0], {}
+            for row, key_id in enumerate(merged["key_id"]):
+                self.index.setdefault(key_id, array("I")).append(row)
+
+            if self.path:
+                self._release_files()
+                self._write_chunk(0, merged)
+                for chunk_no in range(1, old_chunks):
+                    os.remove(self._chunk_path(chunk_no))
+                self._write_dictionary()
+
+    def _key_of(self, row: int) -> int:
+        chunk_no = bisect.bisect_right(self.chunk_starts, row) - 1
+        return self.chunks[chunk_no]["key_id"][row - self.chunk_starts[chunk_no]]
+
+    def _time_of(self, row: int) -> int:
+        chunk_no = bisect.bisect_right(self.chunk_starts, row) - 1
+        return self.chunks[chunk_no]["observed_at"][row - self.chunk_starts[chunk_no]]
+
+    def _release_files(self):
+        for mapped in self._files:
+            try:
+                mapped.close()
+            except BufferError:
+                # Still referenced by a view; it is freed once the view goes away
+                pass
+        self._files = []
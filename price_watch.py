@@ -0,0 +1,205 @@
+"""
+Saved searches ("tell me if JFK-LAX drops below $200") checked in the background.
+
+Watches reuse the `search_flights` query shape (see tools.build_search_params).
+A single in-process scheduler thread wakes up periodically, picks the watches that
+are due, coalesces identical routes across users into one upstream search, and
+emits threshold events through a pluggable notifier. Watches whose departure
+date has passed are dropped. By default events wait in an in-memory inbox per
+user (session), handed to the user with their next agent reply or GET /alerts.
+"""
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import date
+from typing import Callable, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from models import raw_total
+from quota import TokenBucket
+
+
+class SavedSearch(BaseModel):
+    watch_id: str
+    user_id: str
+    search_params: dict
+    threshold: float
+    interval_seconds: int = 3600
+    next_run: float = 0.0
+    last_price: Optional[float] = None
+    triggered: bool = False
+
+
+def route_key(search_params: dict) -> tuple:
+    """Identical searches across users share this key (and one Amadeus call)"""
+    return tuple(sorted((k, str(v)) for k, v in search_params.items()))
+
+
+class Notifier(ABC):
+    """Base notifier. Subclass and implement `notify` to deliver events (email, push, ...)"""
+
+    @abstractmethod
+    def notify(self, event: dict):
+        ...
+
+
+class LocalNotifier(Notifier):
+    """
+    Keeps events in memory per user until they are collected with `pop`.
+
+    Args:
+        max_events: Events kept per user, oldest dropped first
+    """
+
+    def __init__(self, max_events: int = 20):
+        self.max_events = max_events
+        self.events: Dict[str, List[dict]] = {}
+        self.lock = threading.Lock()
+
+    def notify(self, event: dict):
+        print(f"Price alert for {event['user_id']}: {event['route']} is now {event['price']} (threshold {event['threshold']})")
+        with self.lock:
+            events = self.events.setdefault(event["user_id"], [])
+            events.append(event)
+            del events[:-self.max_events]
+
+    def pop(self, user_id: str) -> List[dict]:
+        """The user's events not collected yet, oldest first"""
+        with self.lock:
+            return self.events.pop(user_id, [])
+
+
+class PriceWatchScheduler:
+    """
+    In-process scheduler for saved searches.
+
+    Args:
+        search_fn: Callable taking search params and returning the raw Amadeus offers (tools.flight_search)
+        notifier: Where threshold events are sent
+        rate_limiter: Token bucket limiting upstream searches per second
+        tick_seconds: How often the background thread checks for due watches
+        batch_size: Max distinct routes searched per tick
+    """
+
+    def __init__(
+        self,
+        search_fn: Callable[[dict], list],
+        notifier: Optional[Notifier] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        tick_seconds: float = 30,
+        batch_size: int = 20,
+    ):
+        self.search_fn = search_fn
+        self.notifier = notifier or LocalNotifier()
+        self.rate_limiter = rate_limiter or TokenBucket(rate=1, capacity=5)
+        self.tick_seconds = tick_seconds
+        self.batch_size = batch_size
+        self.watches: Dict[str, SavedSearch] = {}
+        self.lock = threading.Lock()
+        self.stats = {"searches": 0, "coalesced": 0, "deferred": 0, "expired": 0, "events": 0, "errors": 0}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def add(self, user_id: str, search_params: dict, threshold: float, interval_seconds: int = 3600) -> SavedSearch:
+        watch = SavedSearch(
+            watch_id=uuid.uuid4().hex[:8],
+            user_id=user_id,
+            search_params=search_params,
+            threshold=threshold,
+            interval_seconds=interval_seconds,
+        )
+        with self.lock:
+            self.watches[watch.watch_id] = watch
+        return watch
+
+    def remove(self, watch_id: str, user_id: Optional[str] = None) -> bool:
+        """Delete a watch; with `user_id`, only one of that user's"""
+        with self.lock:
+            watch = self.watches.get(watch_id)
+            if watch is None or (user_id is not None and watch.user_id != user_id):
+                return False
+            del self.watches[watch_id]
+            return True
+
+    def _expire(self, today: str) -> int:
+        """Drop the watches whose departure date has passed (caller holds the lock)"""
+        expired = [w.watch_id for w in self.watches.values() if w.search_params["departureDate"] < today]
+        for watch_id in expired:
+            del self.watches[watch_id]
+        self.stats["expired"] += len(expired)
+        return len(expired)
+
+    def run_due(self, now: Optional[float] = None) -> int:
+        """
+        Run one scheduling pass: search every due route once and notify watchers.
+        Returns the number of upstream searches made.
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            self._expire(date.fromtimestamp(now).isoformat())
+            due = [w for w in self.watches.values() if w.next_run <= now]
+
+        # Coalesce identical routes across users
+        by_route: Dict[tuple, List[SavedSearch]] = {}
+        for watch in due:
+            by_route.setdefault(route_key(watch.search_params), []).append(watch)
+
+        searches = 0
+        batch = list(by_route.items())[: self.batch_size]
+        for key, watches in batch:
+            if not self.rate_limiter.try_acquire():
+                # Out of quota, leave the rest of the batch due for the next tick
+                self.stats["deferred"] += len(batch) - searches
+                break
+
+            searches += 1
+            self.stats["searches"] += 1
+            self.stats["coalesced"] += len(watches) - 1
+            try:
+                offers = self.search_fn(watches[0].search_params)
+            except Exception as e:
+                print(f"Price watch search failed for {key}: {e}")
+                self.stats["errors"] += 1
+                offers = None
+
+            cheapest = min(map(raw_total, offers), default=None) if isinstance(offers, list) else None
+
+            for watch in watches:
+                watch.next_run = now + watch.interval_seconds
+                if cheapest is None:
+                    continue
+                watch.last_price = cheapest
+                if cheapest <= watch.threshold and not watch.triggered:
+                    watch.triggered = True
+                    self.stats["events"] += 1
+                    self.notifier.notify({
+                        "watch_id": watch.watch_id,
+                        "user_id": watch.user_id,
+                        "route": f"{watch.search_params['originLocationCode']}-{watch.search_params['destinationLocationCode']} on {watch.search_params['departureDate']}",
+                        "price": cheapest,
+                        "threshold": watch.threshold,
+                        "observed_at": now,
+                    })
+                elif cheapest > watch.threshold:
+                    # Re-arm so the next drop is reported again
+                    watch.triggered = False
+
+        return searches
+
+    def _loop(self):
+        while not self._stop.wait(self.tick_seconds):
+            try:
+                self.run_due()
+            except Exception as e:
+                print(f"Price watch scheduler error: {e}")
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="price-watch", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
@@ -0,0 +1,179 @@
+"""
+Batched price confirmation of shortlisted flight offers.
+
+Search prices are indicative. The Flight Offers Price API confirms them and
+accepts up to MAX_PRICING_BATCH offers per request. When the user compares a
+few options, they are confirmed together, in as few requests as possible,
+with independent batches sent concurrently.
+
+Offers shown to the agent get a short reference (`offer_ref`) so it can ask
+for them to be priced later, see OfferStore.
+
+Confirmed prices are cached by offer fingerprint: the flights, fare basis and
+passenger mix, and not the search-specific offer id or the indicative price.
+The same fare found by another search or another user is not priced again
+while its quote is fresh.
+"""
+import contextvars
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from typing import Callable, List, Optional
+
+from amadeus import ResponseError
+
+from serializer import dumps_bytes, loads
+
+# Offers the Flight Offers Price API accepts in one request
+MAX_PRICING_BATCH = 6
+
+
+class OfferStore:
+    """Recently shown raw offers by reference, so the agent can refer back to them"""
+
+    def __init__(self, max_entries: int = 2048):
+        self.max_entries = max_entries
+        self.offers = OrderedDict()
+        self.lock = threading.Lock()
+
+    def add(self, offer: dict) -> str:
+        encoded = dumps_bytes(offer)
+        ref = "OF" + hashlib.sha1(encoded).hexdigest()[:10].upper()
+        with self.lock:
+            self.offers[ref] = encoded
+            self.offers.move_to_end(ref)
+            while len(self.offers) > self.max_entries:
+                self.offers.popitem(last=False)
+        return ref
+
+    def get(self, ref: str) -> Optional[dict]:
+        with self.lock:
+            encoded = self.offers.get(ref)
+        return loads(encoded) if encoded is not None else None
+
+
+def offer_fingerprint(offer: dict) -> str:
+    """Stable identity of a fare: same flights, fare basis / booking class per segment and passenger mix"""
+    flights = [
+        (s["carrierCode"], s["number"], s["departure"]["iataCode"], s["departure"]["at"], s["arrival"]["iataCode"])
+        for itinerary in offer["itineraries"] for s in itinerary["segments"]
+    ]
+    travelers = sorted(
+        (traveler.get("travelerType", ""), traveler.get("fareOption", ""),
+         tuple((f.get("fareBasis", ""), f.get("class", ""), f.get("cabin", "")) for f in traveler.get("fareDetailsBySegment", ())))
+        for traveler in offer.get("travelerPricings", ())
+    )
+    key = repr((flights, travelers, offer["price"].get("currency", "")))
+    return hashlib.sha1(key.encode()).hexdigest()
+
+
+class PriceQuoteCache:
+    """
+    Confirmed offers by fingerprint, fresh for `ttl_seconds` and never past
+    their last ticketing date. Stale quotes are priced again.
+    """
+
+    def __init__(self, ttl_seconds: float = 900, max_entries: int = 4096):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.quotes = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "pricing_requests": 0}
+
+    def get(self, fingerprint: str) -> Optional[dict]:
+        with self.lock:
+            entry = self.quotes.get(fingerprint)
+            if entry is not None and entry[0] < time.time():
+                del self.quotes[fingerprint]
+                self.stats["stale"] += 1
+                entry = None
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, fingerprint: str, priced: dict):
+        expires_at = time.time() + self.ttl_seconds
+        last_ticketing = priced.get("lastTicketingDate")
+        if last_ticketing:
+            # The fare can be ticketed until the end of that day
+            ticketable_until = datetime.combine(date.fromisoformat(last_ticketing[:10]), datetime.max.time()).timestamp()
+            expires_at = min(expires_at, ticketable_until)
+        if expires_at <= time.time():
+            return
+        with self.lock:
+            self.quotes[fingerprint] = (expires_at, priced)
+            self.quotes.move_to_end(fingerprint)
+            while len(self.quotes) > self.max_entries:
+                self.quotes.popitem(last=False)
+
+    def report(self) -> dict:
+        """`hits` is the number of offer pricings avoided"""
+        return {**self.stats, "cached_quotes": len(self.quotes)}
+
+
+def _price_batch(client, offers: List[dict]) -> List[Optional[dict]]:
+    """One pricing request; offers are numbered so the answers map back whatever their search ids were"""
+    numbered = [{**offer, "id": str(n)} for n, offer in enumerate(offers, 1)]
+    response = client.shopping.flight_offers.pricing.post(numbered)
+    priced = {o.get("id"): o for o in response.data.get("flightOffers", [])}
+    return [priced.get(str(n)) for n in range(1, len(offers) + 1)]
+
+
+def price_offers(client, offers: List[dict], acquire: Optional[Callable[[], None]] = None,
+                 cache: Optional[PriceQuoteCache] = None,
+                 batch_size: int = MAX_PRICING_BATCH, max_workers: int = 4) -> List[Optional[dict]]:
+    """
+    Confirm `offers` in batches of up to `batch_size`, sending the batches concurrently.
+
+    Args:
+        client: amadeus.Client
+        offers: Raw flight offers from a search
+        acquire: Called before every request (rate limiting)
+        cache: Fresh quotes are taken from here; only the other offers are priced, and stored
+
+    Returns:
+        The priced offer for each input offer, in order (None when it could not be priced).
+        A batch the API rejects as a whole is retried one offer at a time, so one
+        unavailable fare does not fail the others.
+    """
+    if cache is not None:
+        fingerprints = [offer_fingerprint(offer) for offer in offers]
+        results = [cache.get(fingerprint) for fingerprint in fingerprints]
+        missing = [i for i, quote in enumerate(results) if quote is None]
+        priced_missing = _price_uncached(client, [offers[i] for i in missing], acquire, batch_size, max_workers, cache.stats)
+        for i, priced in zip(missing, priced_missing):
+            results[i] = priced
+            if priced is not None:
+                cache.put(fingerprints[i], priced)
+        return results
+    return _price_uncached(client, offers, acquire, batch_size, max_workers)
+
+
+def _price_uncached(client, offers: List[dict], acquire, batch_size: int, max_workers: int,
+                    stats: Optional[dict] = None) -> List[Optional[dict]]:
+    def run(batch):
+        if acquire:
+            acquire()
+        if stats is not None:
+            stats["pricing_requests"] += 1
+        try:
+            return _price_batch(client, batch)
+        except ResponseError as error:
+            if len(batch) == 1:
+                print(f"Pricing failed: {error}")
+                return [None]
+            return [result for offer in batch for result in run([offer])]
+
+    batches = [offers[i:i + batch_size] for i in range(0, len(offers), batch_size)]
+    if len(batches) <= 1:
+        return run(batches[0]) if batches else []
+    # Each batch runs in a copy of the caller's context (quota session, priority)
+    contexts = [contextvars.copy_context() for _ in batches]
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+        results = pool.map(lambda context, batch: context.run(run, batch), contexts, batches)
+        return [priced for batch in results for priced in batch]
@@ -0,0 +1,243 @@
+"""
+Shared quota for the upstream APIs (Amadeus, Gemini) across sessions.
+
+Every upstream call first asks a QuotaScheduler for a token. A call needs a
+token from the global bucket (the API key's rate limit) and one from its
+session's bucket (so one user can't use the whole key). Waiting calls are
+served interactive first, then in weighted fair order across sessions. A
+session that has been served a lot waits behind the ones that haven't. When
+too many calls are waiting, or one waits too long, QuotaExceeded is raised
+and /agent answers 429.
+
+The session and priority of a call come from context variables, set by
+`run_agent` for interactive turns. Work started anywhere else (prefetching,
+price watches) runs as background work. A call whose request deadline
+expires while it waits gives up its place (DeadlineExceeded, see deadline.py).
+"""
+import asyncio
+import contextvars
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from langchain_core.runnables import RunnableLambda
+
+from deadline import DeadlineExceeded, current_deadline
+
+
+class TokenBucket:
+    """Simple thread-safe token bucket: `rate` tokens per second, up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return True
+            return False
+
+    def release(self, tokens: float = 1):
+        """Give back tokens taken by `try_acquire` that ended up unused"""
+        with self.lock:
+            self.tokens = min(self.capacity, self.tokens + tokens)
+
+
+INTERACTIVE = 0
+BACKGROUND = 1
+
+current_session = contextvars.ContextVar("current_session", default="background")
+current_priority = contextvars.ContextVar("current_priority", default=BACKGROUND)
+
+
+class QuotaExceeded(Exception):
+    """Raised when a call is shed: too many calls waiting, or waited past the deadline"""
+
+    def __init__(self, name: str, reason: str, retry_after: float):
+        super().__init__(f"{name} quota exceeded ({reason}), retry in {retry_after:g}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Ticket:
+    __slots__ = ("session_id", "priority", "tag", "seq", "enqueued", "granted")
+
+    def __init__(self, session_id, priority, tag, seq):
+        self.session_id = session_id
+        self.priority = priority
+        self.tag = tag
+        self.seq = seq
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+
+class QuotaScheduler:
+    """
+    Args:
+        name: Upstream name, used in errors and metrics
+        rate: Global calls per second
+        capacity: Global burst
+        session_rate: Calls per second for a single session
+        session_capacity: Burst for a single session
+        max_waiting: Calls allowed to wait; beyond this new calls are shed
+        max_wait_seconds: A call waiting longer than this is shed
+        weights: Optional session_id -> weight (default 1) for the fair share
+        max_sessions: Session buckets kept, least recently used dropped first
+    """
+
+    def __init__(self, name: str, rate: float, capacity: int, session_rate: float, session_capacity: int,
+                 max_waiting: int = 100, max_wait_seconds: float = 10, weights: Optional[dict] = None,
+                 max_sessions: int = 10000):
+        self.name = name
+        self.bucket = TokenBucket(rate, capacity)
+        self.session_rate = session_rate
+        self.session_capacity = session_capacity
+        self.max_waiting = max_waiting
+        self.max_wait_seconds = max_wait_seconds
+        self.weights = weights or {}
+        self.max_sessions = max_sessions
+        self.poll_seconds = min(0.05, 1 / rate)
+        self.sessions = OrderedDict()  # session_id -> (TokenBucket, last finish tag)
+        self.waiting = []
+        self.virtual_time = 0.0
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+        self.stats = {"granted": 0, "granted_background": 0, "queued": 0, "shed": 0, "timed_out": 0,
+                      "deadline_expired": 0, "wait_seconds": 0.0, "max_queue_depth": 0}
+
+    def _session(self, session_id: str) -> list:
+        entry = self.sessions.get(session_id)
+        if entry is None:
+            entry = self.sessions[session_id] = [TokenBucket(self.session_rate, self.session_capacity), 0.0]
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session_id)
+        return entry
+
+    def _enqueue(self, session_id: str, priority: int) -> _Ticket:
+        with self.lock:
+            if len(self.waiting) >= self.max_waiting:
+                self.stats["shed"] += 1
+                raise QuotaExceeded(self.name, "too many waiting calls", self.max_wait_seconds)
+            session = self._session(session_id)
+            # Weighted fair queuing: each call finishes 1/weight after the later of
+            # "now" (virtual) and the session's previous call
+            tag = max(self.virtual_time, session[1]) + 1 / self.weights.get(session_id, 1)
+            session[1] = tag
+            ticket = _Ticket(session_id, priority, tag, next(self.counter))
+            self.waiting.append(ticket)
+            self.waiting.sort(key=lambda t: (t.priority, t.tag, t.seq))
+            self.stats["queued"] += 1
+            self.stats["max_queue_depth"] = max(self.stats["max_queue_depth"], len(self.waiting))
+            self._dispatch()
+            return ticket
+
+    def _dispatch(self):
+        """Hand out the available tokens in queue order (caller holds the lock)"""
+        while self.waiting and self.bucket.try_acquire():
+            for ticket in self.waiting:
+                if self._session(ticket.session_id)[0].try_acquire():
+                    ticket.granted = True
+                    self.waiting.remove(ticket)
+                    self.virtual_time = max(self.virtual_time, ticket.tag)
+                    self.stats["granted"] += 1
+                    if ticket.priority == BACKGROUND:
+                        self.stats["granted_background"] += 1
+                    self.stats["wait_seconds"] += time.monotonic() - ticket.enqueued
+                    break
+            else:
+                # Every waiting session is over its own limit, keep the global token
+                self.bucket.release()
+                return
+
+    def _poll(self, ticket: _Ticket, deadline=None) -> bool:
+        """True once granted; raises QuotaExceeded after max_wait_seconds, DeadlineExceeded once `deadline` expires"""
+        with self.lock:
+            if not ticket.granted:
+                self._dispatch()
+            if ticket.granted:
+                return True
+            if deadline is not None and deadline.expired():
+                self.waiting.remove(ticket)
+                self.stats["deadline_expired"] += 1
+                raise DeadlineExceeded(f"{self.name}: {deadline.reason or 'deadline expired'} while waiting for quota")
+            if time.monotonic() - ticket.enqueued > self.max_wait_seconds:
+                self.waiting.remove(ticket)
+                self.stats["timed_out"] += 1
+                raise QuotaExceeded(self.name, "waited too long", self.max_wait_seconds)
+            return False
+
+    def _check_deadline(self, deadline):
+        if deadline is None:
+            return
+        try:
+            deadline.check()
+        except DeadlineExceeded as e:
+            with self.lock:
+                self.stats["deadline_expired"] += 1
+            raise DeadlineExceeded(f"{self.name}: {e}, call not started") from None
+
+    def _abandon(self, ticket: _Ticket):
+        """Drop a ticket whose caller went away (task cancelled)"""
+        with self.lock:
+            if ticket in self.waiting:
+                self.waiting.remove(ticket)
+
+    def acquire(self, session_id: Optional[str] = None, priority: Optional[int] = None):
+        """Block until the call may go upstream (for calls made from worker threads)"""
+        deadline = current_deadline.get()
+        self._check_deadline(deadline)
+        ticket = self._enqueue(session_id or current_session.get(), current_priority.get() if priority is None else priority)
+        while not self._poll(ticket, deadline):
+            time.sleep(self.poll_seconds)
+
+    async def aacquire(self, session_id: Optional[str] = None, priority: Optional[int] = None):
+        """Same as `acquire` without blocking the event loop"""
+        deadline = current_deadline.get()
+        self._check_deadline(deadline)
+        ticket = self._enqueue(session_id or current_session.get(), current_priority.get() if priority is None else priority)
+        try:
+            while not self._poll(ticket, deadline):
+                await asyncio.sleep(self.poll_seconds)
+        except asyncio.CancelledError:
+            self._abandon(ticket)
+            raise
+
+    def gate(self) -> RunnableLambda:
+        """Pass-through runnable that waits for a token, chained in front of an LLM call"""
+        def wait(value):
+            self.acquire()
+            return value
+
+        async def await_token(value):
+            await self.aacquire()
+            return value
+
+        return RunnableLambda(wait, afunc=await_token, name=f"{self.name}_quota")
+
+    def check_admission(self):
+        """Shed new requests up front when the queue is already full"""
+        if len(self.waiting) >= self.max_waiting:
+            with self.lock:
+                self.stats["shed"] += 1
+            raise QuotaExceeded(self.name, "too many waiting calls", self.max_wait_seconds)
+
+    def report(self) -> dict:
+        granted = self.stats["granted"]
+        return {
+            **self.stats,
+            "wait_seconds": round(self.stats["wait_seconds"], 3),
+            "avg_wait_seconds": round(self.stats["wait_seconds"] / granted, 4) if granted else 0.0,
+            "queue_depth": len(self.waiting),
+            "sessions": len(self.sessions),
+        }
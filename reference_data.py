@@ -0,0 +1,90 @@
+"""
+Human-readable names for the codes in flight offers (carriers, aircraft, cities).
+
+Every Flight Offers Search response carries a `dictionaries` block with the
+names of the carriers and aircraft and the city/country of the airports used
+by its offers. Those are merged into one process-wide table as responses come
+in, so results can show "DELTA AIR LINES" or "AIRBUS A321" without another
+API call or asking the model to guess. Codes and names are interned: the
+table only grows with distinct codes, and every decoded offer shares the
+same string objects, however many searches are kept around.
+"""
+import sys
+import threading
+from typing import Optional
+
+
+def intern_code(value):
+    """Intern short, highly repetitive strings (IATA codes, names)"""
+    return sys.intern(value) if type(value) is str else value
+
+
+class ReferenceTable:
+    """Carrier names, aircraft names and airport locations keyed by code"""
+
+    def __init__(self):
+        self.carriers = {}
+        self.aircraft = {}
+        self.locations = {}  # airport code -> (city code, country code)
+        self.lock = threading.Lock()
+
+    def update(self, dictionaries: Optional[dict]):
+        """Merge the `dictionaries` block of a flight offers response"""
+        if not dictionaries:
+            return
+        with self.lock:
+            for code, name in dictionaries.get("carriers", {}).items():
+                if code not in self.carriers:
+                    self.carriers[intern_code(code)] = intern_code(name)
+            for code, name in dictionaries.get("aircraft", {}).items():
+                if code not in self.aircraft:
+                    self.aircraft[intern_code(code)] = intern_code(name)
+            for code, location in dictionaries.get("locations", {}).items():
+                if code not in self.locations:
+                    self.locations[intern_code(code)] = (
+                        intern_code(location.get("cityCode", "")),
+                        intern_code(location.get("countryCode", "")),
+                    )
+
+    def carrier_name(self, code: str, dictionaries: Optional[dict] = None) -> Optional[str]:
+        """Name from the response's own dictionaries first, then from earlier responses"""
+        if dictionaries and code in dictionaries.get("carriers", {}):
+            return dictionaries["carriers"][code]
+        return self.carriers.get(code)
+
+    def aircraft_name(self, code: str, dictionaries: Optional[dict] = None) -> Optional[str]:
+        if dictionaries and code in dictionaries.get("aircraft", {}):
+            return dictionaries["aircraft"][code]
+        return self.aircraft.get(code)
+
+    def city_code(self, code: str, dictionaries: Optional[dict] = None) -> Optional[str]:
+        if dictionaries and code in dictionaries.get("locations", {}):
+            return dictionaries["locations"][code].get("cityCode")
+        location = self.locations.get(code)
+        return location[0] if location else None
+
+    def dictionaries_for(self, offers: list) -> dict:
+        """A `dictionaries` block with what the table knows of the codes used by `offers`"""
+        carriers, aircraft, locations = {}, {}, {}
+        with self.lock:
+            for offer in offers:
+                for itinerary in offer.get("itineraries", ()):
+                    for segment in itinerary["segments"]:
+                        for code in (segment.get("carrierCode"), segment.get("operating", {}).get("carrierCode")):
+                            if code in self.carriers:
+                                carriers[code] = self.carriers[code]
+                        code = segment.get("aircraft", {}).get("code")
+                        if code in self.aircraft:
+                            aircraft[code] = self.aircraft[code]
+                        for end in (segment["departure"], segment["arrival"]):
+                            location = self.locations.get(end.get("iataCode"))
+                            if location:
+                                locations[end["iataCode"]] = {"cityCode": location[0], "countryCode": location[1]}
+        return {"carriers": carriers, "aircraft": aircraft, "locations": locations}
+
+    def stats(self) -> dict:
+        return {"carriers": len(self.carriers), "aircraft": len(self.aircraft), "locations": len(self.locations)}
+
+
+# Shared by the agent tools and AmadeusFlightAPI
+reference = ReferenceTable()
@@ -0,0 +1,112 @@
+"""
+Answering narrower follow-up searches from a cached wider one.
+
+"Only nonstop", "under $300" or "exclude Spirit" re-run the same search with
+tighter filters. When a cached search for the same route, dates, passengers
+and cabin covers every offer the new one can return, its offers are filtered
+locally instead of calling Amadeus again.
+
+Search params are compared in their normalized form (search_cache.normalize_params):
+string values, upper case.
+"""
+from typing import Optional
+
+# A refinement must match these exactly
+IDENTITY_KEYS = (
+    "originLocationCode", "destinationLocationCode", "departureDate", "returnDate",
+    "adults", "children", "infants", "travelClass", "currencyCode",
+)
+
+# Amadeus returns at most this many offers when `max` is not set
+AMADEUS_MAX_RESULTS = 250
+
+
+def identity(params: dict) -> tuple:
+    return tuple(params.get(k) for k in IDENTITY_KEYS)
+
+
+def _codes(value: Optional[str]) -> Optional[frozenset]:
+    return frozenset(c.strip() for c in value.split(",") if c.strip()) if value else None
+
+
+def _allows_all_carriers_of(wide: dict, narrow: dict) -> bool:
+    """True if every carrier `narrow` accepts is also accepted by `wide`"""
+    wide_in, wide_out = _codes(wide.get("includedAirlineCodes")), _codes(wide.get("excludedAirlineCodes"))
+    narrow_in, narrow_out = _codes(narrow.get("includedAirlineCodes")), _codes(narrow.get("excludedAirlineCodes"))
+    if wide_in is None and wide_out is None:
+        return True
+    if wide_in is not None:
+        return narrow_in is not None and narrow_in <= wide_in
+    if narrow_in is not None:
+        return not (narrow_in & wide_out)
+    return narrow_out is not None and narrow_out >= wide_out
+
+
+def covers(wide: dict, narrow: dict) -> bool:
+    """
+    True if the offers of search `wide` include every offer search `narrow` can
+    return (same trip, equal or looser filters). Both are normalized params.
+    """
+    if identity(wide) != identity(narrow):
+        return False
+    if wide.get("nonStop") == "TRUE" and narrow.get("nonStop") != "TRUE":
+        return False
+    if wide.get("maxPrice") is not None:
+        if narrow.get("maxPrice") is None or float(narrow["maxPrice"]) > float(wide["maxPrice"]):
+            return False
+    return _allows_all_carriers_of(wide, narrow)
+
+
+def is_complete(params: dict, offers: list) -> bool:
+    """False when Amadeus may have cut the result off at `max`"""
+    return len(offers) < int(params.get("max") or AMADEUS_MAX_RESULTS)
+
+
+def matches(offer: dict, params: dict) -> bool:
+    """Apply the Amadeus filters of (normalized) `params` to one raw offer"""
+    itineraries = offer["itineraries"]
+    if params.get("nonStop") == "TRUE" and any(len(i["segments"]) > 1 for i in itineraries):
+        return False
+    if params.get("maxPrice") is not None:
+        travelers = len(offer.get("travelerPricings") or ()) or 1
+        if float(offer["price"]["total"]) / travelers > float(params["maxPrice"]):
+            return False
+    included, excluded = _codes(params.get("includedAirlineCodes")), _codes(params.get("excludedAirlineCodes"))
+    if included is not None or excluded is not None:
+        for itinerary in itineraries:
+            for segment in itinerary["segments"]:
+                carrier = segment["carrierCode"]
+                if (included is not None and carrier not in included) or (excluded is not None and carrier in excluded):
+                    return False
+    return True
+
+
+def refine(wide: dict, offers: list, narrow: dict, min_results: Optional[int] = None) -> Optional[list]:
+    """
+    The offers of `narrow`, taken from the cached result of `wide`, or None if
+    they can't be derived locally.
+
+    A complete `wide` result always works. A cut-off one (Amadeus returns the
+    cheapest first) still gives the right answer when at least `min_results`
+    offers pass the filters and the caller only needs the cheapest ones.
+    """
+    if not covers(wide, narrow):
+        return None
+    refined = [offer for offer in offers if matches(offer, narrow)]
+    if is_complete(wide, offers) or (min_results is not None and len(refined) >= min_results):
+        return refined[: int(narrow["max"])] if narrow.get("max") else refined
+    return None
+
+
+def departing_between(offers: list, after: Optional[str] = None, before: Optional[str] = None) -> list:
+    """
+    Keep offers whose first flight leaves between `after` and `before` ("HH:MM",
+    local airport time, inclusive). Amadeus has no such filter, so this always runs locally.
+    """
+    if not after and not before:
+        return offers
+    return [
+        offer for offer in offers
+        if (not after or offer["itineraries"][0]["segments"][0]["departure"]["at"][11:16] >= after)
+        and (not before or offer["itineraries"][0]["segments"][0]["departure"]["at"][11:16] <= before)
+    ]
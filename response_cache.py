@@ -0,0 +1,237 @@
+"""
+Cache of first-turn answers, in front of the agent.
+
+Many conversations open with nearly the same message ("cheap flights NYC to
+LA next weekend"). A first message is normalized: lower case, common city
+spellings folded, relative dates ("tomorrow", "next friday", "in 2 weeks")
+resolved against today. The normalized text is looked up exactly and then,
+failing that, by similarity.
+
+Similarity only decides between phrasings. Every word that is not generic
+filler ("find me", "cheap", "flights", "please"), and every number and date,
+must appear in the same order in both queries. The remaining wording is
+compared with cosine similarity over hashed word and word-pair counts, which
+is local and needs no model or external service. NYC -> LA and LA -> NYC, or
+a different date or passenger count, never match each other.
+
+A hit replays the answer and the search state it left in the session
+(slots, offer_refs) without running the agent. Entries live `ttl_seconds`.
+"""
+import math
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import List, Optional
+
+# Turns that used any of these tools carry personal data and are never cached
+UNCACHEABLE_TOOLS = ("collect_passenger_info", "book_mock_order", "lookup_order", "watch_flight_price", "cancel_price_watch")
+
+# Same place, different spellings
+PHRASES = (
+    ("new york city", "nyc"), ("new york", "nyc"), ("los angeles", "la"), ("san francisco", "sf"),
+    ("washington dc", "dc"), ("washington d.c.", "dc"), ("las vegas", "vegas"), ("one way", "oneway"),
+    ("one-way", "oneway"), ("round trip", "roundtrip"), ("round-trip", "roundtrip"),
+)
+
+# Words that don't change what is asked; everything else must match exactly
+FILLER = frozenset("""
+a an the me my i we us our you your please can could would like want need wanna looking look find show search
+get give some any for on in at of and with from to are is there what whats which hi hello hey thanks
+flight flights ticket tickets fare fares deal deals cheap cheapest cheaper lowest low budget price prices
+best good options option fly flying trip travel going go
+""".split())
+
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+MONTHS = ("january", "february", "march", "april", "may", "june", "july", "august", "september",
+          "october", "november", "december")
+_MONTH_RE = "|".join(m[:3] + f"(?:{m[3:]})?" if len(m) > 3 else m for m in MONTHS)
+
+_TOKEN_RE = re.compile(r"\d{4}-\d{2}-\d{2}|[a-z0-9]+")
+
+# Feature space of the hashed vectors, and the weight of filler-only features
+DIMENSIONS = 1 << 20
+FILLER_WEIGHT = 0.2
+
+
+def _weekday_after(today: date, weekday: int, skip_today: bool = True) -> date:
+    days = (weekday - today.weekday()) % 7
+    return today + timedelta(days=days or (7 if skip_today else 0))
+
+
+def _named_weekday(today: date, weekday: int, next_week: bool) -> date:
+    """"friday" is the coming one; "next friday" is the one of next week when the coming one is still this week"""
+    day = _weekday_after(today, weekday)
+    if next_week and day.isocalendar()[1] == today.isocalendar()[1]:
+        day += timedelta(days=7)
+    return day
+
+
+def _in_future(today: date, month: int, day: int) -> date:
+    """The next `month`/`day` on or after today"""
+    candidate = date(today.year, month, day)
+    return candidate if candidate >= today else date(today.year + 1, month, day)
+
+
+def resolve_dates(text: str, today: date) -> str:
+    """Replace relative and partial dates in lower-case `text` by ISO dates"""
+    iso = date.isoformat
+
+    def weekend(start: date) -> str:
+        return f"{iso(start)} {iso(start + timedelta(days=1))}"
+
+    rules = (
+        (r"\bday after tomorrow\b", lambda m: iso(today + timedelta(days=2))),
+        (r"\b(?:today|tonight)\b", lambda m: iso(today)),
+        (r"\btomorrow\b", lambda m: iso(today + timedelta(days=1))),
+        (r"\bthis weekend\b", lambda m: weekend(_weekday_after(today, 5, skip_today=False))),
+        (r"\bnext weekend\b", lambda m: weekend(_weekday_after(today, 5, skip_today=False) + timedelta(days=7))),
+        (r"\bnext week\b", lambda m: iso(_weekday_after(today, 0))),
+        (r"\bnext month\b", lambda m: iso(date(today.year + today.month // 12, today.month % 12 + 1, 1))),
+        (r"\b(?:(next|this|on)\s+)?(" + "|".join(WEEKDAYS) + r")\b",
+         lambda m: iso(_named_weekday(today, WEEKDAYS.index(m.group(2)), m.group(1) == "next"))),
+        (r"\bin (\d+) (day|week)s?\b",
+         lambda m: iso(today + timedelta(days=int(m.group(1)) * (7 if m.group(2) == "week" else 1)))),
+        (r"\b(" + _MONTH_RE + r")\.?\s+(\d{1,2})(?:st|nd|rd|th)?\b",
+         lambda m: _month_day(today, _month_number(m.group(1)), int(m.group(2)), m.group(0))),
+        (r"\b(\d{1,2})/(\d{1,2})\b(?!/)", lambda m: _month_day(today, int(m.group(1)), int(m.group(2)), m.group(0))),
+    )
+    for pattern, replace in rules:
+        text = re.sub(pattern, replace, text)
+    return text
+
+
+def _month_number(name: str) -> int:
+    return next(n for n, month in enumerate(MONTHS, 1) if month.startswith(name[:3]))
+
+
+def _month_day(today: date, month: int, day: int, original: str) -> str:
+    try:
+        return date.isoformat(_in_future(today, month, day))
+    except ValueError:
+        return original
+
+
+def normalize_query(query: str, today: Optional[date] = None) -> List[str]:
+    """Tokens of a query with places folded and dates resolved against `today`"""
+    text = query.lower()
+    for phrase, replacement in PHRASES:
+        text = text.replace(phrase, replacement)
+    text = resolve_dates(text, today or date.today())
+    return _TOKEN_RE.findall(text)
+
+
+def _vector(tokens: List[str]) -> dict:
+    """
+    L2-normalized, sublinear counts of words and word pairs, hashed. Features
+    made only of filler words weigh FILLER_WEIGHT, so phrasing matters less than content.
+    """
+    counts = {}
+    features = [(t, t in FILLER) for t in tokens]
+    features += [(f"{a} {b}", a in FILLER and b in FILLER) for a, b in zip(tokens, tokens[1:])]
+    for feature, filler in features:
+        h = zlib.crc32(feature.encode()) % DIMENSIONS
+        counts[h] = (counts.get(h, (0, filler))[0] + 1, filler)
+    weights = {h: (1 + math.log(c)) * (FILLER_WEIGHT if filler else 1.0) for h, (c, filler) in counts.items()}
+    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+    return {h: w / norm for h, w in weights.items()}
+
+
+def _cosine(a: dict, b: dict) -> float:
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(h, 0.0) for h, w in a.items())
+
+
+class CachedAnswer:
+    __slots__ = ("answer", "slots", "offer_refs", "seconds", "expires_at", "vector", "key", "text")
+
+    def __init__(self, answer, slots, offer_refs, seconds, expires_at, vector, key, text):
+        self.answer = answer
+        self.slots = slots
+        self.offer_refs = offer_refs
+        self.seconds = seconds
+        self.expires_at = expires_at
+        self.vector = vector
+        self.key = key
+        self.text = text
+
+
+class ResponseCache:
+    """
+    Args:
+        ttl_seconds: How long an answer can be reused (prices move)
+        threshold: Minimum cosine similarity of the wording for a similar match
+        max_entries: Answers kept, least recently used dropped first
+    """
+
+    def __init__(self, ttl_seconds: float = 300, threshold: float = 0.8, max_entries: int = 2048):
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # normalized text -> CachedAnswer
+        self.by_key = {}  # entity key -> set of normalized texts
+        self.lock = threading.Lock()
+        self.stats = {"lookups": 0, "exact_hits": 0, "similar_hits": 0, "stored": 0, "seconds_saved": 0.0}
+
+    @staticmethod
+    def entity_key(tokens: List[str]) -> tuple:
+        """The words, numbers and dates that must match exactly, in order"""
+        return tuple(t for t in tokens if t not in FILLER)
+
+    def _remove(self, text: str):
+        entry = self.entries.pop(text)
+        texts = self.by_key.get(entry.key)
+        if texts is not None:
+            texts.discard(text)
+            if not texts:
+                del self.by_key[entry.key]
+
+    def get(self, query: str, today: Optional[date] = None) -> Optional[CachedAnswer]:
+        tokens = normalize_query(query, today)
+        text, key = " ".join(tokens), self.entity_key(tokens)
+        now = time.monotonic()
+        with self.lock:
+            self.stats["lookups"] += 1
+            entry, kind = self.entries.get(text), "exact_hits"
+            if entry is None and key:
+                vector = _vector(tokens)
+                scored = [(_cosine(vector, self.entries[t].vector), t) for t in self.by_key.get(key, ())]
+                score, best = max(scored, default=(0.0, None))
+                if score >= self.threshold:
+                    entry, kind = self.entries[best], "similar_hits"
+            if entry is None:
+                return None
+            if entry.expires_at < now:
+                self._remove(entry.text)
+                return None
+            self.entries.move_to_end(entry.text)
+            self.stats[kind] += 1
+            self.stats["seconds_saved"] += entry.seconds
+            return entry
+
+    def put(self, query: str, answer: str, slots: dict, offer_refs: list, seconds: float, today: Optional[date] = None):
+        tokens = normalize_query(query, today)
+        text, key = " ".join(tokens), self.entity_key(tokens)
+        entry = CachedAnswer(answer, dict(slots), list(offer_refs), seconds,
+                             time.monotonic() + self.ttl_seconds, _vector(tokens), key, text)
+        with self.lock:
+            if text in self.entries:
+                self._remove(text)
+            self.entries[text] = entry
+            self.by_key.setdefault(key, set()).add(text)
+            self.stats["stored"] += 1
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def report(self) -> dict:
+        lookups = self.stats["lookups"]
+        hits = self.stats["exact_hits"] + self.stats["similar_hits"]
+        return {
+            **self.stats,
+            "seconds_saved": round(self.stats["seconds_saved"], 3),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "entries": len(self.entries),
+        }
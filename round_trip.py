@@ -0,0 +1,243 @@
+"""
+Round trips built from two one-way searches, next to the bundled round-trip fare.
+
+A round-trip search only returns fares sold as one ticket. Two one-way
+tickets are often cheaper, or let the traveler pick better times on each
+side. `round_trip_options` takes the raw offers of the outbound one-way,
+return one-way and bundled searches and returns the best K trips of all three.
+
+Pairing all outbound with all return flights is n x m candidates (62,500 for
+250 x 250). Instead:
+
+1. Each side is parsed once into flat columns (price, duration, departure,
+   arrival, see offer_times.py). Flights outside the time windows are dropped,
+   and the rest are sorted by cost (price or duration).
+2. Pairs are enumerated best first from a heap. Outbound flight p enters the
+   heap with the lower bound cost[p] + cheapest return. When that bound comes
+   up, the exact cost of its cheapest return leaving after the minimum stay is
+   looked up by bisection (suffix minima over the returns sorted by departure).
+3. Enumeration stops after K pairs. Outbound flights whose bound is never
+   reached are never paired.
+
+In practice this looks at a few dozen pairs for K = 10, however large the
+searches are.
+
+Times are local airport times. The outbound arrival and the return departure
+are at the same place, so the stay between them is exact.
+"""
+import bisect
+import heapq
+from dataclasses import dataclass
+from typing import List, Optional
+
+from models import raw_total
+from offer_times import offer_times, timestamp_minutes
+
+SORT_KEYS = ("price", "duration")
+
+# Weight of the other criterion, so ties on price go to the shorter trip and vice versa
+_TIE_BREAK = 1e-7
+
+
+def _minutes(hhmm: Optional[str]) -> Optional[int]:
+    """'HH:MM' -> minutes after midnight"""
+    if not hhmm:
+        return None
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+@dataclass(slots=True)
+class TimeWindow:
+    """Local times ("HH:MM", inclusive) a flight must leave or land between"""
+    depart_after: Optional[str] = None
+    depart_before: Optional[str] = None
+    arrive_after: Optional[str] = None
+    arrive_before: Optional[str] = None
+
+    def bounds(self) -> tuple:
+        return tuple(_minutes(v) for v in (self.depart_after, self.depart_before, self.arrive_after, self.arrive_before))
+
+
+def _inside(bounds: tuple, departure: int, arrival: int) -> bool:
+    depart_after, depart_before, arrive_after, arrive_before = bounds
+    leaves, lands = departure % 1440, arrival % 1440
+    return ((depart_after is None or leaves >= depart_after) and (depart_before is None or leaves <= depart_before)
+            and (arrive_after is None or lands >= arrive_after) and (arrive_before is None or lands <= arrive_before))
+
+
+def _cost(price: float, duration: int, sort_by: str) -> float:
+    return duration + price * _TIE_BREAK if sort_by == "duration" else price + duration * _TIE_BREAK
+
+
+def _side(offers: List[dict], window: Optional[TimeWindow], sort_by: str) -> list:
+    """(cost, price, duration, departure, arrival, index) of the offers inside `window`, cheapest first"""
+    times = offer_times(offers)
+    bounds = (window or TimeWindow()).bounds()
+    rows = [
+        (_cost(price, times.duration[i], sort_by), price, times.duration[i], times.departure[i], times.arrival[i], i)
+        for i, price in enumerate(map(raw_total, offers))
+        if _inside(bounds, times.departure[i], times.arrival[i])
+    ]
+    rows.sort()
+    return rows
+
+
+@dataclass(slots=True)
+class RoundTripOption:
+    kind: str  # "two one-ways" or "round-trip fare"
+    cost: float
+    price: float
+    duration: int
+    stay_minutes: int
+    outbound: dict  # raw offer; the bundled offer itself for a round-trip fare
+    inbound: Optional[dict] = None
+
+    @property
+    def flights(self) -> tuple:
+        """Every flight of the trip, to spot a bundled fare and a one-way pair on the same flights"""
+        itineraries = self.outbound["itineraries"] + (self.inbound["itineraries"] if self.inbound else [])
+        return tuple((s["carrierCode"], s["number"], s["departure"]["at"]) for i in itineraries for s in i["segments"])
+
+
+def best_pairs(
+    outbound: List[dict],
+    inbound: List[dict],
+    k: int = 10,
+    sort_by: str = "price",
+    min_stay_minutes: int = 0,
+    outbound_window: Optional[TimeWindow] = None,
+    return_window: Optional[TimeWindow] = None,
+    max_price: Optional[float] = None,
+) -> tuple:
+    """
+    The `k` best (outbound, return) one-way pairs whose return leaves at least
+    `min_stay_minutes` after the outbound lands.
+
+    Returns:
+        (list of RoundTripOption, number of pairs examined)
+    """
+    out, back = _side(outbound, outbound_window, sort_by), _side(inbound, return_window, sort_by)
+    found, examined = pair_rows(out, back, k, min_stay_minutes, max_price, sort_by)
+    return [RoundTripOption("two one-ways", cost, o[1] + b[1], o[2] + b[2], b[3] - o[4], outbound[o[5]], inbound[b[5]])
+            for cost, o, b in found], examined
+
+
+def pair_rows(out: list, back: list, k: int, min_stay_minutes: int = 0, max_price: Optional[float] = None,
+              sort_by: str = "price") -> tuple:
+    """
+    best_pairs on rows from `_side`, cheapest first: (cost, outbound row, return row)
+    for the best `k` pairs, and the number of pairs examined.
+    """
+    if not out or not back:
+        return [], 0
+    cheapest_back = back[0][0]
+    # latest[q]: latest departure among back[q:], so a scan stops as soon as nothing later can fit
+    latest = [0] * len(back)
+    running = -1
+    for q in range(len(back) - 1, -1, -1):
+        running = latest[q] = max(running, back[q][3])
+    # Returns by departure, with the cheapest cost from each one on: the exact cheapest return of an outbound
+    departures = sorted(b[3] for b in back)
+    cheapest_from = [b[0] for b in sorted(back, key=lambda b: b[3])] + [float("inf")]
+    for q in range(len(back) - 1, -1, -1):
+        cheapest_from[q] = min(cheapest_from[q], cheapest_from[q + 1])
+
+    def next_return(p: int, q: int) -> int:
+        """First return from position q on that leaves late enough after outbound p (len(back) if none)"""
+        nonlocal examined
+        earliest, start = out[p][4] + min_stay_minutes, q
+        if q < len(back) and latest[q] < earliest:
+            return len(back)
+        while q < len(back) and back[q][3] < earliest:
+            q += 1
+        examined += q - start + (q < len(back))
+        return q
+
+    examined = 0
+    # (cost, outbound position, return position); return -1: bound from the cheapest return, -2: exact bound
+    heap = [(out[0][0] + cheapest_back, 0, -1)]
+    pairs = []
+    while heap and len(pairs) < k:
+        cost, p, q = heapq.heappop(heap)
+        if max_price is not None and sort_by == "price" and cost > max_price + 0.01:
+            # costs only exceed prices by the duration tie-break, well under a cent
+            break
+        if q == -1:
+            if p + 1 < len(out):
+                heapq.heappush(heap, (out[p + 1][0] + cheapest_back, p + 1, -1))
+            best = cheapest_from[bisect.bisect_left(departures, out[p][4] + min_stay_minutes)]
+            if best > cheapest_back and best != float("inf"):
+                # re-queue at the exact cost of its cheapest fitting return, paired only if that comes up
+                heapq.heappush(heap, (out[p][0] + best, p, -2))
+                continue
+            q = next_return(p, 0) if best != float("inf") else len(back)
+        elif q == -2:
+            q = next_return(p, 0)
+        else:
+            o, b = out[p], back[q]
+            if max_price is None or o[1] + b[1] <= max_price:
+                pairs.append((cost, o, b))
+            q = next_return(p, q + 1)
+        if q < len(back):
+            heapq.heappush(heap, (out[p][0] + back[q][0], p, q))
+    return pairs, examined
+
+
+def bundled_options(
+    offers: List[dict],
+    sort_by: str = "price",
+    min_stay_minutes: int = 0,
+    outbound_window: Optional[TimeWindow] = None,
+    return_window: Optional[TimeWindow] = None,
+    max_price: Optional[float] = None,
+) -> list:
+    """Round-trip fares (two itineraries) that meet the same constraints as the pairs"""
+    times = offer_times(offers)
+    out_bounds, back_bounds = (outbound_window or TimeWindow()).bounds(), (return_window or TimeWindow()).bounds()
+    options = []
+    for i, offer in enumerate(offers):
+        if len(offer["itineraries"]) != 2:
+            continue
+        segments = offer["itineraries"][1]["segments"]
+        back_departure = timestamp_minutes(segments[0]["departure"]["at"])
+        back_arrival = timestamp_minutes(segments[-1]["arrival"]["at"])
+        stay = back_departure - times.arrival[i]
+        price = raw_total(offer)
+        if (stay < min_stay_minutes or (max_price is not None and price > max_price)
+                or not _inside(out_bounds, times.departure[i], times.arrival[i])
+                or not _inside(back_bounds, back_departure, back_arrival)):
+            continue
+        options.append(RoundTripOption("round-trip fare", _cost(price, times.duration[i], sort_by), price,
+                                       times.duration[i], stay, offer))
+    return options
+
+
+def round_trip_options(
+    outbound: List[dict],
+    inbound: List[dict],
+    bundled: List[dict],
+    k: int = 10,
+    sort_by: str = "price",
+    min_stay_minutes: int = 0,
+    outbound_window: Optional[TimeWindow] = None,
+    return_window: Optional[TimeWindow] = None,
+    max_price: Optional[float] = None,
+) -> tuple:
+    """
+    The `k` best trips among one-way pairs and round-trip fares, best first.
+    A one-way pair on the same flights as a round-trip fare keeps the cheaper of the two.
+
+    Returns:
+        (list of RoundTripOption, number of one-way pairs examined)
+    """
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"sort_by must be one of {', '.join(SORT_KEYS)}")
+    constraints = (sort_by, min_stay_minutes, outbound_window, return_window, max_price)
+    pairs, examined = best_pairs(outbound, inbound, k, *constraints)
+    best = {}
+    for option in pairs + bundled_options(bundled, *constraints):
+        key = option.flights
+        if key not in best or option.price < best[key].price:
+            best[key] = option
+    return sorted(best.values(), key=lambda o: o.cost)[:k], examined
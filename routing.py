@@ -0,0 +1,178 @@
+"""
+Model routing: each turn goes to the cheapest model tier that can handle it.
+
+Most turns are slot-filling ("tomorrow", "2 adults", "yes") or a plain search
+("flights JFK to LAX on Friday"). Only a few need real reasoning: comparing
+options, multi-city plans, long messages with several constraints. A turn is
+classified with local heuristics (a few regexes and word counts, well under
+a millisecond, no model call):
+
+    fast       short follow-ups in an ongoing conversation, greetings
+    standard   everything else
+    reasoning  comparisons, multi-city and long multi-part requests
+
+The model of each tier comes from MODEL_FAST / MODEL_STANDARD / MODEL_REASONING
+(see agent.py); without MODEL_REASONING, reasoning turns run on the standard
+model. Turns are escalated, never demoted: when in doubt a turn is "standard".
+ModelRouter keeps per-tier latency, token and cost figures for /metrics.
+"""
+import re
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from airports import METRO_AIRPORTS
+from reference_data import reference
+
+FAST = "fast"
+STANDARD = "standard"
+REASONING = "reasoning"
+TIERS = (FAST, STANDARD, REASONING)
+
+# Follow-ups of at most this many words may go to the fast tier
+FAST_MAX_WORDS = 8
+# Messages longer than this usually carry several constraints at once
+REASONING_MIN_WORDS = 40
+
+# A first message made only of these words is small talk
+SMALL_TALK = frozenset("""
+yes yeah yep yup sure ok okay correct right confirm confirmed fine great perfect thanks thank you no nope
+hi hello hey there good morning afternoon evening
+""".split())
+
+# Only requests the standard model tends to get wrong: explicit comparisons and
+# trips of several legs. Price questions ("is that worth it?", "should I wait?")
+# and flexible dates are tool calls the standard model handles fine.
+_REASONING_RE = re.compile(
+    r"\b(?:compare|comparison|versus|vs|trade-?offs?|pros and cons|multi-?city|open[- ]jaw|"
+    r"then (?:fly|on to)|stopover in)\b"
+)
+_AIRPORT_RE = re.compile(r"\b[A-Z]{3}\b")
+_WORD_RE = re.compile(r"[\w'-]+")
+
+
+_KNOWN_AIRPORTS = frozenset(METRO_AIRPORTS) | frozenset(code for codes in METRO_AIRPORTS.values() for code in codes)
+
+
+def _airport_count(query: str) -> int:
+    """Distinct known IATA codes in `query` (so "NYC" counts, "USA" or "ASAP" do not)"""
+    return sum(code in _KNOWN_AIRPORTS or code in reference.locations for code in set(_AIRPORT_RE.findall(query)))
+
+
+def classify_turn(query: str, follow_up: bool) -> tuple:
+    """
+    (tier, reason) for one user message. `follow_up` is True when the session
+    already has earlier turns, so a short answer is filling in a slot.
+    """
+    lowered = query.lower()
+    words = _WORD_RE.findall(lowered)
+    if _REASONING_RE.search(lowered):
+        return REASONING, "reasoning words"
+    if _airport_count(query) >= 3:
+        return REASONING, "three or more airports"
+    if query.count("?") >= 2:
+        return REASONING, "several questions"
+    if len(words) > REASONING_MIN_WORDS:
+        return REASONING, "long message"
+    if follow_up and len(words) <= FAST_MAX_WORDS:
+        return FAST, "short follow-up"
+    if words and all(word in SMALL_TALK for word in words):
+        return FAST, "small talk"
+    return STANDARD, "default"
+
+
+class UsageCounter(BaseCallbackHandler):
+    """Counts the model calls and tokens of one turn (from the messages' usage_metadata)"""
+    run_inline = True
+
+    def __init__(self):
+        self.calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def on_llm_end(self, response, **kwargs):
+        self.calls += 1
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                self.input_tokens += usage.get("input_tokens", 0)
+                self.output_tokens += usage.get("output_tokens", 0)
+
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))] if ordered else 0.0
+
+
+class ModelRouter:
+    """
+    Args:
+        executors: Agent executor per tier; a missing tier falls back to `default`
+        prices: Per tier, (USD per million input tokens, USD per million output tokens)
+        enabled: False sends every turn to `default` (for comparison)
+        default: Tier used when routing is off or a tier has no executor
+    """
+
+    def __init__(self, executors: dict, prices: Optional[dict] = None, enabled: bool = True, default: str = STANDARD):
+        self.executors = executors
+        self.prices = prices or {}
+        self.enabled = enabled
+        self.default = default
+        self.lock = threading.Lock()
+        self.classify_seconds = 0.0
+        self.classified = 0
+        self.reasons = {}
+        self.tiers = {
+            tier: {"turns": 0, "llm_calls": 0, "llm_seconds": 0.0, "input_tokens": 0, "output_tokens": 0,
+                   "cost_usd": 0.0, "latencies": deque(maxlen=1000)}
+            for tier in TIERS
+        }
+
+    def route(self, query: str, follow_up: bool) -> str:
+        started = time.perf_counter()
+        tier, reason = classify_turn(query, follow_up) if self.enabled else (self.default, "routing off")
+        if tier not in self.executors:
+            tier, reason = self.default, f"{reason}, no {tier} model"
+        with self.lock:
+            self.classify_seconds += time.perf_counter() - started
+            self.classified += 1
+            self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        return tier
+
+    def executor(self, tier: str):
+        return self.executors.get(tier) or self.executors[self.default]
+
+    def record(self, tier: str, seconds: float, llm_seconds: float, usage: UsageCounter):
+        input_price, output_price = self.prices.get(tier, (0.0, 0.0))
+        cost = (usage.input_tokens * input_price + usage.output_tokens * output_price) / 1e6
+        with self.lock:
+            stats = self.tiers[tier]
+            stats["turns"] += 1
+            stats["llm_calls"] += usage.calls
+            stats["llm_seconds"] += llm_seconds
+            stats["input_tokens"] += usage.input_tokens
+            stats["output_tokens"] += usage.output_tokens
+            stats["cost_usd"] += cost
+            stats["latencies"].append(seconds)
+
+    def report(self) -> dict:
+        with self.lock:
+            tiers = {}
+            for tier, stats in self.tiers.items():
+                latencies = list(stats["latencies"])
+                tiers[tier] = {
+                    **{k: v for k, v in stats.items() if k != "latencies"},
+                    "llm_seconds": round(stats["llm_seconds"], 3),
+                    "cost_usd": round(stats["cost_usd"], 6),
+                    "p50_seconds": round(_percentile(latencies, 50), 4),
+                    "p95_seconds": round(_percentile(latencies, 95), 4),
+                }
+            return {
+                "enabled": self.enabled,
+                "tiers": tiers,
+                "reasons": dict(self.reasons),
+                "avg_classify_us": round(self.classify_seconds / self.classified * 1e6, 2) if self.classified else 0.0,
+            }
@@ -0,0 +1,98 @@
+"""
+Short-lived cache of flight search results (the raw Amadeus offers), keyed by
+the normalized Amadeus query. Shared by the agent tools, the price watcher and
+the prefetcher.
+
+Entries are stored encoded (see serializer.py): a few times smaller than the
+nested dicts, and every reader gets its own copy, so one session can never
+mutate another session's results.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import refine
+from serializer import dumps_bytes, loads
+
+
+def normalize_params(search_params: dict) -> tuple:
+    """Order-independent cache key for a flight offers search query"""
+    return tuple(sorted((k, str(v).upper()) for k, v in search_params.items() if v is not None))
+
+
+class SearchCache:
+    """
+    LRU cache with a TTL. Entries remember who stored them ("search" or
+    "prefetch") so prefetch hit rates can be reported. Entries are also indexed
+    by trip (refine.identity) to answer narrower searches, see `refine`.
+    """
+
+    def __init__(self, ttl_seconds: float = 600, max_entries: int = 512):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.by_trip = {}  # refine.identity -> set of entry keys
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "prefetch_hits": 0, "refined": 0}
+
+    def _remove(self, key: tuple):
+        del self.entries[key]
+        trip = refine.identity(dict(key))
+        keys = self.by_trip.get(trip)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.by_trip[trip]
+
+    def get(self, search_params: dict) -> Optional[list]:
+        key = normalize_params(search_params)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    self._remove(key)
+                self.stats["misses"] += 1
+                return None
+            expires_at, encoded, source = entry
+            self.entries.move_to_end(key)
+            self.stats["hits"] += 1
+            if source == "prefetch":
+                self.stats["prefetch_hits"] += 1
+                # Count each prefetched entry once
+                self.entries[key] = (expires_at, encoded, "search")
+        return loads(encoded)
+
+    def put(self, search_params: dict, offers: list, source: str = "search"):
+        key = normalize_params(search_params)
+        encoded = dumps_bytes(offers)
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl_seconds, encoded, source)
+            self.entries.move_to_end(key)
+            self.by_trip.setdefault(refine.identity(dict(key)), set()).add(key)
+            while len(self.entries) > self.max_entries:
+                self._remove(next(iter(self.entries)))
+
+    def refine(self, search_params: dict, min_results: Optional[int] = None) -> Optional[list]:
+        """
+        Offers for `search_params` filtered out of a cached wider search of the
+        same trip (e.g. nonstop only, lower max price), or None.
+        """
+        narrow = dict(normalize_params(search_params))
+        now = time.monotonic()
+        with self.lock:
+            candidates = [
+                (key, self.entries[key][1]) for key in self.by_trip.get(refine.identity(narrow), ())
+                if self.entries[key][0] >= now and refine.covers(dict(key), narrow)
+            ]
+        for key, encoded in candidates:
+            offers = refine.refine(dict(key), loads(encoded), narrow, min_results)
+            if offers is not None:
+                with self.lock:
+                    self.stats["refined"] += 1
+                return offers
+        return None
+
+    def __contains__(self, search_params: dict) -> bool:
+        entry = self.entries.get(normalize_params(search_params))
+        return entry is not None and entry[0] >= time.monotonic()
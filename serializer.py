@@ -0,0 +1,75 @@
+"""
+Fast JSON encoding for tool results, the search cache and HTTP responses.
+
+Uses orjson when installed, then msgspec, then the standard library. Set
+SERIALIZER=orjson|msgspec|json to force a backend.
+"""
+import dataclasses
+import json
+import os
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional
+    msgspec = None
+
+
+def _default(obj):
+    """Encode types the backends don't know: pydantic models, slotted/plain objects, sets"""
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if dataclasses.is_dataclass(obj):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, "__slots__"):
+        return {name: getattr(obj, name) for name in obj.__slots__ if hasattr(obj, name)}
+    return str(obj)
+
+
+def _pick_backend() -> str:
+    wanted = os.getenv("SERIALIZER", "").lower()
+    if wanted in ("orjson", "msgspec", "json"):
+        if wanted == "orjson" and orjson is None or wanted == "msgspec" and msgspec is None:
+            print(f"SERIALIZER={wanted} is not installed, falling back")
+        else:
+            return wanted
+    if orjson is not None:
+        return "orjson"
+    if msgspec is not None:
+        return "msgspec"
+    return "json"
+
+
+backend = _pick_backend()
+
+if backend == "orjson":
+    def dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+    loads = orjson.loads
+
+elif backend == "msgspec":
+    _encoder = msgspec.json.Encoder(enc_hook=_default)
+    _decoder = msgspec.json.Decoder()
+
+    def dumps_bytes(obj) -> bytes:
+        return _encoder.encode(obj)
+
+    loads = _decoder.decode
+
+else:
+    def dumps_bytes(obj) -> bytes:
+        return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+    loads = json.loads
+
+
+def dumps(obj) -> str:
+    """Compact JSON string (what tools hand back to the model)"""
+    return dumps_bytes(obj).decode()
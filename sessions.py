@@ -0,0 +1,251 @@
+"""
+Conversation state per session, checkpointed to a pluggable store.
+
+On serverless deployments a request can land on a fresh instance, so the
+state of a conversation is saved after every turn and reloaded on demand.
+That state is the chat history, the last collected search parameters
+("slots") and the offer_refs shown to the user. Sessions that go idle are
+dropped from memory and come back from the store on their next request.
+
+Checkpoints are compact: short message tuples, encoded with the fast
+serializer and zlib-compressed behind a small version header.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from serializer import dumps_bytes, loads
+
+FORMAT = b"S1"
+
+# Offer refs remembered per session
+MAX_OFFER_REFS = 50
+
+# Tools whose results carry offer_refs, and the one that collects the search slots
+SEARCH_TOOLS = ("search_flights", "search_flights_multi_airport", "search_multi_city_flights", "search_round_trip_flights")
+SLOTS_TOOL = "collect_flight_info"
+
+
+@dataclass
+class Session:
+    session_id: str
+    messages: List[list] = field(default_factory=list)  # [role, text], role "h" (user) or "a" (assistant)
+    slots: dict = field(default_factory=dict)
+    offer_refs: List[str] = field(default_factory=list)
+    updated_at: float = 0.0
+    last_used: float = field(default_factory=time.monotonic)
+
+    def history(self) -> list:
+        """Chat history for the prompt, with the saved slots and offers first"""
+        history = []
+        if self.slots or self.offer_refs:
+            history.append(SystemMessage(
+                f"Earlier in this conversation: flight search parameters {self.slots or 'none'}; "
+                f"offers shown (offer_ref): {', '.join(self.offer_refs) or 'none'}"
+            ))
+        for role, text in self.messages:
+            history.append(HumanMessage(text) if role == "h" else AIMessage(text))
+        return history
+
+    def record_turn(self, query: str, output: str, steps: list = ()):
+        """Add a turn, and pick the slots and offer refs out of its tool calls (AgentExecutor intermediate_steps)"""
+        self.messages.append(["h", query])
+        self.messages.append(["a", output])
+        for action, observation in steps:
+            if action.tool == SLOTS_TOOL and isinstance(action.tool_input, dict):
+                self.slots.update({k: v for k, v in action.tool_input.items() if v is not None})
+            elif action.tool in SEARCH_TOOLS and isinstance(observation, str) and observation.startswith("["):
+                try:
+                    # a trip of two one-way tickets has one ref per ticket
+                    refs = [ref for offer in loads(observation)
+                            for ref in ([offer["offer_ref"]] if "offer_ref" in offer else offer.get("offer_refs", ()))]
+                except ValueError:
+                    continue
+                self.offer_refs = (self.offer_refs + [r for r in refs if r not in self.offer_refs])[-MAX_OFFER_REFS:]
+        self.updated_at = time.time()
+
+
+def encode_session(session: Session) -> bytes:
+    state = {"m": session.messages, "s": session.slots, "o": session.offer_refs, "u": session.updated_at}
+    return FORMAT + zlib.compress(dumps_bytes(state), 6)
+
+
+def decode_session(session_id: str, data: bytes) -> Session:
+    if data[:2] != FORMAT:
+        raise ValueError(f"Unknown session checkpoint format {data[:2]!r}")
+    state = loads(zlib.decompress(data[2:]))
+    return Session(session_id, state["m"], state["s"], state["o"], state["u"])
+
+
+class SessionStore(ABC):
+    """Base store. Subclass and implement load/save/delete for another backend (Redis, a blob store, ...)"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def save(self, session_id: str, data: bytes):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id: str):
+        ...
+
+
+class MemorySessionStore(SessionStore):
+    """Checkpoints kept in this process only (the default, and for local testing)"""
+
+    def __init__(self):
+        self.data = {}
+
+    def load(self, session_id):
+        return self.data.get(session_id)
+
+    def save(self, session_id, data):
+        self.data[session_id] = data
+
+    def delete(self, session_id):
+        self.data.pop(session_id, None)
+
+
+class FileSessionStore(SessionStore):
+    """One file per session in `directory`, written atomically"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, hashlib.sha1(session_id.encode()).hexdigest() + ".session")
+
+    def load(self, session_id):
+        try:
+            with open(self._path(session_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def save(self, session_id, data):
+        path = self._path(session_id)
+        with open(f"{path}.{threading.get_ident()}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.{threading.get_ident()}.tmp", path)
+
+    def delete(self, session_id):
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+
+class SQLiteSessionStore(SessionStore):
+    """All sessions in one SQLite file"""
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, data BLOB NOT NULL, updated REAL NOT NULL)")
+        self.lock = threading.Lock()
+
+    def load(self, session_id):
+        with self.lock:
+            row = self.connection.execute("SELECT data FROM sessions WHERE id = ?", (session_id,)).fetchone()
+        return row[0] if row else None
+
+    def save(self, session_id, data):
+        with self.lock:
+            self.connection.execute("INSERT OR REPLACE INTO sessions (id, data, updated) VALUES (?, ?, ?)",
+                                    (session_id, data, time.time()))
+
+    def delete(self, session_id):
+        with self.lock:
+            self.connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+
+def store_from_env() -> SessionStore:
+    """SESSION_DB=path/to/sessions.db (SQLite) or SESSION_DIR=path (files), in-process otherwise"""
+    if os.getenv("SESSION_DB"):
+        return SQLiteSessionStore(os.getenv("SESSION_DB"))
+    if os.getenv("SESSION_DIR"):
+        return FileSessionStore(os.getenv("SESSION_DIR"))
+    return MemorySessionStore()
+
+
+class SessionManager:
+    """
+    Live sessions in memory, backed by a store.
+
+    Args:
+        store: Where checkpoints are written after every turn
+        idle_seconds: Sessions unused for this long are dropped from memory (they stay in the store)
+        max_sessions: At most this many sessions in memory, least recently used dropped first
+    """
+
+    def __init__(self, store: SessionStore, idle_seconds: float = 600, max_sessions: int = 1000):
+        self.store = store
+        self.idle_seconds = idle_seconds
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+        self.lock = threading.Lock()
+        self.stats = {"created": 0, "restored": 0, "spilled": 0, "checkpoints": 0,
+                      "checkpoint_bytes": 0, "restore_seconds": 0.0}
+
+    def get(self, session_id: str) -> Session:
+        with self.lock:
+            self._spill_idle()
+            session = self.sessions.get(session_id)
+            if session is not None:
+                self.sessions.move_to_end(session_id)
+                session.last_used = time.monotonic()
+                return session
+
+        started = time.perf_counter()
+        data = self.store.load(session_id)
+        if data is not None:
+            session = decode_session(session_id, data)
+            self.stats["restored"] += 1
+            self.stats["restore_seconds"] += time.perf_counter() - started
+        else:
+            session = Session(session_id)
+            self.stats["created"] += 1
+
+        with self.lock:
+            # Another request for the same session may have loaded it meanwhile
+            session = self.sessions.setdefault(session_id, session)
+            self.sessions.move_to_end(session_id)
+        return session
+
+    def checkpoint(self, session: Session):
+        data = encode_session(session)
+        self.store.save(session.session_id, data)
+        self.stats["checkpoints"] += 1
+        self.stats["checkpoint_bytes"] += len(data)
+
+    def _spill_idle(self):
+        """Drop idle and excess sessions from memory (caller holds the lock; all of them are checkpointed)"""
+        cutoff = time.monotonic() - self.idle_seconds
+        while self.sessions:
+            session_id, session = next(iter(self.sessions.items()))
+            if session.last_used >= cutoff and len(self.sessions) <= self.max_sessions:
+                break
+            del self.sessions[session_id]
+            self.stats["spilled"] += 1
+
+    def report(self) -> dict:
+        restored, checkpoints = self.stats["restored"], self.stats["checkpoints"]
+        return {
+            **{k: v for k, v in self.stats.items() if k not in ("restore_seconds", "checkpoint_bytes")},
+            "in_memory": len(self.sessions),
+            "avg_restore_ms": round(self.stats["restore_seconds"] / restored * 1000, 3) if restored else 0.0,
+            "avg_checkpoint_bytes": round(self.stats["checkpoint_bytes"] / checkpoints) if checkpoints else 0,
+        }
@@ -0,0 +1,155 @@
+"""
+Single-flight coalescing of identical upstream searches.
+
+When many sessions search the same route and date at the same moment (a
+promotion, a popular holiday), only the first caller ("leader") goes to
+Amadeus. The others wait for the leader's future and get the same result.
+
+With `shared_dir`, workers on the same machine coordinate as well: the leader
+of each worker takes a file lock per search. The first one through the lock
+makes the call and writes the result next to the lock, with the names of
+the carriers and airports it uses (see reference_data.py). The others find
+a fresh result there and skip their call. Waiting for the lock stops at the
+caller's deadline, and results older than `result_ttl` are swept away with
+their locks.
+
+`fn` runs in the leader's context only: the quota token of the upstream call
+is taken there, at the leader's priority, and followers never queue for one.
+A follower waits at most until its own deadline, and when the leader fails
+with one of `retry_on` (it was shed, or its own deadline ran out) the
+follower tries again, leading the call itself if nobody else does.
+"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Callable, Optional
+
+from deadline import DeadlineExceeded, remaining
+from reference_data import reference
+from serializer import dumps_bytes, loads
+
+try:
+    import fcntl
+except ImportError:  # not available on Windows, coalescing stays in-process there
+    fcntl = None
+
+# How often a worker retries the file lock held by another worker's call
+LOCK_POLL_SECONDS = 0.05
+
+
+class SingleFlight:
+    """
+    Args:
+        shared_dir: Directory for the cross-worker locks and results (in-process only when None)
+        result_ttl: Seconds a result written by another worker can be reused
+    """
+
+    def __init__(self, shared_dir: Optional[str] = None, result_ttl: float = 30):
+        self.shared_dir = shared_dir if fcntl is not None else None
+        self.result_ttl = result_ttl
+        if self.shared_dir:
+            os.makedirs(self.shared_dir, exist_ok=True)
+        self.swept_at = 0.0
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0, "retried": 0, "shared_across_workers": 0}
+
+    def do(self, key, fn: Callable[[], list], retry_on: tuple = ()) -> list:
+        """Run `fn` once for all concurrent callers with the same `key`"""
+        while True:
+            with self.lock:
+                future = self.inflight.get(key)
+                leader = future is None
+                if leader:
+                    future = self.inflight[key] = Future()
+                else:
+                    self.stats["coalesced"] += 1
+            if leader:
+                break
+            try:
+                return future.result(timeout=remaining())
+            except FutureTimeout:
+                raise DeadlineExceeded("no time left waiting for a coalesced search")
+            except retry_on:
+                # the leader's own limits, not ours: try again under our context
+                with self.lock:
+                    self.stats["retried"] += 1
+
+        try:
+            result = self._run(key, fn)
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.lock:
+                del self.inflight[key]
+
+    def _run(self, key, fn: Callable[[], list]) -> list:
+        if not self.shared_dir:
+            self.stats["calls"] += 1
+            return fn()
+
+        self._sweep()
+        name = hashlib.sha1(repr(key).encode()).hexdigest()
+        path = os.path.join(self.shared_dir, name)
+        with open(path + ".lock", "a") as lock_file:
+            self._lock_file(lock_file)
+            try:
+                try:
+                    if time.time() - os.path.getmtime(path) < self.result_ttl:
+                        with open(path, "rb") as f:
+                            shared = loads(f.read())
+                        # names of the codes in the result, which that worker's call brought in
+                        reference.update(shared["dictionaries"])
+                        self.stats["shared_across_workers"] += 1
+                        return shared["result"]
+                except (OSError, ValueError, KeyError, TypeError):
+                    pass
+
+                self.stats["calls"] += 1
+                result = fn()
+                shared = {"result": result, "dictionaries": reference.dictionaries_for(result)}
+                with open(path + ".tmp", "wb") as f:
+                    f.write(dumps_bytes(shared))
+                os.replace(path + ".tmp", path)
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _lock_file(self, lock_file):
+        """Wait for the file lock of another worker's call, at most until the caller's deadline"""
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return
+            except BlockingIOError:
+                left = remaining()
+                if left is not None and left <= 0:
+                    raise DeadlineExceeded("no time left waiting for another worker's search")
+                time.sleep(LOCK_POLL_SECONDS if left is None else min(LOCK_POLL_SECONDS, left))
+
+    def _sweep(self):
+        """Delete results (and their locks) older than `result_ttl`, at most once per `result_ttl`"""
+        now = time.time()
+        with self.lock:
+            if now - self.swept_at < self.result_ttl:
+                return
+            self.swept_at = now
+        for entry in os.scandir(self.shared_dir):
+            try:
+                if now - entry.stat().st_mtime < self.result_ttl:
+                    continue
+                if entry.name.endswith(".lock"):
+                    with open(entry.path, "a") as lock_file:
+                        # in use by another worker right now: leave it
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                        os.remove(entry.path)
+                else:
+                    os.remove(entry.path)
+            except OSError:
+                # removed by another worker's sweep, or locked
+                pass
@@ -0,0 +1,93 @@
+import pytest
+
+from deadline import Deadline, DeadlineExceeded, current_deadline
+from quota import BACKGROUND, INTERACTIVE, QuotaExceeded, QuotaScheduler
+
+
+def scheduler(**kwargs) -> QuotaScheduler:
+    """A scheduler with an empty global bucket that never refills by itself"""
+    options = {"rate": 1e-6, "capacity": 1, "session_rate": 1e-6, "session_capacity": 100, **kwargs}
+    quota = QuotaScheduler("test", **options)
+    quota.bucket.tokens = 0
+    return quota
+
+
+def grant_order(quota: QuotaScheduler, tickets: list) -> list:
+    """Release global tokens one at a time and return the session of each granted ticket"""
+    order = []
+    for _ in tickets:
+        quota.bucket.tokens = 1
+        with quota.lock:
+            quota._dispatch()
+        granted = [t for t in tickets if t.granted and t not in order]
+        order.extend(granted)
+    return [t.session_id for t in order]
+
+
+def test_sessions_take_turns():
+    quota = scheduler()
+    tickets = [quota._enqueue("busy", INTERACTIVE) for _ in range(4)] + [quota._enqueue("quiet", INTERACTIVE)]
+    assert grant_order(quota, tickets) == ["busy", "quiet", "busy", "busy", "busy"]
+
+
+def test_weights_share_in_proportion():
+    quota = scheduler(weights={"gold": 2})
+    tickets = [quota._enqueue("gold", INTERACTIVE) for _ in range(4)] + [quota._enqueue("plain", INTERACTIVE) for _ in range(2)]
+    assert grant_order(quota, tickets) == ["gold", "gold", "plain", "gold", "gold", "plain"]
+
+
+def test_interactive_before_background():
+    quota = scheduler()
+    tickets = [quota._enqueue("watcher", BACKGROUND), quota._enqueue("user", INTERACTIVE)]
+    assert grant_order(quota, tickets) == ["user", "watcher"]
+    assert quota.stats["granted_background"] == 1
+
+
+def test_a_session_over_its_own_limit_leaves_the_token_to_others():
+    quota = scheduler(session_capacity=1)
+    tickets = [quota._enqueue("busy", INTERACTIVE) for _ in range(2)] + [quota._enqueue("quiet", INTERACTIVE)]
+    assert grant_order(quota, tickets) == ["busy", "quiet"]
+    # No session can use the last token, so it stays in the global bucket
+    assert quota.bucket.tokens == 1 and len(quota.waiting) == 1
+
+
+def test_sheds_when_too_many_wait():
+    quota = scheduler(max_waiting=2)
+    quota._enqueue("a", INTERACTIVE)
+    quota._enqueue("b", INTERACTIVE)
+    with pytest.raises(QuotaExceeded) as error:
+        quota._enqueue("c", INTERACTIVE)
+    assert error.value.reason == "too many waiting calls"
+    with pytest.raises(QuotaExceeded):
+        quota.check_admission()
+    assert quota.stats["shed"] == 2 and len(quota.waiting) == 2
+
+
+def test_sheds_after_max_wait_seconds():
+    quota = scheduler(max_wait_seconds=0.05)
+    with pytest.raises(QuotaExceeded) as error:
+        quota.acquire("a", INTERACTIVE)
+    assert error.value.reason == "waited too long"
+    assert quota.stats["timed_out"] == 1 and not quota.waiting
+
+
+def test_expired_deadline_gives_up_the_place():
+    quota = scheduler()
+    deadline = Deadline(0.05)
+    token = current_deadline.set(deadline)
+    try:
+        with pytest.raises(DeadlineExceeded):
+            quota.acquire("a", INTERACTIVE)
+        assert not quota.waiting
+        with pytest.raises(DeadlineExceeded):
+            quota.acquire("a", INTERACTIVE)
+    finally:
+        current_deadline.reset(token)
+    assert quota.stats["deadline_expired"] == 2 and quota.stats["queued"] == 1
+
+
+def test_grants_immediately_with_tokens():
+    quota = QuotaScheduler("test", rate=10, capacity=2, session_rate=10, session_capacity=2)
+    quota.acquire("a", INTERACTIVE)
+    quota.acquire("a", INTERACTIVE)
+    assert quota.stats["granted"] == 2 and quota.report()["queue_depth"] == 0
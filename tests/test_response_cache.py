@@ -0,0 +1,71 @@
+from datetime import date
+
+import response_cache
+from response_cache import ResponseCache
+
+TODAY = date(2026, 10, 19)  # a Monday
+
+
+def cache_with(query: str, **kwargs) -> ResponseCache:
+    cache = ResponseCache(**kwargs)
+    cache.put(query, "answer", {"origin": "NYC"}, ["ref1"], seconds=4.0, today=TODAY)
+    return cache
+
+
+def test_exact_hit_after_normalizing():
+    cache = cache_with("Cheap flights New York to Los Angeles tomorrow")
+    entry = cache.get("cheap flights NYC to LA 2026-10-20", today=TODAY)
+    assert entry is not None and entry.answer == "answer"
+    assert entry.slots == {"origin": "NYC"} and entry.offer_refs == ["ref1"]
+    assert cache.stats["exact_hits"] == 1
+
+
+def test_similar_phrasing_hits():
+    cache = cache_with("find me cheap flights from nyc to la next friday")
+    assert cache.get("cheap flights from nyc to la next friday please", today=TODAY) is not None
+    assert cache.stats["similar_hits"] == 1
+    assert cache.report()["seconds_saved"] == 4.0
+
+
+def test_different_route_date_or_count_never_match():
+    cache = cache_with("cheap flights nyc to la on friday for 2 adults")
+    assert cache.get("cheap flights la to nyc on friday for 2 adults", today=TODAY) is None
+    assert cache.get("cheap flights nyc to la on saturday for 2 adults", today=TODAY) is None
+    assert cache.get("cheap flights nyc to la on friday for 3 adults", today=TODAY) is None
+    assert cache.get("cheap flights nyc to boston on friday for 2 adults", today=TODAY) is None
+
+
+def test_threshold_rejects_loose_rewordings():
+    query = "flights nyc to la friday"
+    loose = "hey can you please look for some good cheap deals on flights for a trip nyc to la friday thanks"
+    assert cache_with(query, threshold=0.99).get(loose, today=TODAY) is None
+    assert cache_with(query, threshold=0.1).get(loose, today=TODAY) is not None
+
+
+def test_relative_dates_resolve_against_today():
+    cache = cache_with("flights nyc to la tomorrow")
+    assert cache.get("flights nyc to la tomorrow", today=date(2026, 10, 20)) is None
+    assert cache.get("flights nyc to la on 10/20", today=TODAY) is not None
+
+
+def test_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(response_cache.time, "monotonic", lambda: now[0])
+    cache = cache_with("flights nyc to la friday", ttl_seconds=300)
+
+    now[0] += 299
+    assert cache.get("flights nyc to la friday", today=TODAY) is not None
+    assert cache.get("cheap flights from nyc to la friday", today=TODAY) is not None
+
+    now[0] += 2
+    assert cache.get("cheap flights from nyc to la friday", today=TODAY) is None
+    assert cache.get("flights nyc to la friday", today=TODAY) is None
+    assert cache.report()["entries"] == 0
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    for city in ("boston", "miami", "denver"):
+        cache.put(f"flights nyc to {city}", city, {}, [], seconds=1.0, today=TODAY)
+    assert cache.get("flights nyc to boston", today=TODAY) is None
+    assert cache.get("flights nyc to denver", today=TODAY).answer == "denver"
@@ -0,0 +1,68 @@
+from benchmarks.payloads import flight_offer
+from search_cache import SearchCache
+
+TRIP = {"originLocationCode": "JFK", "destinationLocationCode": "LAX", "departureDate": "2026-12-01",
+        "adults": 1, "currencyCode": "USD"}
+
+
+def offers():
+    # Even offers are nonstop, odd ones connect; carriers rotate through payloads.CARRIERS
+    return [flight_offer(i, segments=1 + i % 2) for i in range(20)]
+
+
+def cache_with(params: dict, cached: list) -> SearchCache:
+    cache = SearchCache()
+    cache.put(params, cached)
+    return cache
+
+
+def test_refine_nonstop_filters_the_wider_search():
+    cache = cache_with(TRIP, offers())
+    refined = cache.refine({**TRIP, "nonStop": "true"})
+    assert [o["id"] for o in refined] == [o["id"] for o in offers() if len(o["itineraries"][0]["segments"]) == 1]
+    assert cache.stats["refined"] == 1
+
+
+def test_refine_lower_max_price_and_excluded_airline():
+    cache = cache_with({**TRIP, "maxPrice": 400}, offers())
+    refined = cache.refine({**TRIP, "maxPrice": 250, "excludedAirlineCodes": "DL,AA"})
+    assert refined
+    for offer in refined:
+        assert float(offer["price"]["total"]) <= 250
+        assert offer["itineraries"][0]["segments"][0]["carrierCode"] not in ("DL", "AA")
+
+
+def test_refine_keeps_the_narrow_max():
+    cache = cache_with(TRIP, offers())
+    assert len(cache.refine({**TRIP, "max": 3})) == 3
+
+
+def test_refine_never_widens():
+    cache = cache_with({**TRIP, "nonStop": "true", "maxPrice": 250}, offers())
+    assert cache.refine(TRIP) is None
+    assert cache.refine({**TRIP, "nonStop": "true", "maxPrice": 300}) is None
+    assert cache.refine({**TRIP, "nonStop": "true", "maxPrice": 250, "includedAirlineCodes": "DL"}) is not None
+
+    cache = cache_with({**TRIP, "includedAirlineCodes": "DL,AA"}, offers())
+    assert cache.refine({**TRIP, "includedAirlineCodes": "DL,UA"}) is None
+
+
+def test_refine_needs_the_same_trip():
+    cache = cache_with(TRIP, offers())
+    assert cache.refine({**TRIP, "departureDate": "2026-12-02", "nonStop": "true"}) is None
+    assert cache.refine({**TRIP, "adults": 2, "nonStop": "true"}) is None
+
+
+def test_refine_of_a_cut_off_result_needs_min_results():
+    # Amadeus stopped at max=20, so offers past the cut may be missing
+    cache = cache_with({**TRIP, "max": 20}, offers())
+    narrow = {**TRIP, "nonStop": "true"}
+    assert cache.refine(narrow) is None
+    assert len(cache.refine(narrow, min_results=5)) == 10
+    assert cache.refine(narrow, min_results=11) is None
+
+
+def test_refine_ignores_expired_entries():
+    cache = SearchCache(ttl_seconds=-1)
+    cache.put(TRIP, offers())
+    assert cache.refine({**TRIP, "nonStop": "true"}) is None
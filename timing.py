@@ -0,0 +1,102 @@
+"""
+Per-turn timing of agent runs.
+
+A turn is split into steps at every LLM call; the tool calls made between two
+LLM calls belong to the same step. For each step we compare the wall time of
+its tools with the sum of their individual durations, which is what a
+sequential executor would have taken.
+"""
+import time
+from collections import deque
+from typing import Any, Dict
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+class TurnTimer(BaseCallbackHandler):
+    run_inline = True  # record timestamps where the events happen, not on a worker thread
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.llm_started: Dict[Any, float] = {}
+        self.llm_seconds = 0.0
+        self.steps = []
+        self.tools: Dict[Any, dict] = {}
+
+    def _llm_start(self, run_id):
+        self.llm_started[run_id] = time.perf_counter()
+        self.steps.append([])
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._llm_start(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._llm_start(run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        started = self.llm_started.pop(run_id, None)
+        if started is not None:
+            self.llm_seconds += time.perf_counter() - started
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self.on_llm_end(None, run_id=run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        if not self.steps:
+            self.steps.append([])
+        call = {"name": (serialized or {}).get("name", "tool"), "start": time.perf_counter(), "end": None}
+        self.tools[run_id] = call
+        self.steps[-1].append(call)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        call = self.tools.get(run_id)
+        if call is not None:
+            call["end"] = time.perf_counter()
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self.on_tool_end(None, run_id=run_id)
+
+    def summary(self) -> dict:
+        steps = []
+        for calls in self.steps:
+            done = [c for c in calls if c["end"] is not None]
+            if not done:
+                continue
+            wall = max(c["end"] for c in done) - min(c["start"] for c in done)
+            serial = sum(c["end"] - c["start"] for c in done)
+            steps.append({
+                "tools": [c["name"] for c in done],
+                "wall_seconds": round(wall, 4),
+                "sequential_seconds": round(serial, 4),
+                "saved_seconds": round(serial - wall, 4),
+            })
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "llm_seconds": round(self.llm_seconds, 4),
+            "tool_steps": steps,
+            "saved_seconds": round(sum(s["saved_seconds"] for s in steps), 4),
+        }
+
+
+class TurnStats:
+    """Keeps the last few turn summaries and running totals for /metrics"""
+
+    def __init__(self, keep: int = 50):
+        self.recent = deque(maxlen=keep)
+        self.turns = 0
+        self.total_seconds = 0.0
+        self.saved_seconds = 0.0
+
+    def add(self, summary: dict):
+        self.recent.append(summary)
+        self.turns += 1
+        self.total_seconds += summary["total_seconds"]
+        self.saved_seconds += summary["saved_seconds"]
+
+    def report(self) -> dict:
+        return {
+            "turns": self.turns,
+            "avg_turn_seconds": round(self.total_seconds / self.turns, 4) if self.turns else 0.0,
+            "avg_saved_seconds": round(self.saved_seconds / self.turns, 4) if self.turns else 0.0,
+            "last": self.recent[-1] if self.recent else None,
+        }
@@ -1,18 +1,372 @@
+import asyncio
+import contextvars
 from amadeus import Client, ResponseError
-from langchain.tools import tool
+from langchain.tools import StructuredTool
 import os
 from typing import Optional, List, Dict, Any
-import json
+from serializer import dumps
 from dotenv import load_dotenv
 from datetime import datetime
-from util import parse_flight_offer, text_bool, parse_pricing_offer
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from util import parse_flight_offer, text_bool, parse_pricing_offer, parse_priced_offer, merge_offers
+from models import check_sort_by, decode_offer, format_duration, rank_offers, raw_carrier, raw_total
+from reference_data import reference
+from airports import airport_pairs
+from price_watch import PriceWatchScheduler
+from price_history import PriceHistoryStore
+from search_cache import SearchCache, normalize_params
+from single_flight import SingleFlight
+from refine import departing_between, matches
+from multi_city import cache_params, multi_city_body, parse_legs
+from round_trip import TimeWindow, round_trip_options
+from pricing import OfferStore, PriceQuoteCache, price_offers
+from prefetch import Prefetcher
+from quota import QuotaExceeded, QuotaScheduler, current_session
+from deadline import DeadlineExceeded, current_deadline, http_with_timeout
+from orders import engine_from_env
 
 load_dotenv()
 amadeus_api_key = os.getenv("AMADEUS_API_KEY")
 amadeus_api_secret = os.getenv("AMADEUS_API_SECRET")
-amadeus = Client(client_id=amadeus_api_key, client_secret=amadeus_api_secret)
+# Every Amadeus call times out after AMADEUS_TIMEOUT seconds, or sooner when its request is out of time
+amadeus = Client(client_id=amadeus_api_key, client_secret=amadeus_api_secret,
+                 http=http_with_timeout(float(os.getenv("AMADEUS_TIMEOUT", "10"))))
 
-@tool
+# Every Amadeus call from the tools, the prefetcher and the price watcher shares the key's rate limit
+amadeus_quota = QuotaScheduler(
+    "amadeus",
+    rate=float(os.getenv("AMADEUS_RATE", "10")), capacity=10,
+    session_rate=float(os.getenv("AMADEUS_SESSION_RATE", "2")), session_capacity=6,
+    max_waiting=int(os.getenv("AMADEUS_MAX_WAITING", "100")),
+)
+
+# Every one-way search result is summarised here for price trend answers.
+# Set PRICE_HISTORY_DIR to keep it on disk, otherwise it lives in memory.
+price_history = PriceHistoryStore(os.getenv("PRICE_HISTORY_DIR"), flush_seconds=float(os.getenv("PRICE_HISTORY_FLUSH_SECONDS", "60")))
+
+# Upper bound on airport pairs searched concurrently for one metro-area request
+MAX_AIRPORT_PAIRS = 9
+
+# Offers shown to the agent when the user did not ask for a number
+DEFAULT_RESULTS = 10
+
+
+def build_search_params(
+    originLocationCode: str,
+    destinationLocationCode: str,
+    departureDate: str,
+    returnDate: Optional[str] = None,
+    adults: int = 1,
+    children: Optional[int] = None,
+    infants: Optional[int] = None,
+    cabin_class: Optional[str] = None,
+    direct_only: Optional[bool] = False,
+    included_airline_codes: Optional[str] = None,
+    excluded_airline_codes: Optional[str] = None,
+    maxPrice: Optional[int] = None,
+    max: Optional[int] = None
+) -> dict:
+    """Build the Amadeus flight offers search query from the tool arguments"""
+    search_params = {
+        "originLocationCode": originLocationCode,
+        "destinationLocationCode": destinationLocationCode,
+        "departureDate": departureDate,
+        "adults": int(adults),
+        "nonStop": text_bool(direct_only),
+        "currencyCode": "USD",  # Default currency, can be changed if needed
+    }
+
+    # Conditionally add optional parameters if provided
+    if returnDate:
+        search_params["returnDate"] = returnDate
+    if children is not None:
+        search_params["children"] = children
+    if infants is not None:
+        search_params["infants"] = infants
+    if cabin_class:
+        search_params["travelClass"] = cabin_class
+    if included_airline_codes:
+        search_params["includedAirlineCodes"] = included_airline_codes
+    if excluded_airline_codes:
+        search_params["excludedAirlineCodes"] = excluded_airline_codes
+    if maxPrice is not None:
+        search_params["maxPrice"] = maxPrice
+    if max is not None:
+        # the tools decode and show this many offers, so ask Amadeus for exactly that many
+        search_params["max"] = int(max)
+
+    return search_params
+
+
+def fetch_flight_offers(search_params: dict) -> list:
+    """Run one Amadeus flight offers search. Offers are returned raw, see `shortlist`"""
+    response = amadeus.shopping.flight_offers_search.get(**search_params)
+    # Carrier, aircraft and city names shown next to the codes in the results
+    reference.update(response.result.get("dictionaries"))
+    record_price_history(search_params, response.data)
+    return response.data
+
+
+# Identical searches in flight at the same time share one Amadeus call.
+# Set SINGLE_FLIGHT_DIR to also share it between workers on the same machine.
+single_flight = SingleFlight(os.getenv("SINGLE_FLIGHT_DIR"))
+
+
+def fetch_coalesced(search_params: dict) -> list:
+    """
+    `fetch_flight_offers`, shared by identical concurrent searches. Only the
+    leader, who makes the call, takes a quota token; followers only wait up to
+    their own deadline, and lead the call themselves when the leader was shed.
+    """
+    def fetch():
+        amadeus_quota.acquire()
+        return fetch_flight_offers(search_params)
+    return single_flight.do(normalize_params(search_params), fetch, retry_on=(QuotaExceeded, DeadlineExceeded))
+
+
+# Recent search results, also filled ahead of time by the prefetcher
+search_cache = SearchCache(ttl_seconds=int(os.getenv("SEARCH_CACHE_TTL", "600")))
+prefetcher = Prefetcher(
+    fetch_coalesced, search_cache,
+    budget_per_hour=int(os.getenv("PREFETCH_BUDGET_PER_HOUR", "60")),
+)
+
+
+def flight_search(search_params: dict, prefetch: bool = True, min_results: Optional[int] = None) -> list:
+    """
+    Cached flight search, returning the raw Amadeus offers. Interactive searches
+    also queue their likely follow-ups (adjacent dates, return leg) for
+    background prefetching.
+
+    A search that only tightens the filters of a cached one (nonstop, lower
+    maxPrice, fewer airlines) is answered by filtering the cached offers. Pass
+    `min_results` when only the cheapest that many offers are needed: a cut-off
+    cached result is then good enough as long as that many offers pass.
+    """
+    offers = search_cache.get(search_params)
+    if offers is None:
+        offers = search_cache.refine(search_params, min_results)
+    if offers is None:
+        offers = fetch_coalesced(search_params)
+        search_cache.put(search_params, offers)
+    if prefetch:
+        prefetcher.on_search(search_params)
+    return offers
+
+
+def fetch_multi_city(body: dict) -> list:
+    """One Flight Offers Search POST for a multi-city trip (multi_city.multi_city_body), raw offers"""
+    response = amadeus.shopping.flight_offers_search.post(body)
+    reference.update(response.result.get("dictionaries"))
+    return response.data
+
+
+def multi_city_search(body: dict) -> list:
+    """Cached, coalesced multi-city search. Not recorded in the price history (only one-way prices are comparable)"""
+    params = cache_params(body)
+    offers = search_cache.get(params)
+    if offers is None:
+        def fetch():
+            amadeus_quota.acquire()
+            return fetch_multi_city(body)
+        offers = single_flight.do(normalize_params(params), fetch, retry_on=(QuotaExceeded, DeadlineExceeded))
+        search_cache.put(params, offers)
+    return offers
+
+
+# Search parameters that narrow the result; such results don't describe the route's prices
+PRICE_HISTORY_FILTERS = ("returnDate", "children", "infants", "includedAirlineCodes", "excludedAirlineCodes", "maxPrice", "max")
+
+
+def record_price_history(search_params: dict, offers: list):
+    """
+    Passively add a search result to the price history, as prices per adult.
+    Only unfiltered one-way searches of adults count: round-trip totals, a
+    nonstop-only or capped result would skew the route's history.
+    """
+    if not offers or search_params.get("nonStop") == "true" or any(search_params.get(k) for k in PRICE_HISTORY_FILTERS):
+        return
+    adults = int(search_params.get("adults") or 1)
+    try:
+        price_history.record(
+            search_params["originLocationCode"],
+            search_params["destinationLocationCode"],
+            search_params["departureDate"],
+            search_params.get("travelClass"),
+            [raw_total(o) / adults for o in offers],
+            [raw_carrier(o) for o in offers],
+        )
+    except Exception as e:
+        print(f"Could not record price history: {e}")
+
+
+# Offers shown to the agent, by offer_ref, and confirmed prices by offer fingerprint
+offer_store = OfferStore()
+price_quotes = PriceQuoteCache(ttl_seconds=int(os.getenv("PRICE_QUOTE_TTL", "900")))
+
+
+def shortlist(offers: list, k: int, sort_by: str = "price") -> list:
+    """
+    The best `k` raw offers (models.rank_offers), decoded and registered in
+    `offer_store` under `offer.ref` so the agent can have them priced.
+    """
+    chosen = []
+    for raw in rank_offers(offers, k, sort_by):
+        offer = decode_offer(raw)
+        offer.ref = offer_store.add(raw)
+        chosen.append(offer)
+    return chosen
+
+
+# Mock bookings (no real orders are ever sent to Amadeus)
+orders = engine_from_env()
+
+
+def order_summary(order: dict) -> dict:
+    """What the agent shows for a mock order"""
+    summary = parse_priced_offer(order["flightOffers"][0])
+    return {
+        "booking_reference": order["associatedRecords"][0]["reference"],
+        "order_id": order["id"],
+        "status": order["status"],
+        "travelers": [f"{t['name']['firstName']} {t['name']['lastName']}" for t in order["travelers"]],
+        **summary,
+        "note": "Mock booking for testing, no real reservation was made",
+    }
+
+
+# Background checker for saved price watches, started on first use
+price_watcher = PriceWatchScheduler(search_fn=lambda params: flight_search(params, prefetch=False))
+
+
+def search_airport_pairs(pairs: list, search_params: dict, limit: int = DEFAULT_RESULTS, sort_by: str = "price") -> tuple:
+    """
+    Search every (origin, destination) airport pair concurrently.
+
+    Each pair goes through `flight_search` on its own thread, so the total wait
+    is bounded by the slowest pair rather than the sum of all of them.
+    Only the best `limit` offers of each pair are decoded.
+
+    Returns:
+        (decoded offers from every pair, list of per-pair error dicts)
+    """
+    offers, errors = [], []
+    with ThreadPoolExecutor(max_workers=len(pairs)) as pool:
+        futures = {
+            # No prefetching here, the follow-ups of every pair would blow the budget.
+            # Each pair runs in a copy of the caller's context so it is charged to the same session
+            pool.submit(contextvars.copy_context().run, flight_search, {**search_params, "originLocationCode": origin, "destinationLocationCode": destination}, False): (origin, destination)
+            for origin, destination in pairs
+        }
+        for future in as_completed(futures):
+            origin, destination = futures[future]
+            try:
+                offers.extend(shortlist(future.result(), limit, sort_by))
+            except (QuotaExceeded, DeadlineExceeded):
+                # shed or out of time: the whole request fails, not just this pair
+                raise
+            except ResponseError as error:
+                errors.append({"route": f"{origin}-{destination}", "error": f"Amadeus API error: {str(error)}"})
+            except Exception as e:
+                errors.append({"route": f"{origin}-{destination}", "error": f"An unexpected error occurred: {str(e)}"})
+    return offers, errors
+
+
+def round_trip_searches(search_params: dict) -> tuple:
+    """
+    The outbound one-way, return one-way and bundled round-trip searches of
+    `search_params` (which has a returnDate), run concurrently.
+
+    Returns:
+        (outbound offers, return offers, bundled offers, list of per-search error dicts)
+    """
+    one_way = {k: v for k, v in search_params.items() if k != "returnDate"}
+    searches = {
+        "outbound": one_way,
+        "return": {**one_way, "originLocationCode": search_params["destinationLocationCode"],
+                   "destinationLocationCode": search_params["originLocationCode"],
+                   "departureDate": search_params["returnDate"]},
+        "round trip": search_params,
+    }
+    results, errors = {name: [] for name in searches}, []
+    with ThreadPoolExecutor(max_workers=len(searches)) as pool:
+        # Same session and deadline as the caller (see search_airport_pairs)
+        futures = {pool.submit(contextvars.copy_context().run, flight_search, params, False): name
+                   for name, params in searches.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                results[name] = future.result()
+            except (QuotaExceeded, DeadlineExceeded):
+                raise
+            except ResponseError as error:
+                errors.append({"search": name, "error": f"Amadeus API error: {str(error)}"})
+            except Exception as e:
+                errors.append({"search": name, "error": f"An unexpected error occurred: {str(e)}"})
+    return results["outbound"], results["return"], results["round trip"], errors
+
+
+def round_trip_summary(option) -> dict:
+    """What the agent shows for a round_trip.RoundTripOption; every ticket gets an offer_ref"""
+    hours, minutes = divmod(option.stay_minutes, 60)
+    summary = {
+        "kind": option.kind,
+        "total_price": f"{option.price:.2f} {option.outbound['price']['currency']}",
+        "total_duration": format_duration(option.duration),
+        "stay": f"{hours}h{minutes:02d}m",
+    }
+    if option.inbound is None:
+        offer = decode_offer(option.outbound)
+        offer.ref = offer_store.add(option.outbound)
+        return {**summary, **parse_flight_offer(offer)}
+
+    outbound, inbound = decode_offer(option.outbound), decode_offer(option.inbound)
+    outbound.ref, inbound.ref = offer_store.add(option.outbound), offer_store.add(option.inbound)
+    return {
+        **summary,
+        "note": "Two separate one-way tickets, priced and booked one by one",
+        "offer_refs": [outbound.ref, inbound.ref],
+        "outbound": parse_flight_offer(outbound),
+        "return": parse_flight_offer(inbound),
+    }
+
+
+def _check_deadline():
+    """A tool call of a turn that is out of time is not started (run_agent returns what it has)"""
+    deadline = current_deadline.get()
+    if deadline is not None:
+        deadline.check()
+
+
+def _in_thread(fn):
+    """Async implementation of a blocking tool: the Amadeus SDK is synchronous, so run it on a worker thread"""
+    async def run(*args, **kwargs):
+        _check_deadline()
+        return await asyncio.to_thread(fn, *args, **kwargs)
+    return run
+
+
+def _inline(fn):
+    """Async implementation of a tool that never blocks"""
+    async def run(*args, **kwargs):
+        _check_deadline()
+        return fn(*args, **kwargs)
+    return run
+
+
+# Tools get native async implementations, used by AgentExecutor.ainvoke to run the
+# tool calls of one agent step concurrently instead of one after the other
+def _threaded_tool(fn) -> StructuredTool:
+    """@tool for a blocking function (Amadeus calls)"""
+    return StructuredTool.from_function(func=fn, coroutine=_in_thread(fn))
+
+
+def _inline_tool(fn) -> StructuredTool:
+    """@tool for a function that never blocks"""
+    return StructuredTool.from_function(func=fn, coroutine=_inline(fn))
+
+
+@_inline_tool
 def collect_flight_info(
     originLocationCode: str,
     destinationLocationCode: str,
@@ -66,7 +420,7 @@ def collect_flight_info(
     Checked Bag Preference: {"Included" if include_checked_bag else "Not specified"}
     """
 
-@tool
+@_inline_tool
 def collect_passenger_info(
     first_name: str,
     last_name: str,
@@ -86,13 +440,20 @@ def collect_passenger_info(
       """
 
 
-@tool
-def get_airport_code(city: str) -> dict:
+def resolve_city(name: str) -> tuple:
+    """IATA codes of a city the metro table doesn't know (e.g. "Paris" -> PAR), busiest match first"""
+    amadeus_quota.acquire()
+    response = amadeus.reference_data.locations.get(keyword=name, subType='CITY,AIRPORT')
+    return tuple(location["iataCode"] for location in response.data[:1] if location.get("iataCode"))
+
+@_threaded_tool
+def get_airport_code(city: str) -> str:
     """Search for airport code using city name"""
+    amadeus_quota.acquire()
     response = amadeus.reference_data.locations.get(keyword=city, subType='AIRPORT')
-    return response.data
+    return dumps(response.data)
 
-@tool
+@_threaded_tool
 def search_flights(
     originLocationCode: str,
     destinationLocationCode: str,
@@ -106,10 +467,15 @@ def search_flights(
     included_airline_codes: Optional[str] = None,
     excluded_airline_codes: Optional[str] = None,
     maxPrice: Optional[int] = None,
-    max: Optional[int] = None
+    max: Optional[int] = None,
+    sort_by: Optional[str] = "price",
+    departure_after: Optional[str] = None,
+    departure_before: Optional[str] = None
 ) -> str:
     """
     Search for flights using the Amadeus API.
+    Narrowing an earlier search (nonstop only, lower maxPrice, excluding an airline,
+    a departure time window) is answered from the earlier results, no new search is made.
     
     Args:
 
@@ -128,67 +494,458 @@ def search_flights(
             includedAirlineCodes: Only show results from these airlines (IATA codes, comma-separated)
             excludedAirlineCodes: Exclude these airlines (IATA codes, comma-separated)
             maxPrice: Max price per traveler
-            max: Max number of results to return
+            max: Max number of results to return (default 10)
+            sort_by: "price" (default), "duration" (fastest first), "departure" (earliest first) or "arrival" (earliest first)
+            departure_after: Earliest departure time of the first flight (HH:MM, e.g. "06:00")
+            departure_before: Latest departure time of the first flight (HH:MM, e.g. "12:00" for morning flights)
 
     Returns:
         JSON string with flight search results
     """
     try:
-        search_params = {
-            "originLocationCode": originLocationCode,
-            "destinationLocationCode": destinationLocationCode,
-            "departureDate": departureDate,
-            "adults": int(adults),
-            "nonStop": text_bool(direct_only),
-            "currencyCode": "USD",  # Default currency, can be changed if needed
-        }
-
-        # Conditionally add optional parameters if provided
-        if returnDate:
-            search_params["returnDate"] = returnDate
-        if children is not None:
-            search_params["children"] = children
-        if infants is not None:
-            search_params["infants"] = infants
-        if cabin_class:
-            search_params["travelClass"] = cabin_class
-        if included_airline_codes:
-            search_params["includedAirlineCodes"] = included_airline_codes
-        if excluded_airline_codes:
-            search_params["excludedAirlineCodes"] = excluded_airline_codes
-        if maxPrice is not None:
-            search_params["maxPrice"] = maxPrice
-        if max is not None:
-            search_params["max"] = 10
-
         # Conflict check
         if included_airline_codes and excluded_airline_codes:
             return "Error: You cannot specify both includedAirlineCodes and excludedAirlineCodes."
 
+        check_sort_by(sort_by or "price")
+        search_params = build_search_params(
+            originLocationCode, destinationLocationCode, departureDate, returnDate, adults,
+            children, infants, cabin_class, direct_only, included_airline_codes,
+            excluded_airline_codes, maxPrice, max,
+        )
+
         print(search_params) # testing
 
         # Get search results from Amadeus
-        response = amadeus.shopping.flight_offers_search.get(**search_params)
+        limit = max or DEFAULT_RESULTS
+        min_results = limit if (sort_by or "price") == "price" and not (departure_after or departure_before) else None
+        offers = departing_between(flight_search(search_params, min_results=min_results), departure_after, departure_before)
+        offers = shortlist(offers, limit, sort_by or "price")
+        return dumps([parse_flight_offer(offer) for offer in offers])
+       
+       
+    except (QuotaExceeded, DeadlineExceeded):
+        # Shed by the quota scheduler (/agent answers 429), or the request is out of time
+        raise
+    except ValueError as e:
+        return f"Error: {e}"
+    except ResponseError as error:
+        return dumps({
+            "error": f"Amadeus API error: {str(error)}",
+            "status_code": error.response.status_code
+        })
+    except Exception as e:
+        return dumps({
+            "error": f"An unexpected error occurred: {str(e)}"
+        })
+    
 
-        flight_offers = response.data
-        
-        
+@_threaded_tool
+def search_flights_multi_airport(
+    origins: str,
+    destinations: str,
+    departureDate: str,
+    returnDate: Optional[str] = None,
+    adults: int = 1,
+    children: Optional[int] = None,
+    infants: Optional[int] = None,
+    cabin_class: Optional[str] = None,
+    direct_only: Optional[bool] = False,
+    included_airline_codes: Optional[str] = None,
+    excluded_airline_codes: Optional[str] = None,
+    maxPrice: Optional[int] = None,
+    max: Optional[int] = None,
+    sort_by: Optional[str] = "price"
+) -> str:
+    """
+    Search flights between every nearby airport of the origin and destination areas at once.
+    Use this when the user names a city or region served by several airports
+    (e.g. "New York" -> JFK, EWR, LGA or "Bay Area" -> SFO, OAK, SJC).
 
-        res = []
+    Args:
 
-        for offer in flight_offers:
-            res.append(parse_flight_offer(offer))
+        Required:
+            origins: City name, metro code or IATA code(s) of departure, comma-separated (e.g., "New York")
+            destinations: City name, metro code or IATA code(s) of arrival, comma-separated (e.g., "Bay Area")
+            departureDate: Date of departure (YYYY-MM-DD)
+            adults: Number of adult travelers (12+). Default: 1
 
-        return res
-       
-       
+        Optional:
+            Same as search_flights (returnDate, children, infants, cabin_class, direct_only,
+            included_airline_codes, excluded_airline_codes, maxPrice, max, sort_by)
+
+    Returns:
+        Merged flight offers from all airport pairs, best first, with duplicates removed
+    """
+    try:
+        # Conflict check
+        if included_airline_codes and excluded_airline_codes:
+            return "Error: You cannot specify both includedAirlineCodes and excludedAirlineCodes."
+
+        check_sort_by(sort_by or "price")
+        pairs = airport_pairs(origins, destinations, limit=MAX_AIRPORT_PAIRS, resolve=resolve_city)
+        if not pairs:
+            return "Error: Could not resolve any airports for the given origins and destinations."
+
+        search_params = build_search_params(
+            pairs[0][0], pairs[0][1], departureDate, returnDate, adults,
+            children, infants, cabin_class, direct_only, included_airline_codes,
+            excluded_airline_codes, maxPrice, max,
+        )
+
+
+        limit = max or DEFAULT_RESULTS
+        offers, errors = search_airport_pairs(pairs, search_params, limit, sort_by or "price")
+        if not offers and errors:
+            return dumps({"error": "All airport searches failed", "details": errors})
+
+        return dumps([parse_flight_offer(offer) for offer in merge_offers(offers, limit=limit, sort_by=sort_by or "price")])
+
+    except (QuotaExceeded, DeadlineExceeded):
+        raise
+    except ValueError as e:
+        return f"Error: {e}"
+    except Exception as e:
+        return dumps({
+            "error": f"An unexpected error occurred: {str(e)}"
+        })
+
+@_threaded_tool
+def search_multi_city_flights(
+    legs: str,
+    adults: int = 1,
+    children: Optional[int] = None,
+    infants: Optional[int] = None,
+    cabin_class: Optional[str] = None,
+    direct_only: Optional[bool] = False,
+    included_airline_codes: Optional[str] = None,
+    excluded_airline_codes: Optional[str] = None,
+    maxPrice: Optional[int] = None,
+    max: Optional[int] = None,
+    sort_by: Optional[str] = "price"
+) -> str:
+    """
+    Search a multi-city or open-jaw trip (e.g. New York -> Los Angeles -> San Francisco -> New York,
+    or fly into one city and home from another) in ONE search, priced as a whole.
+    Use this instead of several search_flights calls whenever the trip has more than one leg
+    that is not a simple return.
+
+    Args:
+
+        Required:
+            legs: Every flight of the trip in order, comma-separated "ORIGIN-DESTINATION YYYY-MM-DD"
+                  with IATA codes (e.g. "JFK-LAX 2025-07-01, LAX-SFO 2025-07-05, SFO-JFK 2025-07-09"), 2 to 6 legs
+            adults: Number of adult travelers (12+). Default: 1
+
+        Optional:
+            Same as search_flights (children, infants, cabin_class, direct_only,
+            included_airline_codes, excluded_airline_codes, maxPrice, max, sort_by)
+
+    Returns:
+        JSON string with whole-trip offers; `legs` lists the flights of every leg
+    """
+    try:
+        if included_airline_codes and excluded_airline_codes:
+            return "Error: You cannot specify both includedAirlineCodes and excludedAirlineCodes."
+
+        check_sort_by(sort_by or "price")
+        body = multi_city_body(
+            parse_legs(legs), adults, children, infants, cabin_class, direct_only,
+            included_airline_codes, excluded_airline_codes,
+        )
+
+        offers = multi_city_search(body)
+        if maxPrice is not None:
+            offers = [offer for offer in offers if matches(offer, {"maxPrice": maxPrice})]
+        offers = shortlist(offers, max or DEFAULT_RESULTS, sort_by or "price")
+        return dumps([parse_flight_offer(offer) for offer in offers])
+
+    except (QuotaExceeded, DeadlineExceeded):
+        raise
+    except ValueError as e:
+        return f"Error: {e}"
     except ResponseError as error:
-        return json.dumps({
+        return dumps({
             "error": f"Amadeus API error: {str(error)}",
             "status_code": error.response.status_code
         })
     except Exception as e:
-        return json.dumps({
+        return dumps({
             "error": f"An unexpected error occurred: {str(e)}"
         })
-    
+
+@_threaded_tool
+def search_round_trip_flights(
+    originLocationCode: str,
+    destinationLocationCode: str,
+    departureDate: str,
+    returnDate: str,
+    adults: int = 1,
+    children: Optional[int] = None,
+    infants: Optional[int] = None,
+    cabin_class: Optional[str] = None,
+    direct_only: Optional[bool] = False,
+    included_airline_codes: Optional[str] = None,
+    excluded_airline_codes: Optional[str] = None,
+    maxPrice: Optional[int] = None,
+    max: Optional[int] = None,
+    sort_by: Optional[str] = "price",
+    min_stay_hours: Optional[float] = None,
+    departure_after: Optional[str] = None,
+    departure_before: Optional[str] = None,
+    arrive_before: Optional[str] = None,
+    return_departure_after: Optional[str] = None,
+    return_departure_before: Optional[str] = None,
+    return_arrive_before: Optional[str] = None
+) -> str:
+    """
+    Find the best round trips, comparing round-trip fares with combinations of two one-way
+    tickets (often cheaper, or better timed). Use this for every round trip with a returnDate.
+
+    Args:
+
+        Required:
+            originLocationCode: IATA code of departure airport (e.g., "JFK")
+            destinationLocationCode: IATA code of arrival airport (e.g., "LAX")
+            departureDate: Date of the outbound flight (YYYY-MM-DD)
+            returnDate: Date of the return flight (YYYY-MM-DD)
+            adults: Number of adult travelers (12+). Default: 1
+
+        Optional:
+            Same as search_flights (children, infants, cabin_class, direct_only,
+            included_airline_codes, excluded_airline_codes, maxPrice (per traveler, whole trip), max)
+            sort_by: "price" (default) or "duration" (shortest total flying time first)
+            min_stay_hours: Minimum hours between landing and the return flight
+            departure_after / departure_before: Outbound departure window (HH:MM)
+            arrive_before: Latest outbound arrival (HH:MM, e.g. "18:00")
+            return_departure_after / return_departure_before: Return departure window (HH:MM)
+            return_arrive_before: Latest return arrival (HH:MM)
+
+    Returns:
+        JSON string with the best trips; two one-way tickets come with two offer_refs
+    """
+    try:
+        if included_airline_codes and excluded_airline_codes:
+            return "Error: You cannot specify both includedAirlineCodes and excludedAirlineCodes."
+
+        # maxPrice applies to the whole trip, so the searches themselves are not capped
+        search_params = build_search_params(
+            originLocationCode, destinationLocationCode, departureDate, returnDate, adults,
+            children, infants, cabin_class, direct_only, included_airline_codes,
+            excluded_airline_codes,
+        )
+
+        outbound, inbound, bundled, errors = round_trip_searches(search_params)
+        if not (outbound and inbound) and not bundled and errors:
+            return dumps({"error": "All round-trip searches failed", "details": errors})
+
+        travelers = int(adults) + int(children or 0) + int(infants or 0)
+        options, _ = round_trip_options(
+            outbound, inbound, bundled, k=max or DEFAULT_RESULTS, sort_by=sort_by or "price",
+            min_stay_minutes=int((min_stay_hours or 0) * 60),
+            outbound_window=TimeWindow(departure_after, departure_before, None, arrive_before),
+            return_window=TimeWindow(return_departure_after, return_departure_before, None, return_arrive_before),
+            max_price=maxPrice * travelers if maxPrice is not None else None,
+        )
+        return dumps([round_trip_summary(option) for option in options])
+
+    except (QuotaExceeded, DeadlineExceeded):
+        raise
+    except ValueError as e:
+        return f"Error: {e}"
+    except Exception as e:
+        return dumps({
+            "error": f"An unexpected error occurred: {str(e)}"
+        })
+
+@_threaded_tool
+def confirm_prices(offer_refs: str) -> str:
+    """
+    Confirm the current price and availability of one or more offers from earlier search results,
+    e.g. before the user picks between a few options. All offers are confirmed together.
+
+    Args:
+        offer_refs: Comma-separated `offer_ref` values from search_flights or search_flights_multi_airport results
+
+    Returns:
+        For each offer_ref: the confirmed flight summary (including taxes) and whether the price changed,
+        or an error when the offer is no longer available
+    """
+    try:
+        refs = [ref.strip() for ref in offer_refs.split(",") if ref.strip()]
+        results, to_price = {}, []
+        for ref in dict.fromkeys(refs):
+            offer = offer_store.get(ref)
+            if offer is None:
+                results[ref] = {"error": "Unknown or expired offer_ref, search again"}
+            else:
+                to_price.append((ref, offer))
+
+        # Quotes still fresh in price_quotes are reused, the rest is priced in batches
+        priced_offers = price_offers(amadeus, [offer for _, offer in to_price], acquire=amadeus_quota.acquire, cache=price_quotes)
+        for (ref, offer), priced in zip(to_price, priced_offers):
+            if priced is None:
+                results[ref] = {"error": "This offer is no longer available"}
+                continue
+            summary = parse_priced_offer(priced)
+            summary["search_price"] = f"{raw_total(offer):.2f} {offer['price']['currency']}"
+            summary["price_changed"] = abs(raw_total(priced) - raw_total(offer)) >= 0.01
+            results[ref] = summary
+        return dumps(results)
+
+    except (QuotaExceeded, DeadlineExceeded):
+        raise
+    except Exception as e:
+        return dumps({
+            "error": f"An unexpected error occurred: {str(e)}"
+        })
+
+@_threaded_tool
+def book_mock_order(
+    offer_ref: str,
+    first_name: str,
+    last_name: str,
+    email: str,
+    date_of_birth: str,
+    phone: str,
+    other_travelers: Optional[str] = None,
+) -> str:
+    """
+    Create a MOCK booking (no real reservation, no payment) of an offer from earlier search results,
+    after the user has chosen it and given their passenger details. The price is confirmed first.
+    Calling it again for the same offer and travelers returns the same booking.
+
+    Args:
+        offer_ref: `offer_ref` of the chosen offer from search results
+        first_name: Lead traveler's first name
+        last_name: Lead traveler's last name
+        email: Lead traveler's email
+        date_of_birth: Lead traveler's date of birth (YYYY-MM-DD)
+        phone: Lead traveler's phone number
+        other_travelers: Other travelers on the offer, comma-separated "First Last" names
+
+    Returns:
+        Booking reference, order id, flights and confirmed price
+    """
+    try:
+        offer = offer_store.get(offer_ref.strip())
+        if offer is None:
+            return dumps({"error": "Unknown or expired offer_ref, search again"})
+        priced = price_offers(amadeus, [offer], acquire=amadeus_quota.acquire, cache=price_quotes)[0]
+        if priced is None:
+            return dumps({"error": "This offer is no longer available"})
+
+        names = [(first_name, last_name)] + [
+            tuple(name.strip().split(" ", 1)) for name in (other_travelers or "").split(",") if " " in name.strip()
+        ]
+        travelers = [{"id": str(n), "name": {"firstName": first, "lastName": last}} for n, (first, last) in enumerate(names, 1)]
+        travelers[0].update({
+            "dateOfBirth": date_of_birth,
+            "contact": {"emailAddress": email, "phones": [{"deviceType": "MOBILE", "number": phone}]},
+        })
+        # The agent may retry a step; the same session, offer and travelers never book twice
+        idempotency_key = f"{current_session.get()}:{offer_ref.strip()}:{sorted(names)}"
+        order = orders.create(priced, travelers, idempotency_key=idempotency_key)
+        return dumps(order_summary(order))
+
+    except (QuotaExceeded, DeadlineExceeded):
+        raise
+    except Exception as e:
+        return dumps({
+            "error": f"An unexpected error occurred: {str(e)}"
+        })
+
+@_inline_tool
+def lookup_order(booking_reference: str, last_name: str) -> str:
+    """
+    Look up a mock booking made earlier, e.g. when the user asks about their booking.
+
+    Args:
+        booking_reference: Six-character booking reference (or the order id)
+        last_name: Last name of one of the travelers on the booking
+
+    Returns:
+        The booking's reference, status, travelers, flights and price
+    """
+    order = orders.get(booking_reference)
+    if order is None or all(t["name"]["lastName"].upper() != last_name.strip().upper() for t in order["travelers"]):
+        return dumps({"error": "No booking found with this reference and last name"})
+    return dumps(order_summary(order))
+
+@_threaded_tool
+def watch_flight_price(
+    originLocationCode: str,
+    destinationLocationCode: str,
+    departureDate: str,
+    threshold: int,
+    returnDate: Optional[str] = None,
+    adults: int = 1,
+    cabin_class: Optional[str] = None,
+    direct_only: Optional[bool] = False,
+) -> str:
+    """
+    Save a search and alert the user when its cheapest price drops to or below a threshold
+    (e.g. "tell me if JFK-LAX drops below $200"). Prices are re-checked in the background,
+    so there is no need to search again yourself.
+
+    Args:
+        originLocationCode: IATA code of departure airport (e.g., "JFK")
+        destinationLocationCode: IATA code of destination airport (e.g., "LAX")
+        departureDate: Date of departure (YYYY-MM-DD)
+        threshold: Alert when the total price is at or below this amount in USD (whole number)
+        returnDate: Return date (YYYY-MM-DD), if round-trip
+        adults: Number of adult travelers. Default: 1
+        cabin_class: ECONOMY, PREMIUM_ECONOMY, BUSINESS, FIRST
+        direct_only: Only direct flights (default: False)
+    """
+    search_params = build_search_params(
+        originLocationCode, destinationLocationCode, departureDate, returnDate, adults,
+        cabin_class=cabin_class, direct_only=direct_only,
+    )
+    # the watch belongs to the session asking, never to a user named in the tool call
+    watch = price_watcher.add(current_session.get(), search_params, threshold)
+    price_watcher.start()
+    return f"""Price watch saved (id {watch.watch_id}):
+    {originLocationCode} → {destinationLocationCode} on {departureDate}{f", returning {returnDate}" if returnDate else ""}
+    Alert when the price is at or below {threshold} USD. Prices are checked every {watch.interval_seconds // 60} minutes.
+    """
+
+@_inline_tool
+def cancel_price_watch(watch_id: str) -> str:
+    """
+    Stop a price watch saved earlier with watch_flight_price.
+
+    Args:
+        watch_id: The id returned when the watch was saved
+    """
+    if price_watcher.remove(watch_id.strip(), user_id=current_session.get()):
+        return f"Price watch {watch_id} cancelled."
+    return f"Error: No price watch {watch_id} for this user."
+
+@_inline_tool
+def price_trend(
+    originLocationCode: str,
+    destinationLocationCode: str,
+    departureDate: str,
+    price: Optional[float] = None,
+    cabin_class: Optional[str] = None,
+) -> str:
+    """
+    Answer "is this a good price?" from prices seen in earlier searches, without calling the flight API.
+    Only one-way prices are tracked, per adult.
+
+    Args:
+        originLocationCode: IATA code of departure airport (e.g., "JFK")
+        destinationLocationCode: IATA code of destination airport (e.g., "LAX")
+        departureDate: Date of departure (YYYY-MM-DD)
+        price: Optional price per adult in USD to compare against the history
+        cabin_class: ECONOMY (default), PREMIUM_ECONOMY, BUSINESS, FIRST
+
+    Returns:
+        Number of observations, lowest / typical / latest cheapest price seen, and when a price
+        is given its percentile (0 = cheaper than everything seen so far)
+    """
+    summary = price_history.assess(originLocationCode, destinationLocationCode, departureDate, cabin_class, price)
+    if not summary["observations"]:
+        return dumps({"message": "No price history for this route and date yet. Search it first."})
+    return dumps(summary)
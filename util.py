@@ -1,128 +1,185 @@
-def parse_flight_offer(offer):
-    itinerary = offer['itineraries'][0]
-    segment = itinerary['segments'][0]
-    departure = segment['departure']
-    arrival = segment['arrival']
-    price = offer['price']
-    traveler_pricing = offer['travelerPricings'][0]
-    fare_details = traveler_pricing['fareDetailsBySegment'][0]
-
-    dep_time = departure['at']
-    arr_time = arrival['at']
-    dep_airport = departure['iataCode']
-    arr_airport = arrival['iataCode']
-    flight_number = f"{segment['carrierCode']} {segment['number']}"
-    duration = segment['duration']
-    flight_date = dep_time.split('T')[0]
-
-    total_price = price['total']
-    currency = price['currency']
-    checked_bag_fee = None
-    for service in price.get('additionalServices', []):
-        if service['type'] == 'CHECKED_BAGS':
-            checked_bag_fee = service['amount']
-
-    stops = segment['numberOfStops']
-    is_direct = stops == 0
-
-    # Checked bags
-    checked_bags_info = fare_details.get("includedCheckedBags", {})
-    if "quantity" in checked_bags_info:
-        checked_bags_included = checked_bags_info["quantity"]
-    elif "weight" in checked_bags_info:
-        checked_bags_included = f"{checked_bags_info['weight']} {checked_bags_info.get('weightUnit', '')}"
-    else:
-        checked_bags_included = "Unknown"
+from typing import Optional, Union
+
+from models import Offer, check_sort_by, decode_offer, format_duration
+from reference_data import reference
+
 
-    # Cabin bags (optional)
-    carryon_bags_info = fare_details.get("includedCabinBags", {})
-    carryon_bags_included = carryon_bags_info.get("quantity", "Unknown")
+def _checked_bags(offer: Offer):
+    baggage = offer.baggage[0] if offer.baggage else None
+    if baggage is None:
+        return "Unknown"
+    if baggage.checked_quantity is not None:
+        return baggage.checked_quantity
+    if baggage.checked_weight is not None:
+        return f"{baggage.checked_weight} {baggage.checked_weight_unit}"
+    return "Unknown"
 
-    amenities = fare_details.get("amenities", [])
+
+def _carryon_bags(offer: Offer):
+    baggage = offer.baggage[0] if offer.baggage else None
+    if baggage is None or baggage.cabin_quantity is None:
+        return "Unknown"
+    return baggage.cabin_quantity
+
+
+def parse_flight_offer(offer: Union[dict, Offer], dictionaries: Optional[dict] = None):
+    """
+    Summary of an offer for the agent. Carrier, aircraft and city names come from
+    the response `dictionaries` when given, otherwise from earlier responses."""
+
+    if not isinstance(offer, Offer):
+        offer = decode_offer(offer)
+    segment = offer.first_segment
 
     summary = {
-        "flight_date": flight_date,
-        "departure_time": dep_time,
-        "arrival_time": arr_time,
-        "from": dep_airport,
-        "to": arr_airport,
-        "flight_number": flight_number,
-        "duration": duration,
-        "is_direct": is_direct,
-        "stops": stops,
-        "total_price": f"{total_price} {currency}",
-        "checked_bags_included": checked_bags_included,
-        "carryon_bags_included": carryon_bags_included,
-        "checked_bag_fee": checked_bag_fee,
-        "amenities": amenities,
+        "flight_date": segment.departure_at.split('T')[0],
+        "departure_time": segment.departure_at,
+        "arrival_time": segment.arrival_at,
+        "from": segment.origin,
+        "from_city": reference.city_code(segment.origin, dictionaries),
+        "to": segment.destination,
+        "to_city": reference.city_code(segment.destination, dictionaries),
+        "flight_number": segment.flight_number,
+        "airline": reference.carrier_name(segment.carrier, dictionaries),
+        "aircraft": reference.aircraft_name(segment.aircraft, dictionaries),
+        "duration": format_duration(segment.duration_minutes),
+        "is_direct": segment.stops == 0,
+        "stops": segment.stops,
+        "total_price": f"{offer.total:.2f} {offer.currency}",
+        "checked_bags_included": _checked_bags(offer),
+        "carryon_bags_included": _carryon_bags(offer),
+        "checked_bag_fee": offer.checked_bag_fee,
+        "amenities": [amenity.as_dict() for amenity in offer.amenities],
     }
+    if len(offer.itineraries) > 1:
+        # Return flight, or every leg of a multi-city trip (the fields above describe the first flight)
+        summary["legs"] = [_leg_summary(itinerary) for itinerary in offer.itineraries]
+        summary["total_duration"] = format_duration(offer.duration)
+    if offer.ref:
+        summary["offer_ref"] = offer.ref
     return summary
 
+def _leg_summary(itinerary) -> dict:
+    first, last = itinerary.segments[0], itinerary.segments[-1]
+    return {
+        "from": first.origin,
+        "to": last.destination,
+        "departure_time": first.departure_at,
+        "arrival_time": last.arrival_at,
+        "flights": [segment.flight_number for segment in itinerary.segments],
+        "stops": len(itinerary.segments) - 1,
+        "duration": format_duration(itinerary.duration_minutes),
+    }
+
 def parse_pricing_offer(pricing_response: dict):
-    offer = pricing_response["flightOffers"][0]
-
-    itinerary = offer["itineraries"][0]
-    segment = itinerary["segments"][0]
-    departure = segment["departure"]
-    arrival = segment["arrival"]
-    price = offer["price"]
-    traveler_pricing = offer["travelerPricings"][0]
-    fare_details = traveler_pricing["fareDetailsBySegment"][0]
-
-    # Times and locations
-    dep_time = departure["at"]
-    arr_time = arrival["at"]
-    dep_airport = departure["iataCode"]
-    arr_airport = arrival["iataCode"]
-    flight_number = f"{segment['carrierCode']} {segment['number']}"
-    duration = segment["duration"]
-    flight_date = dep_time.split("T")[0]
-
-    # Price info
-    total_price = price["total"]
-    currency = price["currency"]
-
-    # Baggage info (might be missing)
-    checked_bags_info = fare_details.get("includedCheckedBags", {})
-    if "quantity" in checked_bags_info:
-        checked_bags_included = checked_bags_info["quantity"]
-    elif "weight" in checked_bags_info:
-        checked_bags_included = f"{checked_bags_info['weight']} {checked_bags_info.get('weightUnit', '')}"
-    else:
-        checked_bags_included = "Unknown"
+    return parse_priced_offer(pricing_response["flightOffers"][0])
 
-    carryon_bags_info = fare_details.get("includedCabinBags", {})
-    carryon_bags_included = carryon_bags_info.get("quantity", "Unknown")
+def parse_priced_offer(priced_offer: dict):
+    """Summary of one offer confirmed by the Flight Offers Price API"""
+    offer = decode_offer(priced_offer)
+    segment = offer.first_segment
 
-    # Optional: CO2 emissions
-    co2 = segment.get("co2Emissions", [])
-    co2_kg = co2[0]["weight"] if co2 else "Unknown"
+    return {
+        "flight_date": segment.departure_at.split("T")[0],
+        "departure_time": segment.departure_at,
+        "arrival_time": segment.arrival_at,
+        "from": segment.origin,
+        "to": segment.destination,
+        "flight_number": segment.flight_number,
+        "airline": reference.carrier_name(segment.carrier),
+        "duration": format_duration(segment.duration_minutes),
+        "is_direct": segment.stops == 0,
+        "stops": segment.stops,
+        "total_price": f"{offer.total:.2f} {offer.currency}",
+        "checked_bags_included": _checked_bags(offer),
+        "carryon_bags_included": _carryon_bags(offer),
+        "co2_emission_kg": segment.co2_kg if segment.co2_kg is not None else "Unknown",
+        "taxes": [tax.as_dict("code") for tax in offer.taxes]
+    }
 
-    # Stops
-    stops = segment["numberOfStops"]
-    is_direct = stops == 0
+def offer_details(offer: Union[dict, Offer], dictionaries: Optional[dict] = None) -> dict:
+    """
+    Detailed view of an offer (every segment, baggage per traveler), as shown
+    by AmadeusFlightAPI.format_flight_for_display"""
+
+    if not isinstance(offer, Offer):
+        offer = decode_offer(offer)
+
+    details = {
+        "price": {
+            "total": f"{offer.total:.2f}",
+            "currency": offer.currency,
+            "base": f"{offer.base:.2f}",
+            "fees": [fee.as_dict("type") for fee in offer.fees],
+            "grand_total": f"{offer.grand_total:.2f}",
+        },
+        "segments": [],
+        "baggage": {},
+        "flight_type": "DIRECT",
+        "total_duration": "",
+    }
 
-    # Taxes (if present)
-    taxes = traveler_pricing["price"].get("taxes", [])
+    if offer.duration:
+        details["total_duration"] = format_duration(offer.duration)
+    for leg, itinerary in enumerate(offer.itineraries, 1):
+        if len(itinerary.segments) > 1:
+            details["flight_type"] = "CONNECTING"
+
+        for segment in itinerary.segments:
+            details["segments"].append({
+                "leg": leg,
+                "departure": {"airport": segment.origin, "terminal": segment.departure_terminal, "time": segment.departure_at},
+                "arrival": {"airport": segment.destination, "terminal": segment.arrival_terminal, "time": segment.arrival_at},
+                "duration": format_duration(segment.duration_minutes) if segment.duration_minutes else "",
+                "flight_number": segment.flight_number,
+                "carrier_name": reference.carrier_name(segment.carrier, dictionaries),
+                "operating_carrier": segment.operating_carrier,
+                "aircraft": reference.aircraft_name(segment.aircraft, dictionaries),
+            })
+
+    for baggage in offer.baggage:
+        if baggage.checked_quantity is None and baggage.checked_weight is None:
+            checked = {"quantity": 0, "included": False}
+        else:
+            checked = {
+                "quantity": baggage.checked_quantity or 0,
+                "weight": baggage.checked_weight or 0,
+                "weightUnit": baggage.checked_weight_unit,
+            }
+        details["baggage"][f"traveler_{baggage.traveler_id}"] = {
+            "checked": checked,
+            # Carry-on information (not always explicitly provided)
+            "cabin": {"included": baggage.cabin_quantity != 0},
+        }
+
+    return details
 
-    return {
-        "flight_date": flight_date,
-        "departure_time": dep_time,
-        "arrival_time": arr_time,
-        "from": dep_airport,
-        "to": arr_airport,
-        "flight_number": flight_number,
-        "duration": duration,
-        "is_direct": is_direct,
-        "stops": stops,
-        "total_price": f"{total_price} {currency}",
-        "checked_bags_included": checked_bags_included,
-        "carryon_bags_included": carryon_bags_included,
-        "co2_emission_kg": co2_kg,
-        "taxes": taxes
-    }
 def text_bool(value):
     """
     Convert a boolean to string"""
 
-    return "true" if value else "false"
\ No newline at end of file
+    return "true" if value else "false"
+
+def merge_offers(offers: list, limit: Optional[int] = None, sort_by: str = "price") -> list:
+    """
+    Merge offers coming from several searches.
+    Duplicates (same flights on the same departures, see Offer.dedupe_key) keep the cheapest fare,
+    and the result is ranked by price then duration, or by `sort_by`
+    (duration, departure, arrival) then price."""
+
+    check_sort_by(sort_by)
+    best = {}
+    for offer in offers:
+        key = offer.dedupe_key
+        if key not in best or offer.total < best[key].total:
+            best[key] = offer
+
+    if sort_by == "duration":
+        ranked = sorted(best.values(), key=lambda o: (o.duration, o.total))
+    elif sort_by == "departure":
+        ranked = sorted(best.values(), key=lambda o: (o.first_segment.departure_at, o.total))
+    elif sort_by == "arrival":
+        ranked = sorted(best.values(), key=lambda o: (o.itineraries[0].segments[-1].arrival_at, o.total))
+    else:
+        ranked = sorted(best.values(), key=lambda o: (o.total, o.duration))
+    return ranked[:limit] if limit else ranked